@@ -0,0 +1,212 @@
+"""Замеры отрисовки экранов без окна (SDL_VIDEODRIVER=dummy).
+
+Каждый экран рисуется много раз при разных разрешениях, числе игроков
+и заданий; печатаются процентили времени кадра и память, выделяемая
+за кадр. Результаты можно сохранить как базовые и сравнивать с ними
+после изменений в отрисовке:
+
+    python bench.py --save            # запомнить текущие числа
+    python bench.py                   # сравнить с сохраненными
+    python bench.py --filter game     # только сценарии с "game" в имени
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ["PODAROCHEK_RENDER"] = "full"
+
+import pygame
+import main
+
+BASELINE_PATH = "bench_baseline.json"
+
+# Имя разрешения -> (ширина, высота, раскладка для телефона)
+RESOLUTIONS = {
+    "desktop": (1200, 800, False),
+    "desktop-hd": (1920, 1080, False),
+    "tablet": (1280, 800, True),
+    "phone": (2340, 1080, True),
+}
+PLAYERS = (2, 15, 150)
+TASKS = (5, 50)
+
+
+def prepare_game(screen_name, players, tasks, rng):
+    """Партия в состоянии, нужном для экрана"""
+    game = main.Game(rng=rng)
+    for i in range(players):
+        game.add_player(f"Игрок {i + 1}")
+    if screen_name == "setup":
+        return game
+    game.start_game(tasks)
+    # Половина поля уже сыграна, у игроков разные очки
+    for category in range(len(game.tasks)):
+        for index in range(0, game.tasks.size(category), 2):
+            game.tasks.complete(category, index)
+    for player in game.players:
+        player.add_score(rng.randint(0, 40))
+    if screen_name == "task":
+        game.select_task(0, 1)
+    elif screen_name == "intermediate":
+        game.state = "INTERMEDIATE_RESULTS"
+    elif screen_name in ("game_over", "confetti"):
+        game.state = "GAME_OVER"
+    return game
+
+
+def set_screen(width, height, mobile):
+    if main.screen is None:
+        main.init_display()
+    main.screen = pygame.display.set_mode((width, height))
+    if main.IS_MOBILE != mobile:
+        main.IS_MOBILE = mobile
+        main.layouts.clear()
+    main.set_resolution(width, height)
+    main.place_widgets()
+    # Атлас кружков в игре рисуется в фоне при запуске, в замер он не входит
+    main.adopt_task_atlas(wait=True)
+
+
+def draw_task_frame(game):
+    main.draw_game_screen(game)
+    main.draw_task_window(game)
+
+
+# Частиц на экране конца игры в сценарии "confetti"
+CONFETTI = 3000
+
+
+def draw_confetti_frame(game):
+    """Конец игры с постоянным числом частиц: погасшие сразу заменяются"""
+    particles = main.particles
+    particles.confetti(main.screen.get_width(), CONFETTI - particles.count)
+    particles.update(1 / 60)
+    main.draw_game_over_screen(game)
+    particles.draw(main.screen, main.particle_size())
+
+
+SCREENS = {
+    "setup": main.draw_setup_screen,
+    "game": main.draw_game_screen,
+    "task": draw_task_frame,
+    "intermediate": main.draw_intermediate_results,
+    "game_over": main.draw_game_over_screen,
+    "confetti": draw_confetti_frame,
+}
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    ordered = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in points}
+
+
+def run_scenario(screen_name, resolution, players, tasks, frames):
+    width, height, mobile = RESOLUTIONS[resolution]
+    set_screen(width, height, mobile)
+    # Кэши очищаются, чтобы первый кадр был честно "холодным"
+    main.static_layers.clear()
+    main.text_cache.clear()
+    main.task_modal.key = None
+    main.particles.clear()
+    game = prepare_game(screen_name, players, tasks, random.Random(1))
+    draw = SCREENS[screen_name]
+
+    start = time.perf_counter()
+    draw(game)
+    first_frame = time.perf_counter() - start
+
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        draw(game)
+        samples.append(time.perf_counter() - start)
+
+    # Память считаем отдельным проходом: tracemalloc сильно замедляет кадр
+    tracemalloc.start()
+    peaks = []
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(min(frames, 50)):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        draw(game)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    result = {"first_ms": first_frame * 1000, "mean_ms": sum(samples) / len(samples) * 1000}
+    result.update({name: value * 1000 for name, value in percentiles(samples).items()})
+    result["alloc_kb"] = sorted(peaks)[len(peaks) // 2] / 1024
+    result["retained_kb"] = retained / 1024
+    return result
+
+
+def scenarios(name_filter):
+    for screen_name in SCREENS:
+        for resolution in RESOLUTIONS:
+            for players in PLAYERS:
+                for tasks in TASKS:
+                    # Число заданий не влияет на экран настройки и конфетти
+                    if screen_name in ("setup", "confetti") and tasks != TASKS[0]:
+                        continue
+                    name = f"{screen_name}/{resolution}/{players}p/{tasks}t"
+                    if name_filter in name:
+                        yield name, (screen_name, resolution, players, tasks)
+
+
+def compare(name, result, baseline, threshold):
+    """Строка сравнения с базовыми числами; True, если кадр стал заметно медленнее"""
+    old = baseline.get(name)
+    if old is None:
+        return "", False
+    change = result["p50"] / old["p50"] - 1 if old["p50"] else 0
+    return f"{change:+7.1%}", change > threshold
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Замеры отрисовки экранов")
+    parser.add_argument("--frames", type=int, default=200, help="кадров на сценарий")
+    parser.add_argument("--filter", default="", help="подстрока имени сценария")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как базовые")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление p50 (0.2 = 20%%)")
+    parser.add_argument("--json", help="записать результаты в файл")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'сценарий':<34} {'первый':>8} {'p50':>7} {'p90':>7} {'p99':>7} {'КБ/кадр':>8} {'удерж.':>7} {'к базе':>8}")
+    for name, params in scenarios(args.filter):
+        result = run_scenario(*params, args.frames)
+        results[name] = result
+        change, regressed = compare(name, result, baseline, args.threshold)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<34} {result['first_ms']:>8.2f} {result['p50']:>7.2f} {result['p90']:>7.2f} "
+              f"{result['p99']:>7.2f} {result['alloc_kb']:>8.1f} {result['retained_kb']:>7.1f} {change:>8}"
+              + ("  !" if regressed else ""))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+        print(f"Базовые числа сохранены в {args.baseline}")
+    elif regressions:
+        print(f"Медленнее базы больше чем на {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_bench()
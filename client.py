@@ -0,0 +1,233 @@
+"""Подключение к серверу столов (server.py) вместо локальной партии.
+
+RemoteGame повторяет интерфейс Game, поэтому экраны main.py рисуют
+его так же, как локальную партию. Действия уходят на сервер, а состояние
+меняется только по его ответам: сеть читает фоновый поток, а изменения
+применяются в главном потоке вызовом poll(). После обрыва связи тот же
+поток переподключается и входит в комнату заново, а сервер присылает
+состояние партии целиком.
+"""
+import json
+import queue
+import socket
+import threading
+import time
+
+from game import Game, Leaderboard, Player, TaskBoard
+from server import DEFAULT_PORT, encode
+
+
+def parse_address(text):
+    """'host:port' или 'host' -> (host, port)"""
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, DEFAULT_PORT
+    return host, int(port)
+
+
+# Паузы между попытками переподключения растут до RECONNECT_MAX секунд
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX = 10
+
+
+class Connection:
+    """Сокет с потоком чтения; входящие сообщения копятся в очереди.
+
+    hello - сообщение, которое отправляется при каждом подключении
+    (вход в комнату), в том числе после обрыва связи.
+    """
+    def __init__(self, address, notify=None, timeout=5):
+        self.address = address
+        self.timeout = timeout
+        self.hello = None
+        self.closed = False
+        self.messages = queue.Queue()
+        # Будит главный цикл, когда пришло сообщение
+        self.notify = notify
+        self.lock = threading.Lock()
+        self.sock = self.open()
+        self.reader = threading.Thread(target=self.read_loop, name="network", daemon=True)
+        self.reader.start()
+
+    def open(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def send(self, message):
+        with self.lock:
+            try:
+                self.sock.sendall(encode(message))
+            except OSError:
+                # Обрыв увидит поток чтения
+                pass
+
+    def read_loop(self):
+        while True:
+            try:
+                with self.sock.makefile("r", encoding="utf-8") as f:
+                    for line in f:
+                        self.messages.put(json.loads(line))
+                        if self.notify:
+                            self.notify()
+            except (OSError, ValueError):
+                pass
+            # None в очереди - соединение оборвалось
+            self.messages.put(None)
+            if self.notify:
+                self.notify()
+            if not self.reconnect():
+                return
+
+    def reconnect(self):
+        """Подключается заново, пока соединение не закрыли; False - закрыли"""
+        delay = RECONNECT_DELAY
+        while not self.closed:
+            time.sleep(delay)
+            try:
+                sock = self.open()
+            except OSError:
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+            with self.lock:
+                if self.closed:
+                    sock.close()
+                    return False
+                self.sock.close()
+                self.sock = sock
+            if self.hello is not None:
+                self.send(self.hello)
+            return True
+        return False
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class RemoteGame(Game):
+    """Партия комнаты на сервере"""
+    def __init__(self, connection, room, name=None):
+        super().__init__()
+        self.connection = connection
+        self.room = room
+        # Номер своего игрока (None - общий экран стола или зритель)
+        self.player = None
+        self.table = name is None
+        self.version = 0
+        self.connected = True
+        self.task = None
+        # Последнее известное состояние комнаты целиком
+        self.view = {}
+        # Вход в комнату повторяется при каждом переподключении
+        connection.hello = {"op": "join", "room": room, "name": name}
+        connection.send(connection.hello)
+
+    def poll(self):
+        """Применяет пришедшие изменения; True, если состояние поменялось"""
+        changed = False
+        while True:
+            try:
+                message = self.connection.messages.get_nowait()
+            except queue.Empty:
+                return changed
+            if message is None:
+                if self.connected:
+                    print("Соединение с сервером потеряно, переподключение...")
+                self.connected = False
+                continue
+            if message["type"] == "state":
+                if not self.connected:
+                    print("Соединение с сервером восстановлено")
+                self.connected = True
+                self.player = message["player"]
+                self.table = message["table"]
+                self.version = message["version"]
+                self.view = {}
+                self.apply(message["view"])
+                changed = True
+            elif message["type"] == "delta" and message["version"] > self.version:
+                self.version = message["version"]
+                self.apply(message["changes"])
+                changed = True
+
+    def apply(self, changes):
+        self.view.update(changes)
+        if "players" in changes:
+            # Объекты игроков сохраняются между обновлениями: к ним привязаны аватары
+            players = changes["players"]
+            del self.players[len(players):]
+            for i, (name, color, score) in enumerate(players):
+                if i == len(self.players) or self.players[i].name != name:
+                    self.players[i:i + 1] = [Player(name, tuple(color))]
+                self.players[i].score = score
+            # Очки приходят готовыми, таблица строится заново
+            self.leaderboard = Leaderboard(self.players)
+        if "state" in changes:
+            self.state = changes["state"]
+        if "current_player" in changes:
+            self.current_player_idx = changes["current_player"]
+        if "round" in changes:
+            self.round_counter = changes["round"]
+        if "tasks_per_category" in changes:
+            self.tasks_per_category = changes["tasks_per_category"]
+        if "selected" in changes:
+            self.selected_category, self.selected_difficulty = changes["selected"] or (None, None)
+        if "task" in changes:
+            self.task = changes["task"]
+        if "board" in changes or "difficulty" in changes:
+            # Поле и сложности приходят, только если изменились, - нужны оба последних
+            if self.view["board"] is None:
+                self.tasks = None
+            else:
+                self.tasks = TaskBoard(None)
+                for indices, difficulty in zip(self.view["board"], self.view["difficulty"]):
+                    self.tasks.add_category(indices, difficulty)
+        if self.tasks is not None:
+            for category, mask in enumerate(self.view["completed"]):
+                self.tasks.set_completed(category, mask)
+
+    def task_text(self, category, difficulty):
+        return tuple(self.task) if self.task else ("", "")
+
+    # Действия отправляются на сервер; результат придет вместе с состоянием
+    def add_player(self, name, color=None):
+        if name and len(self.players) < self.MAX_PLAYERS:
+            self.connection.send({"op": "add_player", "name": name})
+            return True
+        return False
+
+    def start_game(self, tasks_per_category=None, board=None):
+        self.connection.send({"op": "start", "tasks": tasks_per_category})
+        return True
+
+    def select_task(self, category, difficulty):
+        self.connection.send({"op": "select", "category": category, "index": difficulty})
+        return True
+
+    def complete_task(self, success):
+        self.connection.send({"op": "complete", "success": success})
+        return True
+
+    def replace_task(self, category, index, task):
+        self.connection.send({"op": "replace", "category": category, "index": index, "task": task})
+        return True
+
+    def continue_game(self):
+        self.connection.send({"op": "continue"})
+
+    def new_game(self):
+        self.connection.send({"op": "new_game"})
+
+    def close(self):
+        self.connection.close()
+
+
+def connect(address, room, name=None, notify=None):
+    """RemoteGame комнаты room на сервере address ('host:port')"""
+    return RemoteGame(Connection(parse_address(address), notify), room, name)
@@ -0,0 +1,373 @@
+"""Колоды заданий в виде скомпилированного пакета.
+
+Исходный формат - текстовые файлы data/*.txt, по одному заданию в строке
+(у загадок ответ отделяется символом "|", сложность задания можно указать
+числом после второго "|"); строка с параметрами в фигурных
+скобках - шаблон многих заданий (см. generators.py). Для игры они
+собираются в один бинарный пакет с таблицей смещений, который открывается
+через mmap: при старте читается только заголовок, а текст задания
+декодируется (или строится по шаблону) в момент, когда задание попадает
+на поле. Задания по шаблонам нумеруются в категории после обычных.
+
+Устройство пакета (все числа little-endian):
+    заголовок      MAGIC, версия, число категорий
+    источники      для каждой категории: mtime_ns, размер файла,
+                   индекс первого задания, число заданий, индекс первого
+                   шаблона, число шаблонов
+    таблица        для каждого задания: смещение текста, длина вопроса,
+                   длина ответа, категория, сложность (0 - по месту на поле),
+                   группа почти одинаковых заданий (номер первого задания
+                   группы в категории, см. dedup.py)
+    шаблоны        для каждого шаблона: смещение текста, длина шаблона,
+                   длина ответа
+    текст          UTF-8 вопросы и ответы подряд
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+import dedup
+import generators
+
+MAGIC = b"PDRK"
+VERSION = 3
+
+# Порядок категорий совпадает с порядком столбцов на игровом поле
+CATEGORY_FILES = ["riddles.txt", "creativity.txt", "words.txt", "physical.txt"]
+DATA_DIR = "data"
+PACK_NAME = "tasks.pack"
+
+HEADER = struct.Struct("<4sHH")
+SOURCE = struct.Struct("<QQIIII")
+RECORD = struct.Struct("<IIIBBI")
+TEMPLATE = struct.Struct("<III")
+
+
+def parse_line(line):
+    """Разбирает строку исходного файла на вопрос, ответ и сложность.
+
+    Сложность (1..MAX_DIFFICULTY) пишется числом третьим полем:
+    "вопрос|ответ|7"; без нее - 0, и сложность задания на поле зависит
+    от его места среди остальных (см. Game.board_difficulty).
+    """
+    question, _, answer = line.partition("|")
+    difficulty = 0
+    rest, sep, last = answer.rpartition("|")
+    if sep and last.strip().isdigit():
+        answer, difficulty = rest, int(last)
+        if not 1 <= difficulty <= generators.MAX_DIFFICULTY:
+            raise ValueError(f"сложность {difficulty} вне 1-{generators.MAX_DIFFICULTY}: {question.strip()}")
+    return question.strip(), answer.strip(), difficulty
+
+
+def read_source(path):
+    """Задания из текстового файла, пустые строки пропускаются"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [parse_line(line) for line in f if line.strip()]
+
+
+def compile_pack(decks, sources=None):
+    """Собирает пакет из списков (вопрос, ответ[, сложность]) по категориям.
+
+    sources - пары (mtime_ns, размер) исходных файлов для проверки
+    актуальности; без них пакет считается всегда устаревшим.
+    """
+    sources = sources or [(0, 0)] * len(decks)
+    records = []
+    templates = []
+    text = bytearray()
+    table = []
+    for category, tasks in enumerate(decks):
+        static = [task for task in tasks if not generators.is_template(task[0])]
+        patterns = [task for task in tasks if generators.is_template(task[0])]
+        table.append((len(records), len(static), len(templates), len(patterns)))
+        groups = dedup.near_duplicate_groups([task[0] for task in static])
+        for (question, answer, *difficulty), group in zip(static, groups):
+            q = question.encode("utf-8")
+            a = answer.encode("utf-8")
+            records.append((len(text), len(q), len(a), category, difficulty[0] if difficulty else 0, group))
+            text += q
+            text += a
+        for question, answer, *difficulty in patterns:
+            if difficulty and difficulty[0]:
+                raise ValueError(f"сложность шаблона задают его параметры: {question}")
+            # Ошибка в шаблоне видна при сборке, а не когда задание попадет на поле
+            generators.Template(question)
+            q = question.encode("utf-8")
+            a = answer.encode("utf-8")
+            templates.append((len(text), len(q), len(a)))
+            text += q
+            text += a
+
+    text_offset = (HEADER.size + SOURCE.size * len(decks) + RECORD.size * len(records)
+                   + TEMPLATE.size * len(templates))
+    out = bytearray(HEADER.pack(MAGIC, VERSION, len(decks)))
+    for (mtime, size), counts in zip(sources, table):
+        out += SOURCE.pack(mtime, size, *counts)
+    for offset, q_len, a_len, category, difficulty, group in records:
+        out += RECORD.pack(text_offset + offset, q_len, a_len, category, difficulty, group)
+    for offset, q_len, a_len in templates:
+        out += TEMPLATE.pack(text_offset + offset, q_len, a_len)
+    out += text
+    return bytes(out)
+
+
+def source_stamps(data_dir):
+    """mtime и размер исходных файлов - по ним видно, что пакет устарел"""
+    stamps = []
+    for name in CATEGORY_FILES:
+        st = os.stat(os.path.join(data_dir, name))
+        stamps.append((st.st_mtime_ns, st.st_size))
+    return stamps
+
+
+def build_pack(data_dir=DATA_DIR, pack_path=None):
+    """Компилирует data/*.txt в пакет и атомарно заменяет старый"""
+    pack_path = pack_path or os.path.join(data_dir, PACK_NAME)
+    stamps = source_stamps(data_dir)
+    decks = [read_source(os.path.join(data_dir, name)) for name in CATEGORY_FILES]
+    data = compile_pack(decks, stamps)
+    # Свой временный файл у каждой сборки: процессы, пересобирающие пакет
+    # одновременно, не переименовывают файлы друг у друга
+    fd, tmp_path = tempfile.mkstemp(prefix=PACK_NAME + ".", suffix=".tmp",
+                                    dir=os.path.dirname(pack_path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp создает файл только для владельца
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, pack_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return pack_path
+
+
+class Deck:
+    """Задания из пакета; текст декодируется только по запросу.
+
+    ranges - обычные задания категорий (индекс первого в таблице, число),
+    templates - шаблоны категорий (generators.Template), starts - номера
+    первых заданий шаблонов в категории.
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, categories = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("неизвестный формат пакета заданий")
+        self.sources = []
+        self.ranges = []
+        template_ranges = []
+        for i in range(categories):
+            mtime, size, first, count, template_first, template_count = SOURCE.unpack_from(
+                buffer, HEADER.size + i * SOURCE.size)
+            self.sources.append((mtime, size))
+            self.ranges.append((first, count))
+            template_ranges.append((template_first, template_count))
+        self.table_offset = HEADER.size + SOURCE.size * categories
+        records = sum(count for _, count in self.ranges)
+        self.templates_offset = self.table_offset + RECORD.size * records
+        
+        # Шаблоны - несколько строк, они разбираются сразу
+        self.templates = []
+        self.starts = []
+        self.counts = []
+        for (_, count), (template_first, template_count) in zip(self.ranges, template_ranges):
+            templates = []
+            starts = []
+            for i in range(template_first, template_first + template_count):
+                offset, q_len, a_len = TEMPLATE.unpack_from(buffer, self.templates_offset + i * TEMPLATE.size)
+                question = bytes(buffer[offset:offset + q_len]).decode("utf-8")
+                answer = bytes(buffer[offset + q_len:offset + q_len + a_len]).decode("utf-8")
+                templates.append(generators.Template(question, answer))
+                starts.append(count)
+                count += len(templates[-1])
+            self.templates.append(templates)
+            self.starts.append(starts)
+            self.counts.append(count)
+
+    @classmethod
+    def open(cls, pack_path):
+        with open(pack_path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @property
+    def categories_count(self):
+        return len(self.ranges)
+
+    def count(self, category):
+        """Число заданий категории вместе с заданиями по шаблонам"""
+        return self.counts[category]
+
+    def template(self, category, index):
+        """Шаблон задания и номер задания в нем; для обычного задания - (None, index)"""
+        if not 0 <= index < self.counts[category]:
+            raise IndexError(index)
+        if index < self.ranges[category][1]:
+            return None, index
+        i = bisect.bisect_right(self.starts[category], index) - 1
+        return self.templates[category][i], index - self.starts[category][i]
+
+    def record(self, category, index):
+        first, _ = self.ranges[category]
+        return RECORD.unpack_from(self.buffer, self.table_offset + (first + index) * RECORD.size)
+
+    def task(self, category, index):
+        """Возвращает (вопрос, ответ, сложность) задания категории"""
+        template, index = self.template(category, index)
+        if template is not None:
+            return template.task(index), template.answer, template.difficulty(index)
+        offset, q_len, a_len, _, difficulty, _ = self.record(category, index)
+        question = bytes(self.buffer[offset:offset + q_len]).decode("utf-8")
+        answer = bytes(self.buffer[offset + q_len:offset + q_len + a_len]).decode("utf-8")
+        return question, answer, difficulty
+
+    def difficulty(self, category, index):
+        """Сложность задания без декодирования текста"""
+        template, index = self.template(category, index)
+        if template is not None:
+            return template.difficulty(index)
+        return self.record(category, index)[4]
+
+    def group(self, category, index):
+        """Группа почти одинаковых заданий: номер первого задания группы"""
+        template, local = self.template(category, index)
+        if template is not None:
+            return index - local + template.group(local)
+        return self.record(category, index)[5]
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+def open_deck(data_dir=DATA_DIR):
+    """Открывает пакет, пересобирая его, если исходные файлы изменились"""
+    pack_path = os.path.join(data_dir, PACK_NAME)
+    stamps = source_stamps(data_dir)
+    try:
+        deck = Deck.open(pack_path)
+        if deck.sources == stamps:
+            return deck
+        deck.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    return Deck.open(build_pack(data_dir, pack_path))
+
+
+def validate(deck):
+    """Проверяет пакет целиком, не декодируя текст; ошибки - ValueError"""
+    if deck.categories_count != len(CATEGORY_FILES):
+        raise ValueError(f"в пакете {deck.categories_count} категорий вместо {len(CATEGORY_FILES)}")
+    size = len(deck.buffer)
+    expected = 0
+    for category, (first, count) in enumerate(deck.ranges):
+        if first != expected:
+            raise ValueError(f"нарушен порядок заданий в категории {CATEGORY_FILES[category]}")
+        if deck.count(category) == 0:
+            raise ValueError(f"нет заданий в {CATEGORY_FILES[category]}")
+        expected += count
+        for i in range(first, first + count):
+            offset, q_len, a_len, record_category, _, group = RECORD.unpack_from(
+                deck.buffer, deck.table_offset + i * RECORD.size)
+            if (record_category != category or q_len == 0 or offset + q_len + a_len > size
+                    or group > i - first):
+                raise ValueError(f"повреждено задание {i - first + 1} в {CATEGORY_FILES[category]}")
+
+
+class DeckRegistry:
+    """Одна колода на процесс, общая для всех партий.
+
+    Колода привязана к mtime и размеру исходных файлов. Пока работает
+    фоновый наблюдатель (start_watching), get() сразу возвращает текущий
+    пакет, а правки файлов собирает и проверяет наблюдатель; без него
+    изменения проверяет сам get(). Новая версия собирается без блокировки
+    и подменяет старую одним присваиванием; если она не прошла проверку,
+    остается предыдущая. Замененный пакет закрывается, когда его перестают
+    использовать партии, начатые с ним.
+    """
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.deck = None
+        self.stamps = None
+        self.generation = 0
+        # lock защищает подмену колоды, building - сборку (одна за раз)
+        self.lock = threading.Lock()
+        self.building = threading.Lock()
+        self.watcher = None
+        # Замененные колоды: слабая ссылка и буфер, который закрывается вместе с ней
+        self.retired = []
+
+    def get(self):
+        if self.deck is None or self.watcher is None:
+            self.refresh()
+        deck = self.deck
+        if deck is None:
+            raise ValueError("колода заданий не загружена")
+        return deck
+
+    def refresh(self):
+        """Перечитывает колоду, если исходные файлы изменились"""
+        with self.building:
+            self.close_retired()
+            try:
+                stamps = source_stamps(self.data_dir)
+                if stamps == self.stamps:
+                    return False
+                # Запоминаем и неудачную версию, чтобы не пересобирать ее на каждом вызове
+                self.stamps = stamps
+                deck = open_deck(self.data_dir)
+                try:
+                    validate(deck)
+                except (ValueError, struct.error):
+                    deck.close()
+                    raise
+            except (OSError, ValueError, struct.error) as e:
+                if self.deck is None:
+                    raise
+                print(f"Колода не обновлена: {e}")
+                return False
+            with self.lock:
+                old, self.deck = self.deck, deck
+                self.generation += 1
+            if old is not None:
+                self.retired.append((weakref.ref(old), old.buffer))
+            return True
+
+    def close_retired(self):
+        """Закрывает замененные колоды, которыми больше не пользуется ни одна партия"""
+        alive = []
+        for ref, buffer in self.retired:
+            if ref() is None:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+            else:
+                alive.append((ref, buffer))
+        self.retired = alive
+
+    def start_watching(self, interval=1.0):
+        """Следит за data/ в фоновом потоке, чтобы правки были готовы к новой партии"""
+        if self.watcher is None:
+            self.watcher = threading.Thread(target=self.watch, args=(interval,), daemon=True)
+            self.watcher.start()
+
+    def watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Ошибка наблюдения за заданиями: {e}")
+
+
+if __name__ == "__main__":
+    # python deck.py [папка] - собрать пакет вручную
+    deck = Deck.open(build_pack(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR))
+    for category, name in enumerate(CATEGORY_FILES):
+        print(f"{name}: {deck.count(category)} (шаблонов {len(deck.templates[category])})")
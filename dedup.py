@@ -0,0 +1,192 @@
+"""Поиск почти одинаковых заданий (MinHash и LSH).
+
+Текст задания нормализуется (регистр, ё, числа заменяются одним знаком,
+пунктуация убирается) и разбивается на шинглы - перекрывающиеся куски по
+SHINGLE символов. Для каждого задания считается подпись MinHash из
+NUM_PERM минимумов хешей, подпись режется на BANDS полос: задания, у
+которых совпала хотя бы одна полоса, становятся кандидатами и
+проверяются точным сходством Жаккара шинглов. Время работы растет
+линейно с числом заданий, попарного сравнения всей колоды нет.
+
+Группы почти одинаковых заданий считаются при сборке пакета (deck.py),
+а поле партии не получает два задания из одной группы. Отчет по колоде:
+
+    python dedup.py                  # группы в data/*.txt
+    python dedup.py --synthetic 50000   # время на большой колоде
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Длина шингла в символах и порог сходства Жаккара для "почти одинаковых"
+SHINGLE = 4
+THRESHOLD = 0.7
+# Подпись MinHash: BANDS полос по ROWS значений
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+# Заданий на одну векторную операцию NumPy (ограничивает память)
+CHUNK = 2000
+
+# Хеш-функции MinHash - умножение со сдвигом: старшие 32 бита (a * x + b) mod 2**64,
+# a нечетное; одинаковые при каждом запуске, поэтому пакет собирается одинаково
+_rng = random.Random(20240601)
+PERM_A = [_rng.randrange(1, 1 << 64, 2) for _ in range(NUM_PERM)]
+PERM_B = [_rng.randrange(0, 1 << 64) for _ in range(NUM_PERM)]
+MASK = (1 << 64) - 1
+
+NUMBER = re.compile(r"\d+")
+NOT_WORD = re.compile(r"[^\w#]+")
+
+
+def normalize(text):
+    text = text.lower().replace("ё", "е")
+    text = NUMBER.sub("#", text)
+    return NOT_WORD.sub(" ", text).strip()
+
+
+def shingles(text):
+    """Хеши шинглов нормализованного текста (множество чисел до 2**32)"""
+    text = normalize(text)
+    if len(text) <= SHINGLE:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i:i + SHINGLE].encode("utf-8")) for i in range(len(text) - SHINGLE + 1)}
+
+
+def signatures(sets):
+    """Подписи MinHash: для каждого множества - ключи BANDS полос"""
+    if np is None:
+        result = []
+        for hashes in sets:
+            signature = [min(((a * x + b) & MASK) >> 32 for x in hashes) for a, b in zip(PERM_A, PERM_B)]
+            result.append([tuple(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)])
+        return result
+
+    a = np.array(PERM_A, np.uint64)[:, None]
+    b = np.array(PERM_B, np.uint64)[:, None]
+    result = []
+    for start in range(0, len(sets), CHUNK):
+        chunk = sets[start:start + CHUNK]
+        lengths = np.fromiter((len(hashes) for hashes in chunk), np.int64, len(chunk))
+        values = np.fromiter((x for hashes in chunk for x in hashes), np.uint64, int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        # Переполнение uint64 и есть mod 2**64
+        hashed = (a * values[None, :] + b) >> np.uint64(32)
+        minimums = np.minimum.reduceat(hashed, offsets, axis=1).T
+        bands = minimums.reshape(len(chunk), BANDS, ROWS)
+        result.extend([row.tobytes() for row in task] for task in bands)
+    return result
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+def near_duplicate_groups(texts, threshold=THRESHOLD):
+    """Для каждого текста - номер первого текста его группы почти одинаковых"""
+    sets = [shingles(text) for text in texts]
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(first, second):
+        root_first, root_second = find(first), find(second)
+        parent[max(root_first, root_second)] = min(root_first, root_second)
+
+    # Задания с одинаковыми шинглами (например, отличающиеся только числами)
+    # объединяются сразу, в LSH идет одно из них: корзины остаются маленькими
+    unique = {}
+    representatives = []
+    for i, hashes in enumerate(sets):
+        first = unique.setdefault(frozenset(hashes), i)
+        if first == i:
+            representatives.append(i)
+        else:
+            union(first, i)
+
+    bands = signatures([sets[i] for i in representatives])
+    # Пары, которые совпали в нескольких полосах, проверяются один раз
+    checked = set()
+    for band in range(BANDS):
+        buckets = {}
+        for i, keys in zip(representatives, bands):
+            # Задание сравнивается со всеми, кто уже лежит в его корзине
+            members = buckets.get(keys[band])
+            if members is None:
+                buckets[keys[band]] = [i]
+                continue
+            for other in members:
+                if (other, i) in checked or find(other) == find(i):
+                    continue
+                checked.add((other, i))
+                if jaccard(sets[other], sets[i]) >= threshold:
+                    union(other, i)
+            members.append(i)
+    return [find(i) for i in range(len(texts))]
+
+
+def report(name, texts, groups, limit):
+    members = {}
+    for index, group in enumerate(groups):
+        members.setdefault(group, []).append(index)
+    duplicates = sorted((indices for indices in members.values() if len(indices) > 1), key=len, reverse=True)
+    print(f"{name}: заданий {len(texts)}, различных {len(members)}, групп почти одинаковых {len(duplicates)}")
+    for indices in duplicates[:limit]:
+        print(f"  {len(indices)} шт.: " + " / ".join(texts[i] for i in indices[:3])
+              + (" / ..." if len(indices) > 3 else ""))
+
+
+def synthetic(count, rng):
+    """Колода для замера скорости: треть - шаблонные задания, остальные - из случайных слов"""
+    syllables = ["ко", "ма", "ре", "ти", "на", "лу", "пе", "за", "ви", "до", "су", "ры", "ше", "га", "бо", "ля"]
+    words = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+    tasks = []
+    for i in range(count):
+        if i % 3 == 0:
+            tasks.append(f"Сделайте {rng.randint(1, 30)} {rng.choice(['приседаний', 'прыжков', 'хлопков'])}")
+        else:
+            tasks.append(" ".join(rng.choice(words) for _ in range(rng.randint(5, 10))).capitalize())
+    return tasks
+
+
+def main():
+    import deck
+    import generators
+
+    parser = argparse.ArgumentParser(description="Почти одинаковые задания в колоде")
+    parser.add_argument("data_dir", nargs="?", default=deck.DATA_DIR)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="порог сходства Жаккара")
+    parser.add_argument("--limit", type=int, default=5, help="групп в отчете на категорию")
+    parser.add_argument("--synthetic", type=int, help="замер на случайной колоде из N заданий")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        texts = synthetic(args.synthetic, random.Random(1))
+        started = time.perf_counter()
+        groups = near_duplicate_groups(texts, args.threshold)
+        elapsed = time.perf_counter() - started
+        report("синтетическая колода", texts, groups, args.limit)
+        print(f"Время: {elapsed:.2f} с ({elapsed / len(texts) * 1e6:.0f} мкс на задание"
+              f"{', без NumPy' if np is None else ''})")
+        return
+    for name in deck.CATEGORY_FILES:
+        # Шаблоны группируются по своим параметрам (см. generators.py)
+        texts = [question for question, *_ in deck.read_source(f"{args.data_dir}/{name}")
+                 if not generators.is_template(question)]
+        report(name, texts, near_duplicate_groups(texts, args.threshold), args.limit)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
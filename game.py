@@ -0,0 +1,462 @@
+"""Правила игры без интерфейса: игроки, поле заданий, ход партии.
+
+Модуль не зависит от pygame, поэтому партии можно проигрывать без окна
+(см. simulate.py).
+"""
+import random
+import uuid
+from array import array
+
+import deck
+from generators import MAX_DIFFICULTY
+
+def deck_version(task_data):
+    """Версия колоды для снимка: mtime и размер исходного файла каждой категории"""
+    return [list(source) for source in task_data.sources]
+
+class Player:
+    def __init__(self, name, color=None, rng=random):
+        self.name = name
+        self.score = 0
+        self.color = color or (rng.randint(50, 200), rng.randint(50, 200), rng.randint(50, 200))
+        # Таблица результатов партии, номер добавления и место в ней (с нуля)
+        self.leaderboard = None
+        self.joined = 0
+        self.place = 0
+        
+    def add_score(self, points):
+        self.score += points
+        if self.leaderboard is not None:
+            self.leaderboard.update(self)
+
+class Leaderboard:
+    """Игроки по убыванию очков, при равенстве - в порядке добавления.
+
+    Порядок поддерживается при каждом начислении очков: игрок сдвигается
+    на свое новое место, а не сортируется весь список. version растет
+    при каждом изменении таблицы.
+    """
+    def __init__(self, players=()):
+        self.order = []
+        self.version = 0
+        for player in players:
+            self.add(player)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, place):
+        return self.order[place]
+
+    def add(self, player):
+        player.leaderboard = self
+        player.joined = player.place = len(self.order)
+        self.order.append(player)
+        self.update(player)
+
+    def update(self, player):
+        """Переносит игрока на место по его текущим очкам"""
+        order = self.order
+        key = (-player.score, player.joined)
+        i = player.place
+        while i > 0 and key < (-order[i - 1].score, order[i - 1].joined):
+            order[i] = order[i - 1]
+            order[i].place = i
+            i -= 1
+        while i < len(order) - 1 and (-order[i + 1].score, order[i + 1].joined) < key:
+            order[i] = order[i + 1]
+            order[i].place = i
+            i += 1
+        order[i] = player
+        player.place = i
+        self.version += 1
+
+# Колода заданий, общая для всех партий процесса
+decks = deck.DeckRegistry()
+
+class TaskBoard:
+    """Задания на поле.
+
+    По каждой категории хранятся параллельные массивы номеров заданий в колоде
+    и их сложности, а выполненные задания - битовой маской. Текст задания
+    берется из колоды только когда его открывают; задания, которых уже нет
+    в колоде (партия восстановлена после правки файлов), хранят свой текст.
+    """
+    __slots__ = ("deck", "indices", "difficulty", "completed", "done", "pinned")
+
+    def __init__(self, deck):
+        self.deck = deck
+        self.indices = []
+        self.difficulty = []
+        self.completed = []
+        self.done = []
+        # (категория, место) -> (вопрос, ответ) заданий не из текущей колоды
+        self.pinned = {}
+
+    def add_category(self, indices, difficulty):
+        self.indices.append(array("I", indices))
+        self.difficulty.append(array("H", difficulty))
+        self.completed.append(0)
+        self.done.append(0)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def size(self, category):
+        return len(self.indices[category])
+
+    @property
+    def total(self):
+        return sum(len(indices) for indices in self.indices)
+
+    @property
+    def completed_count(self):
+        return sum(self.done)
+
+    def remaining(self, category):
+        return len(self.indices[category]) - self.done[category]
+
+    def is_completed(self, category, index):
+        return self.completed[category] >> index & 1
+
+    def complete(self, category, index):
+        """Отмечает задание выполненным; False, если оно уже было выполнено"""
+        bit = 1 << index
+        if self.completed[category] & bit:
+            return False
+        self.completed[category] |= bit
+        self.done[category] += 1
+        return True
+
+    def replace(self, category, index, task, difficulty):
+        """Ставит на место index задание task из колоды"""
+        self.indices[category][index] = task
+        self.difficulty[category][index] = difficulty
+        self.pinned.pop((category, index), None)
+
+    def pin(self, category, index, text):
+        """Закрепляет за местом поля текст задания (вопрос, ответ)"""
+        self.pinned[(category, index)] = tuple(text)
+
+    def set_completed(self, category, mask):
+        """Восстанавливает выполненные задания категории по битовой маске"""
+        self.completed[category] = mask
+        self.done[category] = bin(mask).count("1")
+
+    def first_free(self, category):
+        """Номер первого невыполненного задания категории или None"""
+        mask = self.completed[category]
+        index = (~mask & (mask + 1)).bit_length() - 1
+        return index if index < len(self.indices[category]) else None
+
+    def text(self, category, index):
+        """Вопрос и ответ задания"""
+        pinned = self.pinned.get((category, index))
+        if pinned is not None:
+            return pinned
+        question, answer, _ = self.deck.task(category, self.indices[category][index])
+        return question, answer
+
+class Game:
+    # Допустимое число заданий в категории
+    MIN_TASKS = 5
+    MAX_TASKS = 50
+    MAX_PLAYERS = 200
+    # Выборка кандидатов для поля растет не больше чем до MAX_SAMPLE заданий на место
+    MAX_SAMPLE = 64
+
+    def __init__(self, deck=None, rng=None):
+        """deck - своя колода вместо общего реестра (например, для симуляций),
+        rng - генератор случайных чисел партии (random.Random с известным seed
+        делает партию воспроизводимой)
+        """
+        self.deck = deck
+        self.rng = rng or random.Random()
+        self.players = []
+        self.leaderboard = Leaderboard()
+        self.current_player_idx = 0
+        self.state = "SETUP"
+        self.tasks_per_category = 20
+        self.categories = ["Загадки", "Творчество", "Слова", "Физподготовка"]
+        self.selected_category = None
+        self.selected_difficulty = None
+        self.round_counter = 0
+        # Поле и колода появляются только при начале партии
+        self.task_data = None
+        self.tasks = None
+        # Журнал партии (journal.Journal), если ход игры нужно сохранять,
+        # и статистика партий (stats.Stats)
+        self.journal = None
+        self.stats = None
+        # Ключ партии в статистике; сохраняется в журнале, чтобы восстановленная
+        # после падения партия продолжала ту же запись
+        self.session_id = None
+        
+    def load_tasks(self):
+        """Колода заданий из общего реестра (с правками data/*.txt, если они были)"""
+        if self.deck is not None:
+            return self.deck
+        try:
+            return decks.get()
+        except Exception as e:
+            print(f"Ошибка загрузки заданий: {e}")
+            # Резервные задания
+            return deck.Deck(deck.compile_pack([
+                [("Загадка 1", ""), ("Загадка 2", "")],
+                [("Творческое задание 1", ""), ("Творческое задание 2", "")],
+                [("Словесное задание 1", ""), ("Словесное задание 2", "")],
+                [("Физическое задание 1", ""), ("Физическое задание 2", "")]
+            ]))
+    
+    def setup_tasks(self, board=None, sources=None, difficulty=None, texts=None):
+        """board - номера заданий в колоде по категориям (при восстановлении партии),
+        sources - версия колоды, из которой они взяты (Deck.sources),
+        difficulty - сложности заданий поля, texts - их тексты (из снимка партии)
+        """
+        # Каждое новое поле берет актуальную версию колоды
+        self.task_data = self.load_tasks()
+        # Те же номера в измененной колоде - другие задания: поле восстанавливается
+        # по сохраненным текстам, а без них раздается заново (игроки и очки остаются)
+        changed = board is not None and sources is not None and deck_version(self.task_data) != sources
+        if changed and texts is None:
+            print("Файлы заданий изменились после сохранения партии, поле раздано заново")
+            board = difficulty = None
+        
+        # Создание структуры для хранения состояния заданий
+        self.tasks = TaskBoard(self.task_data)
+        for cat_idx in range(4):
+            available = self.task_data.count(cat_idx)
+            if board is not None:
+                indices = board[cat_idx]
+                values = difficulty[cat_idx] if difficulty is not None else self.board_difficulty(cat_idx, indices)
+            else:
+                indices = self.deal(cat_idx, min(available, self.tasks_per_category, self.MAX_TASKS))
+                values = self.board_difficulty(cat_idx, indices)
+                # На поле задания идут по возрастанию сложности
+                order = sorted(range(len(indices)), key=values.__getitem__)
+                indices = [indices[j] for j in order]
+                values = [values[j] for j in order]
+            self.tasks.add_category(indices, values)
+            if changed and texts is not None:
+                for j, (index, text) in enumerate(zip(indices, texts[cat_idx])):
+                    if index >= available or list(self.task_data.task(cat_idx, index)[:2]) != list(text):
+                        self.tasks.pin(cat_idx, j, text)
+    
+    def board_difficulty(self, category, indices):
+        """Сложности заданий поля на общей для всех категорий шкале 1..MAX_DIFFICULTY.
+
+        Сложность задают параметры шаблона или третье поле строки в data/*.txt.
+        Задания без нее (обычные без поля и шаблоны без трудных параметров)
+        намеренно равномерно занимают шкалу в порядке, в котором стоят на поле:
+        на каждом поле есть и легкие, и трудные задания, а сложность такого
+        задания меняется от партии к партии. После сортировки по сложности их
+        порядок не меняется, поэтому сложности восстановленного поля совпадают
+        с исходными.
+        """
+        values = [self.task_data.difficulty(category, index) for index in indices]
+        free = [j for j, value in enumerate(values) if value == 0]
+        for rank, j in enumerate(free):
+            values[j] = 1 + round(rank * (MAX_DIFFICULTY - 1) / max(1, len(free) - 1))
+        return values
+    
+    def deal(self, category, count):
+        """Случайные номера заданий категории для поля.
+
+        Почти одинаковые задания (одна группа в колоде, см. dedup.py) попадают
+        на одно поле, только если различных не хватает - тогда поровну.
+        """
+        deck = self.task_data
+        available = deck.count(category)
+        # Колоду целиком не перемешиваем и не читаем: обычно хватает выборки с запасом,
+        # а если в ней мало различных групп, выборка растет по шагам
+        size = count * 2
+        while True:
+            candidates = self.rng.sample(range(available), min(available, size))
+            groups = [deck.group(category, index) for index in candidates]
+            if len(candidates) == available or len(set(groups)) >= count or size >= count * self.MAX_SAMPLE:
+                break
+            size *= 4
+        
+        # Сначала по одному заданию из каждой группы, потом по второму и так далее
+        picked = []
+        taken = set()
+        used = {}
+        limit = 1
+        while len(picked) < count:
+            for index, group in zip(candidates, groups):
+                if index not in taken and used.get(group, 0) < limit:
+                    picked.append(index)
+                    taken.add(index)
+                    used[group] = used.get(group, 0) + 1
+                    if len(picked) == count:
+                        break
+            limit += 1
+        return picked
+    
+    @property
+    def total_tasks(self):
+        return self.tasks.total
+    
+    @property
+    def completed_tasks(self):
+        return self.tasks.completed_count
+    
+    @property
+    def tasks_remaining(self):
+        return self.tasks.total - self.tasks.completed_count
+    
+    @property
+    def task_in_progress(self):
+        """Выбрано задание, которое еще не принято и не отклонено"""
+        return self.selected_category is not None
+    
+    def task_text(self, category, difficulty):
+        """Описание и ответ задания (для загадок без ответа - заглушка)"""
+        description, answer = self.tasks.text(category, difficulty)
+        if not answer and category == 0:
+            answer = self.get_answer(category, difficulty)
+        return description, answer
+    
+    def get_answer(self, category, difficulty):
+        if category == 0:
+            return self.generate_answer(category, difficulty)
+        return ""
+    
+    def generate_answer(self, category, difficulty):
+        # В реальном приложении здесь должна быть логика получения ответов
+        return f"Ответ на загадку {difficulty + 1}"
+    
+    def log(self, *entry):
+        """Передает изменение состояния в журнал партии и статистику, если они подключены"""
+        if self.journal is not None:
+            self.journal.append(entry)
+        if self.stats is not None:
+            self.stats.record(self, entry)
+    
+    def start_game(self, tasks_per_category=None, board=None, session_id=None, sources=None):
+        if len(self.players) < 2:
+            return False
+        
+        count = self.tasks_per_category if tasks_per_category is None else tasks_per_category
+        if count < self.MIN_TASKS or count > self.MAX_TASKS:
+            return False
+        self.tasks_per_category = count
+        self.setup_tasks(board, sources)
+        self.state = "PLAYING"
+        self.round_counter = 0
+        self.session_id = session_id or uuid.uuid4().hex
+        self.log("start", count, [list(indices) for indices in self.tasks.indices], self.session_id,
+                 deck_version(self.task_data))
+        return True
+    
+    def continue_game(self):
+        """Продолжение после промежуточных результатов"""
+        if self.state == "INTERMEDIATE_RESULTS":
+            self.state = "PLAYING"
+            self.log("continue")
+    
+    def add_player(self, name, color=None):
+        if name and len(self.players) < self.MAX_PLAYERS:
+            player = Player(name, color, self.rng)
+            self.players.append(player)
+            self.leaderboard.add(player)
+            self.log("player", name, list(player.color))
+            return True
+        return False
+    
+    def next_player(self):
+        self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
+        # Когда игроков больше, чем заданий, поле кончается посреди раунда
+        if self.current_player_idx == 0 or self.tasks_remaining == 0:
+            self.round_counter += 1
+            if self.tasks_remaining < len(self.players):
+                self.state = "GAME_OVER"
+            else:
+                self.state = "INTERMEDIATE_RESULTS"
+    
+    def select_task(self, category, difficulty):
+        if (self.state == "PLAYING" and not self.task_in_progress
+                and 0 <= category < 4 and 0 <= difficulty < self.tasks.size(category)):
+            if not self.tasks.is_completed(category, difficulty):
+                self.selected_category = category
+                self.selected_difficulty = difficulty
+                self.log("select", category, difficulty)
+                return True
+        return False
+    
+    def complete_task(self, success):
+        if self.task_in_progress:
+            category, index = self.selected_category, self.selected_difficulty
+            if self.tasks.complete(category, index):
+                # Смена игрока и раунда следуют из результата, отдельно не пишутся
+                self.log("complete", success)
+                if success:
+                    points = self.tasks.difficulty[category][index]
+                    self.players[self.current_player_idx].add_score(points)
+                    
+                self.selected_category = None
+                self.selected_difficulty = None
+                self.next_player()
+                return True
+        return False
+    
+    def replace_task(self, category, index, task):
+        """Заменяет невыполненное задание поля заданием task той же категории колоды"""
+        if (self.state == "PLAYING" and not self.task_in_progress
+                and 0 <= category < 4 and 0 <= index < self.tasks.size(category)
+                and not self.tasks.is_completed(category, index)
+                and 0 <= task < self.task_data.count(category) and task not in self.tasks.indices[category]):
+            # Задание без своей сложности занимает место со сложностью заменяемого
+            difficulty = self.task_data.difficulty(category, task) or self.tasks.difficulty[category][index]
+            self.tasks.replace(category, index, task, difficulty)
+            self.log("replace", category, index, task)
+            return True
+        return False
+    
+    def snapshot(self, texts=True):
+        """Полное состояние партии в виде простых типов (для журнала).
+
+        texts - сохранить и тексты заданий поля, чтобы партию можно было
+        восстановить после правки файлов заданий.
+        """
+        board_texts = None
+        if texts and self.tasks:
+            board_texts = [[list(self.tasks.text(category, index)) for index in range(self.tasks.size(category))]
+                           for category in range(len(self.tasks))]
+        return {
+            "players": [[p.name, list(p.color), p.score] for p in self.players],
+            "state": self.state,
+            "current_player": self.current_player_idx,
+            "round": self.round_counter,
+            "tasks_per_category": self.tasks_per_category,
+            "selected": [self.selected_category, self.selected_difficulty] if self.task_in_progress else None,
+            "board": [list(indices) for indices in self.tasks.indices] if self.tasks else None,
+            "difficulty": [list(values) for values in self.tasks.difficulty] if self.tasks else None,
+            "completed": list(self.tasks.completed) if self.tasks else None,
+            "session": self.session_id,
+            "deck": deck_version(self.task_data) if self.tasks else None,
+            "texts": board_texts,
+        }
+    
+    @classmethod
+    def from_snapshot(cls, snapshot, deck=None, rng=None):
+        """Партия из снимка snapshot()"""
+        game = cls(deck, rng)
+        for name, color, score in snapshot["players"]:
+            player = Player(name, tuple(color))
+            player.score = score
+            game.players.append(player)
+            game.leaderboard.add(player)
+        game.tasks_per_category = snapshot["tasks_per_category"]
+        if snapshot["board"] is not None:
+            game.setup_tasks(snapshot["board"], snapshot.get("deck"), snapshot.get("difficulty"),
+                             snapshot.get("texts"))
+            for category, mask in enumerate(snapshot["completed"]):
+                game.tasks.set_completed(category, mask)
+        if snapshot["selected"] is not None:
+            game.selected_category, game.selected_difficulty = snapshot["selected"]
+        game.state = snapshot["state"]
+        game.current_player_idx = snapshot["current_player"]
+        game.round_counter = snapshot["round"]
+        game.session_id = snapshot.get("session")
+        return game
@@ -0,0 +1,191 @@
+"""Задания по шаблонам.
+
+Строка файла заданий с параметрами в фигурных скобках - шаблон, из
+которого получается много заданий:
+
+    Назовите {5-10} слов на букву '{А, Б, В, Щ!}' на тему '{еда, спорт}'
+    Стойте в планке {10-60/5} {=секунду,секунды,секунд}
+
+    {от-до} или {от-до/шаг}   число из диапазона
+    {а, б, в}                 один из вариантов; "!" отмечает трудные
+    {=одна,две,пять}          слово в форме, согласованной с предыдущим числом
+
+Задания шаблона нумеруются всеми сочетаниями параметров и строятся по
+номеру в момент, когда попадают на поле, поэтому в пакете хранится только
+текст шаблона. Сложность задания следует из параметров: чем больше число
+в своем диапазоне и чем больше трудных вариантов, тем она выше (от 1 до
+MAX_DIFFICULTY). Задания, которые отличаются только числами, - одна группа
+почти одинаковых (см. dedup.py).
+"""
+import re
+
+MAX_DIFFICULTY = 10
+
+PLACEHOLDER = re.compile(r"\{([^{}]*)\}")
+RANGE = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*(?:/\s*(\d+)\s*)?$")
+
+
+def is_template(text):
+    return PLACEHOLDER.search(text) is not None
+
+
+def plural(number, forms):
+    """Форма слова из forms (для 1, 2 и 5) под число: 1 секунду, 2 секунды, 5 секунд"""
+    if number % 10 == 1 and number % 100 != 11:
+        return forms[0]
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+class Number:
+    """Числовой параметр: трудность растет вместе с числом"""
+    numeric = True
+    weighted = True
+
+    def __init__(self, start, stop, step):
+        if step <= 0 or stop < start:
+            raise ValueError(f"пустой диапазон {start}-{stop}/{step}")
+        self.values = range(start, stop + 1, step)
+
+    def __len__(self):
+        return len(self.values)
+
+    def text(self, choice):
+        return str(self.values[choice])
+
+    def effort(self, choice):
+        return choice / (len(self.values) - 1) if len(self.values) > 1 else 0
+
+
+class Choice:
+    """Параметр-вариант; трудность дают только варианты с "!" """
+    numeric = False
+
+    def __init__(self, options):
+        options = [option.strip() for option in options]
+        self.options = [option.rstrip("!").strip() for option in options]
+        self.hard = [option.endswith("!") for option in options]
+        self.weighted = any(self.hard)
+        if not all(self.options):
+            raise ValueError("пустой вариант")
+
+    def __len__(self):
+        return len(self.options)
+
+    def text(self, choice):
+        return self.options[choice]
+
+    def effort(self, choice):
+        return 1 if self.hard[choice] else 0
+
+
+class Template:
+    """Шаблон задания: номер задания -> текст, сложность и группа.
+
+    answer - ответ, общий для всех заданий шаблона (без параметров).
+    """
+    def __init__(self, text, answer=""):
+        self.text = text
+        self.answer = answer
+        # Части текста по порядку: строки, номера параметров и формы слов
+        # (кортеж форм и номер числа, с которым они согласуются)
+        self.parts = []
+        self.params = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.parts.append(text[position:match.start()])
+            position = match.end()
+            body = match.group(1)
+            if body.startswith("="):
+                forms = tuple(form.strip() for form in body[1:].split(","))
+                numbers = [i for i, param in enumerate(self.params) if param.numeric]
+                if len(forms) != 3 or not numbers:
+                    raise ValueError(f"форма слова {{{body}}} - нужны три формы после числа")
+                self.parts.append((forms, numbers[-1]))
+                continue
+            number = RANGE.match(body)
+            if number:
+                start, stop, step = number.groups()
+                self.params.append(Number(int(start), int(stop), int(step or 1)))
+            elif "," in body:
+                self.params.append(Choice(body.split(",")))
+            else:
+                raise ValueError(f"непонятный параметр {{{body}}}")
+            self.parts.append(len(self.params) - 1)
+        self.parts.append(text[position:])
+        if not self.params:
+            raise ValueError("в шаблоне нет параметров")
+        # Номер задания - число в позиционной системе с основаниями len(параметра),
+        # последний параметр - младший разряд
+        self.strides = []
+        size = 1
+        for param in reversed(self.params):
+            self.strides.append(size)
+            size *= len(param)
+        self.strides.reverse()
+        self.size = size
+        self.weighted = [i for i, param in enumerate(self.params) if param.weighted]
+
+    def __len__(self):
+        return self.size
+
+    def choices(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return [index // stride % len(param) for param, stride in zip(self.params, self.strides)]
+
+    def task(self, index):
+        """Текст задания с номером index"""
+        choices = self.choices(index)
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif isinstance(part, int):
+                out.append(self.params[part].text(choices[part]))
+            else:
+                forms, number = part
+                out.append(plural(self.params[number].values[choices[number]], forms))
+        return "".join(out)
+
+    def difficulty(self, index):
+        """Сложность по параметрам; 0, если от параметров она не зависит (тогда - по месту на поле)"""
+        if not self.weighted:
+            return 0
+        choices = self.choices(index)
+        effort = sum(self.params[i].effort(choices[i]) for i in self.weighted) / len(self.weighted)
+        return 1 + round(effort * (MAX_DIFFICULTY - 1))
+
+    def index(self, choices):
+        """Номер задания по номерам вариантов параметров (обратно к choices)"""
+        return sum(choice * stride for choice, stride in zip(choices, self.strides))
+
+    def search_text(self):
+        """Текст шаблона для поиска: постоянные части, все варианты и формы слов.
+
+        Шаблон попадает в поисковый индекс одной записью, сколько бы
+        заданий из него ни получалось.
+        """
+        words = [part for part in self.parts if isinstance(part, str)]
+        for part in self.parts:
+            if isinstance(part, tuple):
+                words.extend(part[0])
+        for param in self.params:
+            words.extend(param.text(choice) for choice in range(len(param)))
+        return " ".join(words)
+
+    def example(self, prefer):
+        """Номер одного задания шаблона: у каждого параметра первый вариант,
+        для текста которого prefer истинно, иначе первый по порядку
+        """
+        choices = []
+        for param in self.params:
+            choices.append(next((choice for choice in range(len(param)) if prefer(param.text(choice))), 0))
+        return self.index(choices)
+
+    def group(self, index):
+        """Номер первого задания с теми же параметрами, кроме чисел"""
+        choices = self.choices(index)
+        return sum(choice * stride for choice, stride, param in zip(choices, self.strides, self.params)
+                   if not param.numeric)
@@ -0,0 +1,178 @@
+"""Журнал партии для восстановления после падения.
+
+Каждое изменение состояния (игрок добавлен, партия начата, задание
+выбрано, заменено или выполнено, раунд продолжен) дописывается в конец файла одной
+короткой JSON-строкой. Запись идет в фоновом потоке: главный цикл только
+кладет строку в очередь, а поток пишет их пачками и вызывает fsync не чаще
+раза в sync_interval секунд.
+
+Файл начинается со снимка состояния ["snapshot", {...}]. Когда записей
+после снимка становится больше compact_every, журнал сжимается: файл
+атомарно заменяется новым снимком. Сжатие делает checkpoint(), который
+главный цикл вызывает после обработки событий: запись в журнал идет
+посреди хода (например, задание уже отмечено, а очки еще не начислены),
+и снимок в этот момент сохранил бы недоделанный ход. При запуске партия
+восстанавливается из снимка и записей после него; недописанная последняя
+строка (падение посреди записи) пропускается. Снимок хранит и тексты
+заданий поля, поэтому правка data/*.txt между запусками не меняет поле
+восстановленной партии.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from game import Game
+
+SNAPSHOT = "snapshot"
+
+
+def encode(entry):
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class Journal:
+    """Журнал одной партии с записью в фоновом потоке"""
+    def __init__(self, path, sync_interval=0.5, compact_every=500):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.game = None
+        self.entries = 0
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name="journal", daemon=True)
+        self.writer.start()
+
+    def attach(self, game):
+        """Начинает журнал партии game с ее снимка"""
+        if self.game is not None:
+            self.game.journal = None
+        self.game = game
+        game.journal = self
+        self.compact()
+
+    def append(self, entry):
+        self.queue.put(encode(entry))
+        self.entries += 1
+        if entry[0] == "start":
+            # Снимок сразу после раздачи сохраняет тексты заданий поля
+            self.entries = max(self.entries, self.compact_every)
+
+    def checkpoint(self):
+        """Сжимает журнал, если записей накопилось много; только между ходами"""
+        if self.entries >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Снимок строится здесь, в главном потоке, пока состояние не изменилось
+        self.queue.put((SNAPSHOT, encode([SNAPSHOT, self.game.snapshot()])))
+        self.entries = 0
+
+    def close(self):
+        """Дописывает очередь на диск и останавливает поток"""
+        self.queue.put(None)
+        self.writer.join()
+
+    def write_loop(self):
+        f = open(self.path, "a", encoding="utf-8")
+        last_sync = time.monotonic()
+        unsynced = False
+        try:
+            while True:
+                timeout = max(0, last_sync + self.sync_interval - time.monotonic()) if unsynced else None
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if isinstance(item, tuple) and item:
+                    f.close()
+                    f = self.rewrite(item[1])
+                    unsynced = False
+                elif item:
+                    f.write(item)
+                    unsynced = True
+                if unsynced and time.monotonic() - last_sync >= self.sync_interval:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    last_sync = time.monotonic()
+                    unsynced = False
+        except OSError as e:
+            print(f"Журнал партии не записан: {e}")
+        finally:
+            if not f.closed:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+    def rewrite(self, line):
+        """Заменяет журнал снимком и открывает его для дописывания"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return open(self.path, "a", encoding="utf-8")
+
+
+def load(path):
+    """Последний снимок и записи после него; без журнала - (None, [])"""
+    snapshot, entries = None, []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Строка не дописана до конца - дальше ничего нет
+                    break
+                if entry[0] == SNAPSHOT:
+                    snapshot, entries = entry[1], []
+                else:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return snapshot, entries
+
+
+def replay(game, entry):
+    """Повторяет одну запись журнала на партии"""
+    kind, args = entry[0], entry[1:]
+    if kind == "player":
+        name, color = args
+        game.add_player(name, tuple(color))
+    elif kind == "start":
+        # В журналах прошлых версий нет ключа партии в статистике и версии колоды
+        count, board, *rest = args
+        game.start_game(count, board, *rest)
+    elif kind == "select":
+        game.select_task(*args)
+    elif kind == "complete":
+        game.complete_task(*args)
+    elif kind == "replace":
+        game.replace_task(*args)
+    elif kind == "continue":
+        game.continue_game()
+    else:
+        raise ValueError(f"неизвестная запись журнала: {kind}")
+
+
+def needs_deck(snapshot, entries):
+    """Нужна ли колода, чтобы восстановить партию"""
+    return bool(snapshot and snapshot["board"]) or any(entry[0] == "start" for entry in entries)
+
+
+def restore(snapshot, entries, deck=None, rng=None):
+    """Партия из снимка и записей после него"""
+    game = Game.from_snapshot(snapshot, deck, rng) if snapshot else Game(deck, rng)
+    for entry in entries:
+        replay(game, entry)
+    return game
+
+
+def recover(path, deck=None):
+    """Восстанавливает партию из журнала path"""
+    return restore(*load(path), deck=deck)
@@ -0,0 +1,197 @@
+"""Нагрузочная проверка сервера столов (server.py).
+
+В каждой комнате один общий экран стола и несколько телефонов игроков.
+Телефоны в свой ход выбирают случайное свободное задание и сдают его,
+экран стола начинает партии и продолжает раунды. Для каждого запроса
+замеряется время до ответа сервера; печатаются задержки и число ходов
+в секунду по комнатам и в целом.
+
+    python loadtest.py --rooms 50 --players 6 --games 3
+    python loadtest.py --connect 192.168.1.10:8765    # внешний сервер
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from client import parse_address
+from server import Server, encode
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+class RoomResult:
+    def __init__(self, name):
+        self.name = name
+        self.latency = []
+        self.actions = 0
+        self.bytes_received = 0
+        self.games = 0
+        self.started = None
+        self.finished = None
+        self.server_stats = None
+        self.done = asyncio.Event()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+
+
+class SimClient:
+    """Телефон игрока (name) или общий экран стола (name=None)"""
+    def __init__(self, result, name, players, games, tasks, think):
+        self.result = result
+        self.name = name
+        self.players = players
+        self.games = games
+        self.tasks = tasks
+        self.think = think
+        self.view = {}
+        self.player = None
+        self.pending = {}
+        self.next_id = 0
+        self.writer = None
+
+    async def run(self, address):
+        reader, self.writer = await asyncio.open_connection(*address)
+        self.send({"op": "join", "room": self.result.name, "name": self.name})
+        try:
+            while not self.result.done.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                self.result.bytes_received += len(line)
+                self.handle(json.loads(line))
+                if not self.pending:
+                    await self.act()
+        finally:
+            self.writer.close()
+
+    def send(self, message):
+        self.writer.write(encode(message))
+
+    def request(self, op, **fields):
+        self.next_id += 1
+        self.pending[self.next_id] = time.perf_counter()
+        self.send(dict(fields, op=op, id=self.next_id))
+
+    def handle(self, message):
+        if message["type"] == "state":
+            self.view = message["view"]
+            self.player = message["player"]
+        elif message["type"] == "delta":
+            self.view.update(message["changes"])
+        elif message["type"] == "ack":
+            sent = self.pending.pop(message["id"])
+            self.result.latency.append(time.perf_counter() - sent)
+            if message["ok"]:
+                self.result.actions += 1
+
+    async def act(self):
+        view = self.view
+        if not view:
+            return
+        state = view["state"]
+        if self.name is None:
+            # Общий экран стола ведет партию
+            if state == "SETUP" and len(view["players"]) == self.players:
+                if self.result.started is None:
+                    self.result.started = time.perf_counter()
+                self.request("start", tasks=self.tasks)
+            elif state == "INTERMEDIATE_RESULTS":
+                self.request("continue")
+            elif state == "GAME_OVER":
+                self.result.games += 1
+                if self.result.games >= self.games:
+                    self.result.finished = time.perf_counter()
+                    self.result.done.set()
+                else:
+                    self.request("new_game")
+        elif state == "PLAYING" and view["current_player"] == self.player:
+            if self.think:
+                await asyncio.sleep(self.think * random.random())
+            if view["selected"] is None:
+                free = [(c, i) for c, (indices, mask) in enumerate(zip(view["board"], view["completed"]))
+                        for i in range(len(indices)) if not mask >> i & 1]
+                category, index = random.choice(free)
+                self.request("select", category=category, index=index)
+            else:
+                self.request("complete", success=random.random() < 0.6)
+
+
+async def run_room(address, name, args, server=None):
+    result = RoomResult(name)
+    host = SimClient(result, None, args.players, args.games, args.tasks, args.think)
+    phones = [SimClient(result, f"Игрок {i + 1}", args.players, args.games, args.tasks, args.think)
+              for i in range(args.players)]
+    # Сначала экран стола, затем телефоны по одному: порядок игроков в партии постоянный
+    tasks = [asyncio.create_task(host.run(address))]
+    for phone in phones:
+        tasks.append(asyncio.create_task(phone.run(address)))
+        while phone.player is None and not result.done.is_set():
+            await asyncio.sleep(0.001)
+    await result.done.wait()
+    if server is not None and name in server.rooms:
+        # Сводку комнаты сервер удалит вместе с комнатой, когда клиенты отключатся
+        result.server_stats = server.rooms[name].stats.summary()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return result
+
+
+def report(results, elapsed, players):
+    latency = [sample for result in results for sample in result.latency]
+    actions = sum(result.actions for result in results)
+    received = sum(result.bytes_received for result in results)
+    print(f"Комнат: {len(results)}, клиентов: {len(results) * (players + 1)}, "
+          f"партий: {sum(result.games for result in results)}")
+    print(f"Ходов: {actions} за {elapsed:.1f} с ({actions / elapsed:.0f}/с), "
+          f"получено {received / 1024:.0f} КБ ({received / max(actions, 1):.0f} байт на ход на всех клиентов)")
+    print(f"Ответ сервера: p50 {percentile(latency, 0.5) * 1000:.2f} мс, p90 {percentile(latency, 0.9) * 1000:.2f} мс, "
+          f"p99 {percentile(latency, 0.99) * 1000:.2f} мс, макс {max(latency, default=0) * 1000:.2f} мс")
+    per_room = sorted(results, key=lambda result: -percentile(result.latency, 0.99))
+    print("Самые медленные комнаты:")
+    print(f"{'комната':<12} {'ходов/с':>8} {'p50, мс':>8} {'p99, мс':>8}")
+    for result in per_room[:5]:
+        print(f"{result.name:<12} {result.actions / result.elapsed:>8.1f} "
+              f"{percentile(result.latency, 0.5) * 1000:>8.2f} {percentile(result.latency, 0.99) * 1000:>8.2f}")
+    processing = [result.server_stats["p99_ms"] for result in results if result.server_stats]
+    if processing:
+        print(f"Обработка хода на сервере: p99 по комнатам до {max(processing):.3f} мс")
+
+
+async def main_async(args):
+    server = None
+    if args.connect:
+        address = parse_address(args.connect)
+    else:
+        # Сервер в том же процессе: задержки включают и работу клиентов в том же цикле
+        server = await Server("127.0.0.1", 0).start()
+        address = ("127.0.0.1", server.port)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_room(address, f"стол {i + 1}", args, server) for i in range(args.rooms)))
+    elapsed = time.perf_counter() - started
+    report(results, elapsed, args.players)
+    if server is not None:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка сервера столов")
+    parser.add_argument("--connect", help="адрес сервера host:port (без него сервер запускается здесь же)")
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--players", type=int, default=6, help="телефонов в комнате")
+    parser.add_argument("--games", type=int, default=2, help="партий в каждой комнате")
+    parser.add_argument("--tasks", type=int, default=20, help="заданий в категории")
+    parser.add_argument("--think", type=float, default=0, help="наибольшая пауза перед ходом, с")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
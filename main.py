@@ -1,26 +1,31 @@
+import time
+# Отсчет времени до первого кадра начинается до импорта pygame
+STARTUP_TIME = time.perf_counter()
 import pygame
 import sys
 import random
-import math
 import os
+import io
+import math
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pygame.locals import *
+from game import Game, decks
+from profiler import Profiler
+from particles import ParticleSystem
+from generators import MAX_DIFFICULTY
+import journal
+import stats
+import search
+import client
+import recording
 
-# Инициализация Pygame
-pygame.init()
-pygame.font.init()
-
-# Определение размеров экрана
-if pygame.display.get_driver() == 'android':
-    # Режим для телефона
-    info = pygame.display.Info()
-    SCREEN_WIDTH = info.current_w
-    SCREEN_HEIGHT = info.current_h
-    IS_MOBILE = True
-else:
-    # Режим для компьютера
-    SCREEN_WIDTH = 1200
-    SCREEN_HEIGHT = 800
-    IS_MOBILE = False
+# Размеры экрана и режим телефона определяются в init_display()
+SCREEN_WIDTH = 1200
+SCREEN_HEIGHT = 800
+IS_MOBILE = False
+screen = None
 
 # Константы
 BACKGROUND_COLOR = (255, 255, 200)
@@ -32,206 +37,509 @@ CATEGORY_COLORS = [
     (255, 182, 193), (173, 216, 230), 
     (144, 238, 144), (255, 99, 71)
 ]
+PODIUM_COLORS = [
+    (255, 215, 0),    # Золотой
+    (192, 192, 192),  # Серебряный
+    (205, 127, 50)    # Бронзовый
+]
 
-# Создание экрана
-if IS_MOBILE:
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-else:
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Подарочек")
-
-# Адаптивные размеры шрифтов
-title_size = int(SCREEN_WIDTH * 0.04) if IS_MOBILE else 48
-header_size = int(SCREEN_WIDTH * 0.03) if IS_MOBILE else 32
-normal_size = int(SCREEN_WIDTH * 0.025) if IS_MOBILE else 24
-small_size = int(SCREEN_WIDTH * 0.02) if IS_MOBILE else 20
-
-# Шрифты
-title_font = pygame.font.SysFont("Arial", title_size, bold=True)
-header_font = pygame.font.SysFont("Arial", header_size, bold=True)
-normal_font = pygame.font.SysFont("Arial", normal_size)
-small_font = pygame.font.SysFont("Arial", small_size)
-
-class Player:
-    def __init__(self, name):
-        self.name = name
-        self.score = 0
-        self.color = (random.randint(50, 200), random.randint(50, 200), random.randint(50, 200))
-        self.avatar = self.generate_avatar()
-        
-    def add_score(self, points):
-        self.score += points
-        
-    def generate_avatar(self):
-        avatar_size = int(SCREEN_WIDTH * 0.07) if IS_MOBILE else 80
-        avatar = pygame.Surface((avatar_size, avatar_size), pygame.SRCALPHA)
-        pygame.draw.circle(avatar, self.color, (avatar_size//2, avatar_size//2), avatar_size//2)
-        initials = "".join([n[0] for n in self.name.split()]).upper()[:2]
-        text = header_font.render(initials, True, (255, 255, 255))
-        avatar.blit(text, (avatar_size//2 - text.get_width()//2, avatar_size//2 - text.get_height()//2))
-        return avatar
-
-class Game:
-    def __init__(self):
-        self.players = []
-        self.current_player_idx = 0
-        self.state = "SETUP"
-        self.tasks_per_category = 20
-        self.setup_tasks()
-        self.selected_category = None
-        self.selected_difficulty = None
-        self.task_window_open = False
-        self.task_result = None
-        self.tasks_count_input = str(self.tasks_per_category)
-        self.show_answer = False
-        self.round_counter = 0
-        self.completed_tasks = 0
-        self.total_tasks = 0
-        self.tasks_remaining = 0
-        self.task_data = self.load_tasks()
-        
-    def load_tasks(self):
-        """Загрузка заданий из файлов"""
-        tasks = {
-            "riddles": [],
-            "creativity": [],
-            "words": [],
-            "physical": []
+# Режим отрисовки: "full" - весь экран каждый кадр, "dirty" - только
+# изменившиеся области (экономит заполнение экрана на телефонах).
+# Без настройки выбирается по устройству в init_display()
+RENDER_MODE = os.environ.get("PODAROCHEK_RENDER")
+
+# Ограничение частоты кадров: во время анимации и в простое
+BUSY_FPS = int(os.environ.get("PODAROCHEK_FPS", 60))
+IDLE_FPS = int(os.environ.get("PODAROCHEK_IDLE_FPS", 2))
+
+# Замеры этапов кадра: включаются сразу или клавишей F4,
+# трасса сохраняется по F5 и при выходе
+PROFILE = os.environ.get("PODAROCHEK_PROFILE", "") not in ("", "0")
+TRACE_PATH = os.environ.get("PODAROCHEK_TRACE", "podarochek-trace.json")
+
+# Журнал партии: после падения игра продолжается с того же места.
+# Пустое значение отключает журнал
+JOURNAL_PATH = os.environ.get("PODAROCHEK_JOURNAL", "podarochek-session.journal")
+
+# База статистики сыгранных партий (см. stats.py). Пустое значение отключает ее
+STATS_PATH = os.environ.get("PODAROCHEK_STATS", "podarochek-stats.sqlite3")
+
+# Seed генератора партии (цвета игроков, задания на поле) и запись ввода
+# для воспроизведения партии (см. recording.py)
+SEED = os.environ.get("PODAROCHEK_SEED", "")
+RECORD_PATH = os.environ.get("PODAROCHEK_RECORD", "")
+
+# Игра за столом на сервере (server.py): адрес "хост:порт", комната и имя
+# игрока на этом устройстве (без имени - общий экран стола)
+SERVER_ADDRESS = os.environ.get("PODAROCHEK_SERVER", "")
+SERVER_ROOM = os.environ.get("PODAROCHEK_ROOM", "стол")
+PLAYER_NAME = os.environ.get("PODAROCHEK_NAME", "")
+
+class TextCache:
+    """Общий LRU-кэш отрисованных надписей.
+
+    Ключ - (шрифт, текст, цвет, сглаживание, фон). Готовые поверхности
+    разделяются между вызовами, поэтому их нельзя изменять после получения.
+    """
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color, background=None):
+        key = (font, text, tuple(color), antialias,
+               tuple(background) if background is not None else None)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if background is None:
+            surface = font.render(text, antialias, color)
+        else:
+            surface = font.render(text, antialias, color, background)
+        self.surfaces[key] = surface
+        # Вытесняем самые давно использованные надписи
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.surfaces),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
         }
+
+# Шрифты лежат рядом с игрой: поиск системных шрифтов на Linux и Android медленный
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+FONT_FILES = {False: "DejaVuSans.ttf", True: "DejaVuSans-Bold.ttf"}
+# DejaVu Sans шире Arial, под который рассчитана раскладка
+FONT_SCALE = 0.87
+
+# Содержимое файлов шрифтов, прочитанное фоновым загрузчиком
+font_data = {}
+
+def read_font_files():
+    """Читает файлы шрифтов целиком (выполняется в фоновом потоке)"""
+    data = {}
+    for bold, name in FONT_FILES.items():
+        with open(os.path.join(FONT_DIR, name), "rb") as f:
+            data[bold] = f.read()
+    return data
+
+def load_font(size, bold=False):
+    if bold in font_data:
+        return pygame.font.Font(io.BytesIO(font_data[bold]), max(1, round(size * FONT_SCALE)))
+    path = os.path.join(FONT_DIR, FONT_FILES[bold])
+    if os.path.exists(path):
+        return pygame.font.Font(path, max(1, round(size * FONT_SCALE)))
+    return pygame.font.SysFont("Arial", size, bold=bold)
+
+class CachedFont:
+    """Шрифт, у которого render() идет через общий кэш надписей.
+
+    Файл шрифта открывается при первом использовании.
+    """
+    def __init__(self, point_size, bold, cache):
+        self.point_size = point_size
+        self.bold = bold
+        self.cache = cache
+        self.loaded = None
+
+    @property
+    def font(self):
+        if self.loaded is None:
+            self.loaded = load_font(self.point_size, self.bold)
+        return self.loaded
+
+    def render(self, text, antialias, color, background=None):
+        return self.cache.render(self.font, text, antialias, color, background)
+
+    def __getattr__(self, name):
+        # size(), get_linesize() и остальное - напрямую у pygame.font.Font
+        return getattr(self.font, name)
+
+text_cache = TextCache()
+
+# Шрифты: один объект на размер, надписи всех шрифтов в общем кэше
+fonts = OrderedDict()
+MAX_FONTS = 16
+
+def get_font(size, bold=False):
+    key = (size, bold)
+    font = fonts.get(key)
+    if font is None:
+        font = CachedFont(size, bold, text_cache)
+        fonts[key] = font
+        while len(fonts) > MAX_FONTS:
+            fonts.popitem(last=False)
+    else:
+        fonts.move_to_end(key)
+    return font
+
+class BoardLayout:
+    """Геометрия игрового поля: панели категорий и кружки заданий.
+
+    Считается один раз на размер экрана и число заданий. По ней и
+    рисуется поле, и определяется нажатое задание, поэтому нарисованные
+    кружки и области нажатия всегда совпадают. Все координаты целые.
+    """
+    TASKS_PER_ROW = 5
+    MAX_ROWS = 10
+
+    def __init__(self, width, height, task_size, categories_count, tasks_per_category):
+        self.categories_count = categories_count
+        self.tasks_per_category = min(tasks_per_category, self.TASKS_PER_ROW * self.MAX_ROWS)
         
-        try:
-            # Загадки
-            with open(os.path.join("data", "riddles.txt"), "r", encoding="utf-8") as f:
-                tasks["riddles"] = [line.strip() for line in f.readlines() if line.strip()]
-            
-            # Творческие задания
-            with open(os.path.join("data", "creativity.txt"), "r", encoding="utf-8") as f:
-                tasks["creativity"] = [line.strip() for line in f.readlines() if line.strip()]
-            
-            # Словесные задания
-            with open(os.path.join("data", "words.txt"), "r", encoding="utf-8") as f:
-                tasks["words"] = [line.strip() for line in f.readlines() if line.strip()]
-            
-            # Физические задания
-            with open(os.path.join("data", "physical.txt"), "r", encoding="utf-8") as f:
-                tasks["physical"] = [line.strip() for line in f.readlines() if line.strip()]
-        except Exception as e:
-            print(f"Ошибка загрузки заданий: {e}")
-            # Резервные задания
-            tasks = {
-                "riddles": ["Загадка 1", "Загадка 2"],
-                "creativity": ["Творческое задание 1", "Творческое задание 2"],
-                "words": ["Словесное задание 1", "Словесное задание 2"],
-                "physical": ["Физическое задание 1", "Физическое задание 2"]
-            }
-        
-        return tasks
-    
-    def setup_tasks(self):
-        self.categories = ["Загадки", "Творчество", "Слова", "Физподготовка"]
-        
-        # Создание структуры для хранения состояния заданий
-        self.tasks = []
-        for cat_idx in range(4):
-            category_tasks = []
-            available_tasks = []
-            
-            # Выбор правильного набора заданий
-            if cat_idx == 0:
-                available_tasks = self.task_data["riddles"]
-            elif cat_idx == 1:
-                available_tasks = self.task_data["creativity"]
-            elif cat_idx == 2:
-                available_tasks = self.task_data["words"]
-            else:
-                available_tasks = self.task_data["physical"]
-            
-            # Перемешиваем задания для случайного порядка
-            random.shuffle(available_tasks)
-            
-            # Берем не более 50 заданий
-            tasks_to_use = available_tasks[:min(len(available_tasks), 50)]
-            
-            for j in range(min(self.tasks_per_category, len(tasks_to_use))):
-                task = {
-                    "description": tasks_to_use[j],
-                    "completed": False,
-                    "difficulty": j + 1,
-                    "answer": self.get_answer(cat_idx, j) if cat_idx == 0 else ""
-                }
-                category_tasks.append(task)
-            self.tasks.append(category_tasks)
-        
-        self.total_tasks = 4 * min(self.tasks_per_category, 50)
-        self.tasks_remaining = self.total_tasks
-    
-    def get_answer(self, category, difficulty):
-        if category == 0:
-            return self.generate_answer(category, difficulty)
-        return ""
-    
-    def generate_answer(self, category, difficulty):
-        # В реальном приложении здесь должна быть логика получения ответов
-        return f"Ответ на загадку {difficulty + 1}"
-    
-    def start_game(self):
-        if len(self.players) < 2:
-            return False
+        # Панели категорий
+        self.left = int(width * 0.04)
+        self.top = int(height * 0.19)
+        self.category_width = int((width - width * 0.08) // categories_count - 10)
+        self.category_step = self.category_width + 10
+        self.panel_height = int(height * 0.75)
+        self.title_dy = int(height * 0.02)
         
-        try:
-            count = int(self.tasks_count_input)
-            if count < 5 or count > 50:
-                return False
-            self.tasks_per_category = count
-            self.setup_tasks()
-            self.state = "PLAYING"
-            self.round_counter = 0
-            return True
-        except:
-            return False
-    
-    def add_player(self, name):
-        if name and len(self.players) < 15:
-            self.players.append(Player(name))
-            return True
-        return False
+        # Кружки заданий
+        self.task_size = task_size
+        self.radius = self.task_size // 2
+        self.pitch = self.task_size + int(width * 0.01)
+        total_width = self.TASKS_PER_ROW * self.pitch - (self.pitch - self.task_size)
+        self.offset_x = (self.category_width - total_width) // 2
+        self.start_y = self.top + int(height * 0.10)
+        self.rows = min(self.MAX_ROWS, (self.tasks_per_category + self.TASKS_PER_ROW - 1) // self.TASKS_PER_ROW)
+
+    def panel_rect(self, category):
+        return pygame.Rect(self.left + category * self.category_step, self.top,
+                           self.category_width, self.panel_height)
+
+    def task_center(self, category, index):
+        row, col = divmod(index, self.TASKS_PER_ROW)
+        return (self.left + category * self.category_step + self.offset_x + col * self.pitch,
+                self.start_y + row * self.pitch)
+
+    def hit_test(self, pos):
+        """Возвращает (категория, ряд, столбец) кружка под точкой или None"""
+        x, y = int(pos[0]), int(pos[1])
+        # Считаем от левого края первого кружка: на узких экранах кружки
+        # могут выходить за границы своей панели
+        category = (x - self.left - self.offset_x + self.radius) // self.category_step
+        if not 0 <= category < self.categories_count:
+            return None
+        
+        # Ближайший центр кружка по каждой оси
+        col = (x - self.left - category * self.category_step - self.offset_x + self.pitch // 2) // self.pitch
+        row = (y - self.start_y + self.pitch // 2) // self.pitch
+        if not (0 <= col < self.TASKS_PER_ROW and 0 <= row < self.rows):
+            return None
+        if row * self.TASKS_PER_ROW + col >= self.tasks_per_category:
+            return None
+        
+        center_x, center_y = self.task_center(category, row * self.TASKS_PER_ROW + col)
+        dx = x - center_x
+        dy = y - center_y
+        if dx * dx + dy * dy > self.radius * self.radius:
+            return None
+        return category, row, col
+
+class Layout:
+    """Геометрия всех экранов для одного разрешения.
+
+    Прямоугольники, позиции и размеры шрифтов считаются один раз при
+    создании. Пересчет нужен только при изменении размера окна или
+    повороте телефона.
+    """
+    def __init__(self, width, height, mobile):
+        self.width = width
+        self.height = height
+        self.mobile = mobile
+        # На ПК размеры подобраны под окно 1200x800 и масштабируются вместе с ним
+        self.scale = min(width / 1200, height / 800)
+        
+        def x(fraction):
+            return int(width * fraction)
+        
+        def y(fraction):
+            return int(height * fraction)
+        
+        def size(mobile_fraction, desktop_size):
+            if mobile:
+                return int(width * mobile_fraction)
+            return max(1, int(desktop_size * self.scale))
+        
+        # Шрифты
+        self.title_font = get_font(size(0.04, 48), bold=True)
+        self.header_font = get_font(size(0.03, 32), bold=True)
+        self.normal_font = get_font(size(0.025, 24))
+        self.small_font = get_font(size(0.02, 20))
+        
+        # Экран настройки
+        self.setup_title_y = y(0.05)
+        self.setup_circle_radius = x(0.07)
+        self.setup_circles = [
+            (CATEGORY_COLORS[0], (x(0.17), y(0.19))),
+            (CATEGORY_COLORS[1], (x(0.83), y(0.19))),
+            (CATEGORY_COLORS[2], (x(0.17), y(0.81))),
+            (CATEGORY_COLORS[3], (x(0.83), y(0.81)))
+        ]
+        self.setup_panel = pygame.Rect(x(0.08), y(0.19), x(0.84), y(0.62))
+        self.setup_header_y = y(0.22)
+        self.tasks_label_pos = (x(0.17), y(0.31))
+        self.player_label_pos = (x(0.17), y(0.40))
+        self.players_label_pos = (x(0.17), y(0.52))
+        self.players_list_pos = (x(0.18), y(0.57))
+        self.players_list_step = y(0.04)
+        self.players_list_rect = pygame.Rect(self.players_list_pos[0], self.players_list_pos[1],
+                                             width // 2 - x(0.11) - self.players_list_pos[0],
+                                             y(0.79) - self.players_list_pos[1])
+        self.tasks_input = pygame.Rect(x(0.50), y(0.31), x(0.17), y(0.05))
+        self.player_input = pygame.Rect(x(0.50), y(0.40), x(0.17), y(0.05))
+        self.start_btn = pygame.Rect(width // 2 - x(0.10), y(0.75), x(0.20), y(0.07))
+        self.add_player_btn = pygame.Rect(width // 2 - x(0.10), y(0.65), x(0.20), y(0.07))
+        
+        # Игровой экран
+        self.game_title_y = y(0.02)
+        self.round_rect = pygame.Rect(x(0.8), y(0.02), x(0.2), self.header_font.get_linesize())
+        self.progress_bar = pygame.Rect(x(0.04), y(0.10), x(0.92), y(0.025))
+        self.progress_text_y = y(0.102)
+        self.progress_rect = self.progress_bar.union(
+            (x(0.04), self.progress_text_y, x(0.92), self.small_font.get_linesize()))
+        self.current_player_rect = pygame.Rect(x(0.04), y(0.14), x(0.92), self.header_font.get_linesize())
+        self.search_btn = pygame.Rect(x(0.02), y(0.02), x(0.12), self.header_font.get_linesize())
+        self.task_size = size(0.025, 30)
+        self.boards = {}
+        
+        # Окно задания
+        window_width = x(0.8) if mobile else int(800 * self.scale)
+        window_height = y(0.6) if mobile else int(500 * self.scale)
+        self.task_window = pygame.Rect((width - window_width) // 2, (height - window_height) // 2,
+                                       window_width, window_height)
+        self.task_title_y = self.task_window.y + y(0.03)
+        self.task_category_pos = (self.task_window.x + x(0.04), self.task_window.y + y(0.08))
+        self.task_label_pos = (self.task_window.x + x(0.04), self.task_window.y + y(0.13))
+        self.task_lines_pos = (self.task_window.x + x(0.06), self.task_window.y + y(0.16))
+        self.task_line_step = y(0.05)
+        self.task_text_width = window_width - x(0.08)
+        self.task_max_lines = 5 if mobile else 10
+        self.task_answer_step = y(0.07)
+        self.task_button_size = (x(0.15) if mobile else int(180 * self.scale),
+                                 y(0.06) if mobile else int(50 * self.scale))
+        self.task_button_spacing = x(0.02)
+        self.task_buttons_cache = {}
+        
+        # Окно поиска задания (на месте окна задания)
+        window = self.task_window
+        button_width, button_height = self.task_button_size
+        self.search_title_y = self.task_title_y
+        self.search_input = pygame.Rect(window.x + x(0.04), window.y + y(0.09), window.width - x(0.08),
+                                        self.normal_font.get_linesize() + 10)
+        self.search_close_btn = pygame.Rect(window.centerx - button_width // 2, window.bottom - y(0.02) - button_height,
+                                            button_width, button_height)
+        search_top = self.search_input.bottom + y(0.02)
+        self.search_list_rect = pygame.Rect(window.x + x(0.02), search_top, window.width - x(0.04),
+                                            self.search_close_btn.top - y(0.02) - search_top)
+        self.search_list_step = self.normal_font.get_linesize() + y(0.01)
+        
+        # Промежуточные результаты
+        self.results_title_y = y(0.06)
+        self.results_progress_y = y(0.15)
+        self.results_panel = pygame.Rect(x(0.08), y(0.22), x(0.84), y(0.65))
+        self.results_header_y = y(0.25)
+        self.results_row_y = y(0.32)
+        self.results_row_step = y(0.10)
+        self.results_avatar_x = x(0.12)
+        self.results_name_x = x(0.21)
+        self.results_score_x = x(0.75)
+        self.avatar_size = size(0.07, 80)
+        self.bottom_btn = pygame.Rect(width // 2 - x(0.15), y(0.85), x(0.30), y(0.07))
+        results_top = self.results_row_y - self.results_row_step // 2
+        self.results_list_rect = pygame.Rect(self.results_panel.x + 4, results_top, self.results_panel.width - 8,
+                                             self.bottom_btn.top - y(0.01) - results_top)
+        
+        # Финальные результаты
+        self.over_title_y = y(0.06)
+        self.over_rounds_y = y(0.15)
+        podium = pygame.Rect(x(0.08), y(0.25), x(0.84), y(0.25))
+        step_width = podium.width // 3
+        step_height = podium.height // 3
+        self.podium_base = pygame.Rect(podium.x, podium.bottom - y(0.025), podium.width, y(0.025))
+        self.podium_steps = [
+            pygame.Rect(podium.x + step_width, podium.y, step_width, podium.height - step_height),
+            pygame.Rect(podium.x, podium.y + step_height, step_width, podium.height - step_height),
+            pygame.Rect(podium.x + 2 * step_width, podium.y + step_height, step_width, podium.height - step_height)
+        ]
+        self.podium_places = [
+            (podium.x + step_width + step_width // 2, podium.y + int(podium.height * 0.15)),
+            (podium.x + step_width // 2, podium.y + int(podium.height * 0.35)),
+            (podium.x + 2 * step_width + step_width // 2, podium.y + int(podium.height * 0.35))
+        ]
+        self.podium_avatar_size = size(0.10, 120)
+        self.podium_avatar_dy = -y(0.05)
+        self.podium_place_dy = y(0.03)
+        self.podium_name_dy = y(0.06)
+        self.podium_score_dy = y(0.09)
+        self.others_panel = pygame.Rect(x(0.08), podium.bottom + y(0.05), x(0.84), y(0.25))
+        self.others_title_y = self.others_panel.y + y(0.02)
+        self.others_row_y = self.others_panel.y + y(0.08)
+        self.others_row_step = y(0.05)
+        self.others_avatar_x = x(0.12)
+        self.others_text_x = x(0.17)
+        self.compact_avatar_size = size(0.05, 40)
+        self.stats_rect = pygame.Rect(0, y(0.925), width, height - y(0.925))
+        others_top = self.others_row_y - self.others_row_step // 2
+        self.others_list_rect = pygame.Rect(self.others_panel.x + 4, others_top, self.others_panel.width - 8,
+                                            self.others_panel.bottom - 4 - others_top)
+        
+        # Отладочная строка и сводка профайлера
+        self.debug_rect = pygame.Rect(0, 0, width, self.small_font.get_linesize() + 8)
+        self.hud_rect = pygame.Rect(width - x(0.34), self.debug_rect.bottom, x(0.34), 5 * self.small_font.get_linesize() + 8)
+
+    def board(self, categories_count, tasks_per_category):
+        key = (categories_count, tasks_per_category)
+        board = self.boards.get(key)
+        if board is None:
+            board = BoardLayout(self.width, self.height, self.task_size, categories_count, tasks_per_category)
+            self.boards[key] = board
+        return board
+
+    def task_buttons(self, lines_count, answer_shown):
+        """Позиция ответа и кнопки окна задания для заданного числа строк.
+
+        Возвращает (y ответа, кнопка "Показать ответ", "Принять", "Отклонить").
+        """
+        key = (lines_count, answer_shown)
+        buttons = self.task_buttons_cache.get(key)
+        if buttons is None:
+            window = self.task_window
+            button_width, button_height = self.task_button_size
+            spacing = self.task_button_spacing
+            answer_y = self.task_lines_pos[1] + lines_count * self.task_line_step
+            buttons_y = answer_y + (self.task_answer_step if answer_shown else 0)
+            buttons = (
+                answer_y,
+                pygame.Rect(window.centerx - button_width // 2, buttons_y, button_width, button_height),
+                pygame.Rect(window.centerx - button_width - spacing // 2, buttons_y, button_width, button_height),
+                pygame.Rect(window.centerx + spacing // 2, buttons_y, button_width, button_height)
+            )
+            self.task_buttons_cache[key] = buttons
+        return buttons
+
+layouts = OrderedDict()
+MAX_LAYOUTS = 4
+layout = None
+
+def set_resolution(width, height):
+    """Переключает геометрию и шрифты на новый размер экрана.
+
+    Раскладка для каждого размера кэшируется, поэтому поворот телефона
+    туда и обратно ничего не пересчитывает.
+    """
+    global SCREEN_WIDTH, SCREEN_HEIGHT, layout
+    global title_font, header_font, normal_font, small_font
+    layout = layouts.get((width, height))
+    if layout is None:
+        layout = Layout(width, height, IS_MOBILE)
+        layouts[(width, height)] = layout
+        while len(layouts) > MAX_LAYOUTS:
+            layouts.popitem(last=False)
+    else:
+        layouts.move_to_end((width, height))
     
-    def next_player(self):
-        self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
-        if self.current_player_idx == 0:
-            self.round_counter += 1
-            if self.tasks_remaining < len(self.players):
-                self.state = "GAME_OVER"
+    SCREEN_WIDTH, SCREEN_HEIGHT = width, height
+    title_font = layout.title_font
+    header_font = layout.header_font
+    normal_font = layout.normal_font
+    small_font = layout.small_font
+    request_task_atlas()
+
+
+# Аватары игроков по размерам (по три на каждое разрешение экрана);
+# рисуются при первом запросе и пропадают вместе с игроком
+avatars = weakref.WeakKeyDictionary()
+MAX_AVATAR_SIZES = 6
+
+def get_avatar(player, size):
+    """Аватар игрока нужного размера"""
+    sizes = avatars.setdefault(player, {})
+    avatar = sizes.get(size)
+    if avatar is None:
+        avatar = generate_avatar(player, size)
+        sizes[size] = avatar
+        while len(sizes) > MAX_AVATAR_SIZES:
+            del sizes[next(iter(sizes))]
+    return avatar
+
+def generate_avatar(player, avatar_size):
+    # Рисуем сразу в нужном размере, чтобы не масштабировать готовую картинку
+    avatar = pygame.Surface((avatar_size, avatar_size), pygame.SRCALPHA)
+    pygame.draw.circle(avatar, player.color, (avatar_size//2, avatar_size//2), avatar_size//2)
+    initials = "".join([n[0] for n in player.name.split()]).upper()[:2]
+    font = get_font(max(1, avatar_size * 2 // 5), bold=True)
+    text = font.render(initials, True, (255, 255, 255))
+    avatar.blit(text, (avatar_size//2 - text.get_width()//2, avatar_size//2 - text.get_height()//2))
+    return avatar.convert_alpha()
+
+class DirtyRegions:
+    """Изменившиеся с прошлого кадра области экрана (режим "dirty")"""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.rects = []
+        self.full = True
+        self.watched = {}
+
+    def add(self, rect):
+        if self.enabled and not self.full:
+            self.rects.append(pygame.Rect(rect))
+
+    def invalidate(self):
+        """Требует полной перерисовки экрана"""
+        self.full = True
+        self.rects = []
+
+    def watch(self, key, value, rect=None):
+        """Помечает область, если наблюдаемое значение изменилось.
+
+        Без rect изменение значения приводит к полной перерисовке.
+        """
+        if self.watched.get(key, self) != value:
+            self.watched[key] = value
+            if rect is None:
+                self.invalidate()
             else:
-                self.state = "INTERMEDIATE_RESULTS"
-    
-    def select_task(self, category, difficulty):
-        if not self.task_window_open and 0 <= category < 4 and 0 <= difficulty < len(self.tasks[category]):
-            task = self.tasks[category][difficulty]
-            if not task["completed"]:
-                self.selected_category = category
-                self.selected_difficulty = difficulty
-                self.task_window_open = True
-                self.show_answer = False
-                return True
-        return False
-    
-    def complete_task(self, success):
-        if self.selected_category is not None and self.selected_difficulty is not None:
-            task = self.tasks[self.selected_category][self.selected_difficulty]
-            if not task["completed"]:
-                task["completed"] = True
-                self.completed_tasks += 1
-                self.tasks_remaining -= 1
-                
-                if success:
-                    points = task["difficulty"]
-                    self.players[self.current_player_idx].add_score(points)
-                    
-                self.task_window_open = False
-                self.next_player()
-                return True
-        return False
+                self.add(rect)
+
+    def take(self):
+        """Возвращает области для обновления и очищает список.
+
+        None означает весь экран, пустой список - обновлять нечего.
+        """
+        if self.full:
+            self.full = False
+            self.rects = []
+            return None
+        rects = self.rects
+        self.rects = []
+        # Много мелких областей дешевле обновить одним прямоугольником
+        if len(rects) > 8:
+            rects = [rects[0].unionall(rects[1:])]
+        return rects
+
+dirty = DirtyRegions(enabled=False)
+
+# Кадров на полной частоте после смены подсветки кнопки или поля ввода
+HOVER_FRAMES = 10
 
 class Button:
     def __init__(self, x, y, width, height, text, color=BUTTON_COLOR, hover_color=BUTTON_HOVER_COLOR):
@@ -251,7 +559,12 @@ class Button:
         surface.blit(text_surf, text_rect)
         
     def check_hover(self, pos):
-        self.is_hovered = self.rect.collidepoint(pos)
+        is_hovered = bool(self.rect.collidepoint(pos))
+        if is_hovered != self.is_hovered:
+            self.is_hovered = is_hovered
+            dirty.add(self.rect)
+            # Подсветка кнопки - короткая анимация: следующие кадры на полной частоте
+            scheduler.request_frames(HOVER_FRAMES)
         
     def is_clicked(self, pos, event):
         if event.type == MOUSEBUTTONDOWN and event.button == 1:
@@ -265,8 +578,9 @@ class InputBox:
         self.active = False
         
     def handle_event(self, event):
+        old_state = (self.active, self.text)
         if event.type == MOUSEBUTTONDOWN:
-            self.active = self.rect.collidepoint(event.pos)
+            self.active = bool(self.rect.collidepoint(event.pos))
         
         if event.type == KEYDOWN and self.active:
             if event.key == K_RETURN:
@@ -275,6 +589,11 @@ class InputBox:
                 self.text = self.text[:-1]
             else:
                 self.text += event.unicode
+        
+        if (self.active, self.text) != old_state:
+            # Длинный текст выходит за правую границу поля
+            dirty.add((self.rect.x, self.rect.y, max(self.rect.width, SCREEN_WIDTH - self.rect.x), self.rect.height))
+            scheduler.request_frames(HOVER_FRAMES)
         return False
         
     def draw(self, surface):
@@ -291,45 +610,131 @@ class InputBox:
                             (self.rect.x + cursor_pos, self.rect.y + 5),
                             (self.rect.x + cursor_pos, self.rect.y + self.rect.height - 5), 2)
 
-def draw_setup_screen(game):
-    screen.fill(BACKGROUND_COLOR)
+class ScrollList:
+    """Список строк одинаковой высоты с прокруткой колесом или пальцем.
+
+    Рисуются только строки, попадающие в область rect, поэтому кадр стоит
+    одинаково при любом числе строк. offset - прокрутка в точках.
+    """
+    def __init__(self):
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.step = 1
+        self.offset = 0
+        self.count = 0
+        
+    def place(self, rect, step):
+        self.rect = pygame.Rect(rect)
+        self.step = max(1, step)
+        self.scroll(0)
+        
+    @property
+    def max_offset(self):
+        return max(0, self.count * self.step - self.rect.height)
+        
+    def scroll(self, dy):
+        offset = min(max(0, self.offset + int(dy)), self.max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            dirty.add(self.rect)
+            
+    def scroll_to(self, index):
+        """Прокручивает так, чтобы строка index была видна целиком"""
+        self.count = max(self.count, index + 1)
+        top = index * self.step
+        if top < self.offset:
+            self.scroll(top - self.offset)
+        elif top + self.step > self.offset + self.rect.height:
+            self.scroll(top + self.step - self.rect.height - self.offset)
+        
+    def handle_event(self, event, pos):
+        if event.type == MOUSEWHEEL and self.rect.collidepoint(pos):
+            self.scroll(-event.y * self.step)
+        elif event.type == FINGERMOTION and self.rect.collidepoint(event.x * SCREEN_WIDTH, event.y * SCREEN_HEIGHT):
+            self.scroll(-event.dy * SCREEN_HEIGHT)
+            
+    def rows(self, count):
+        """Видимые строки из count: пары (номер строки, y ее верхнего края)"""
+        self.count = count
+        self.offset = min(self.offset, self.max_offset)
+        first = self.offset // self.step
+        last = min(count, (self.offset + self.rect.height + self.step - 1) // self.step)
+        top = self.rect.y - self.offset
+        return [(i, top + i * self.step) for i in range(first, last)]
+        
+    def draw_scrollbar(self, surface):
+        """Полоса прокрутки у правого края, если строки не помещаются"""
+        if self.max_offset:
+            rect = self.rect
+            thumb = max(rect.height * rect.height // (self.count * self.step), 10)
+            y = rect.y + (rect.height - thumb) * self.offset // self.max_offset
+            pygame.draw.rect(surface, (200, 200, 200), (rect.right - 8, rect.y, 4, rect.height), border_radius=2)
+            pygame.draw.rect(surface, TEXT_COLOR, (rect.right - 8, y, 4, thumb), border_radius=2)
+
+def clip_to(surface, rect):
+    """Ограничивает рисование областью rect внутри текущей; возвращает прежнюю"""
+    clip = surface.get_clip()
+    surface.set_clip(clip.clip(rect))
+    return clip
+
+# Кэш статических слоев: фон, панели и заголовки рисуются один раз
+static_layers = OrderedDict()
+MAX_STATIC_LAYERS = 8
+
+def get_static_layer(key, build, *args):
+    """Возвращает готовый статический слой, при необходимости строит его"""
+    key = (key, screen.get_size())
+    layer = static_layers.get(key)
+    if layer is None:
+        layer = pygame.Surface(screen.get_size()).convert()
+        build(layer, *args)
+        static_layers[key] = layer
+        while len(static_layers) > MAX_STATIC_LAYERS:
+            static_layers.popitem(last=False)
+    else:
+        static_layers.move_to_end(key)
+    return layer
+
+def build_setup_layer(surface):
+    surface.fill(BACKGROUND_COLOR)
     
     # Заголовок
     title = title_font.render("Подарочек", True, (220, 20, 60))
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, SCREEN_HEIGHT * 0.05))
+    surface.blit(title, (layout.width // 2 - title.get_width() // 2, layout.setup_title_y))
     
     # Декоративные элементы
-    circle_size = SCREEN_WIDTH * 0.07
-    pygame.draw.circle(screen, (255, 182, 193), (SCREEN_WIDTH * 0.17, SCREEN_HEIGHT * 0.19), circle_size)
-    pygame.draw.circle(screen, (173, 216, 230), (SCREEN_WIDTH * 0.83, SCREEN_HEIGHT * 0.19), circle_size)
-    pygame.draw.circle(screen, (144, 238, 144), (SCREEN_WIDTH * 0.17, SCREEN_HEIGHT * 0.81), circle_size)
-    pygame.draw.circle(screen, (255, 99, 71), (SCREEN_WIDTH * 0.83, SCREEN_HEIGHT * 0.81), circle_size)
+    for color, center in layout.setup_circles:
+        pygame.draw.circle(surface, color, center, layout.setup_circle_radius)
     
     # Панель настройки
-    panel_rect = pygame.Rect(SCREEN_WIDTH * 0.08, SCREEN_HEIGHT * 0.19, SCREEN_WIDTH * 0.84, SCREEN_HEIGHT * 0.62)
-    pygame.draw.rect(screen, PANEL_COLOR, panel_rect, border_radius=20)
-    pygame.draw.rect(screen, TEXT_COLOR, panel_rect, 2, border_radius=20)
+    pygame.draw.rect(surface, PANEL_COLOR, layout.setup_panel, border_radius=20)
+    pygame.draw.rect(surface, TEXT_COLOR, layout.setup_panel, 2, border_radius=20)
     
     # Заголовок панели
     setup_title = header_font.render("Настройка игры", True, TEXT_COLOR)
-    screen.blit(setup_title, (SCREEN_WIDTH // 2 - setup_title.get_width() // 2, SCREEN_HEIGHT * 0.22))
+    surface.blit(setup_title, (layout.width // 2 - setup_title.get_width() // 2, layout.setup_header_y))
     
     # Ввод количества заданий
     tasks_label = normal_font.render("Количество заданий в категории (5-50):", True, TEXT_COLOR)
-    screen.blit(tasks_label, (SCREEN_WIDTH * 0.17, SCREEN_HEIGHT * 0.31))
+    surface.blit(tasks_label, layout.tasks_label_pos)
     
     # Ввод имени игрока
     player_label = normal_font.render("Имя игрока:", True, TEXT_COLOR)
-    screen.blit(player_label, (SCREEN_WIDTH * 0.17, SCREEN_HEIGHT * 0.40))
+    surface.blit(player_label, layout.player_label_pos)
     
     # Информация об игроках
     players_label = normal_font.render("Добавленные игроки:", True, TEXT_COLOR)
-    screen.blit(players_label, (SCREEN_WIDTH * 0.17, SCREEN_HEIGHT * 0.52))
+    surface.blit(players_label, layout.players_label_pos)
+
+def draw_setup_screen(game):
+    screen.blit(get_static_layer("SETUP", build_setup_layer), (0, 0))
     
-    # Список игроков
-    for i, player in enumerate(game.players):
-        player_text = small_font.render(f"{i+1}. {player.name}", True, TEXT_COLOR)
-        screen.blit(player_text, (SCREEN_WIDTH * 0.18, SCREEN_HEIGHT * 0.57 + i * SCREEN_HEIGHT * 0.04))
+    # Список игроков (видимая часть)
+    clip = clip_to(screen, setup_list.rect)
+    for i, row_y in setup_list.rows(len(game.players)):
+        player_text = small_font.render(f"{i+1}. {game.players[i].name}", True, TEXT_COLOR)
+        screen.blit(player_text, (setup_list.rect.x, row_y))
+    screen.set_clip(clip)
+    setup_list.draw_scrollbar(screen)
     
     # Отрисовка полей ввода
     tasks_input.draw(screen)
@@ -339,398 +744,838 @@ def draw_setup_screen(game):
     start_btn.draw(screen)
     add_player_btn.draw(screen)
 
-def draw_game_screen(game):
-    screen.fill(BACKGROUND_COLOR)
+COMPLETED_TASK_COLOR = (100, 200, 100)
+# Надписи кружков в атласе - сложности заданий (одна шкала для всех категорий)
+TASK_NUMBERS = MAX_DIFFICULTY
+
+def build_task_atlas(radius, font_size, labels):
+    """Рисует все кружки заданий на одной поверхности (выполняется в фоновом потоке).
+
+    Строка атласа - цвет (категории, последняя - выполненное задание),
+    столбец - сложность задания. Надписи labels отрисованы заранее в главном
+    потоке. Возвращает (ключ, поверхность, размер ячейки).
+    """
+    cell = max(2 * radius + 2, max(max(label.get_size()) for label in labels))
+    center = cell // 2
+    colors = CATEGORY_COLORS + [COMPLETED_TASK_COLOR]
+    # Фон - цвет панели, он же прозрачный цвет атласа: такая поверхность
+    # копируется на экран быстрее, чем с прозрачностью каждой точки
+    surface = pygame.Surface((cell * TASK_NUMBERS, cell * len(colors)))
+    surface.fill(PANEL_COLOR)
+    for row, color in enumerate(colors):
+        for number, label in enumerate(labels):
+            x, y = number * cell + center, row * cell + center
+            pygame.draw.circle(surface, color, (x, y), radius)
+            pygame.draw.circle(surface, TEXT_COLOR, (x, y), radius, 2)
+            surface.blit(label, (x - label.get_width() // 2, y - label.get_height() // 2))
+    return (radius, font_size), surface, cell
+
+class TaskAtlas:
+    """Атлас кружков заданий одного размера.
+
+    Список для blits пересобирается, только когда меняются поле или
+    выполненные задания, поэтому кадр поля стоит одного вызова blits
+    при любом числе заданий.
+    """
+    def __init__(self, key, surface, cell):
+        self.key = key
+        self.surface = surface
+        self.cell = cell
+        self.areas = [[pygame.Rect(number * cell, row * cell, cell, cell) for number in range(TASK_NUMBERS)]
+                      for row in range(len(CATEGORY_COLORS) + 1)]
+        self.blits_key = None
+        self.blits = None
+
+    def board_blits(self, tasks, board):
+        key = (board, tuple(tasks.completed), tuple(values.tobytes() for values in tasks.difficulty))
+        if key != self.blits_key:
+            done_row = self.areas[-1]
+            half = self.cell // 2
+            self.blits = []
+            for i in range(len(tasks)):
+                completed = tasks.completed[i]
+                row = self.areas[i]
+                difficulty = tasks.difficulty[i]
+                for j in range(min(board.tasks_per_category, tasks.size(i))):
+                    task_x, task_y = board.task_center(i, j)
+                    column = difficulty[j] - 1
+                    area = done_row[column] if completed >> j & 1 else row[column]
+                    self.blits.append((self.surface, (task_x - half, task_y - half), area))
+            self.blits_key = key
+        return self.blits
+
+# Атлас под текущий размер кружков и ключ атласа, который рисуется в фоне
+task_atlas = None
+atlas_requested = None
+
+def atlas_key(board):
+    return board.radius, small_font.point_size
+
+def request_task_atlas():
+    """Заказывает фоновую отрисовку атласа под текущую раскладку"""
+    global atlas_requested
+    key = (layout.task_size // 2, layout.small_font.point_size)
+    if key == atlas_requested or task_atlas is not None and task_atlas.key == key:
+        return
+    atlas_requested = key
+    # Текст рисуется только в главном потоке: FreeType не потокобезопасен
+    labels = [layout.small_font.render(str(number + 1), True, TEXT_COLOR) for number in range(TASK_NUMBERS)]
+    loader.submit("atlas", build_task_atlas, *key, labels)
+
+def adopt_task_atlas(wait=False):
+    """Берет нарисованный атлас; wait - дождаться, если он еще рисуется.
+
+    Кружки из атласа и нарисованные по одному совпадают до точки, поэтому
+    подмена посреди партии не требует перерисовки экрана.
+    """
+    global task_atlas, atlas_requested
+    if atlas_requested is None or not wait and not loader.ready("atlas"):
+        return
+    built = loader.result("atlas")
+    if built is None:
+        # Не нарисовался - кружки рисуются по одному
+        atlas_requested = None
+        return
+    key, surface, cell = built
+    if key == atlas_requested:
+        # Поверхность переводится в формат экрана в главном потоке
+        surface = surface.convert()
+        surface.set_colorkey(PANEL_COLOR)
+        task_atlas = TaskAtlas(key, surface, cell)
+        atlas_requested = None
+
+def get_board_layout(game):
+    return layout.board(len(game.categories), game.tasks_per_category)
+
+def build_game_layer(surface, categories, board):
+    surface.fill(BACKGROUND_COLOR)
     
-    # Декоративные элементы
+    # Декоративные элементы: свой генератор с постоянным seed, чтобы точки
+    # не менялись при пересборке слоя и не сдвигали случайность партии
+    dots = random.Random(0)
     for i in range(20):
-        x = random.randint(0, SCREEN_WIDTH)
-        y = random.randint(0, SCREEN_HEIGHT)
-        pygame.draw.circle(screen, CATEGORY_COLORS[i % 4], (x, y), 5)
+        x = dots.randint(0, layout.width)
+        y = dots.randint(0, layout.height)
+        pygame.draw.circle(surface, CATEGORY_COLORS[i % 4], (x, y), 5)
     
     # Заголовок
     title = title_font.render("Подарочек", True, (220, 20, 60))
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, SCREEN_HEIGHT * 0.02))
+    surface.blit(title, (layout.width // 2 - title.get_width() // 2, layout.game_title_y))
+    
+    # Панель категорий
+    for i, category in enumerate(categories):
+        panel = board.panel_rect(i)
+        pygame.draw.rect(surface, CATEGORY_COLORS[i], panel, border_radius=15)
+        pygame.draw.rect(surface, TEXT_COLOR, panel, 2, border_radius=15)
+        
+        # Название категории
+        cat_text = header_font.render(category, True, TEXT_COLOR)
+        surface.blit(cat_text, (panel.centerx - cat_text.get_width() // 2, panel.y + board.title_dy))
+
+def draw_game_screen(game):
+    board = get_board_layout(game)
+    layer_key = ("PLAYING", tuple(game.categories), board.categories_count)
+    screen.blit(get_static_layer(layer_key, build_game_layer, game.categories, board), (0, 0))
     
     # Информация о раунде
     round_text = header_font.render(f"Раунд: {game.round_counter}", True, TEXT_COLOR)
-    screen.blit(round_text, (SCREEN_WIDTH * 0.8, SCREEN_HEIGHT * 0.02))
+    screen.blit(round_text, layout.round_rect.topleft)
     
     # Прогресс выполнения
     progress = game.completed_tasks / game.total_tasks if game.total_tasks > 0 else 0
-    pygame.draw.rect(screen, (200, 200, 200), (SCREEN_WIDTH * 0.04, SCREEN_HEIGHT * 0.10, SCREEN_WIDTH * 0.92, SCREEN_HEIGHT * 0.025))
-    pygame.draw.rect(screen, (0, 150, 0), (SCREEN_WIDTH * 0.04, SCREEN_HEIGHT * 0.10, SCREEN_WIDTH * 0.92 * progress, SCREEN_HEIGHT * 0.025))
+    bar = layout.progress_bar
+    pygame.draw.rect(screen, (200, 200, 200), bar)
+    pygame.draw.rect(screen, (0, 150, 0), (bar.x, bar.y, bar.width * progress, bar.height))
     progress_text = small_font.render(f"Выполнено: {game.completed_tasks}/{game.total_tasks} ({int(progress*100)}%)", True, TEXT_COLOR)
-    screen.blit(progress_text, (SCREEN_WIDTH // 2 - progress_text.get_width() // 2, SCREEN_HEIGHT * 0.102))
+    screen.blit(progress_text, (layout.width // 2 - progress_text.get_width() // 2, layout.progress_text_y))
     
-    # Информация о текущем игроке
-    if game.players:
+    # Информация о текущем игроке или подсказка, куда поставить найденное задание
+    if search_choice is not None:
+        category = game.categories[search_choice[0]]
+        hint = header_font.render(f"Замена: выберите на поле задание «{category}»", True, TEXT_COLOR)
+        screen.blit(hint, layout.current_player_rect.topleft)
+    elif game.players:
         current_player = game.players[game.current_player_idx]
         player_text = header_font.render(f"Текущий игрок: {current_player.name}", True, current_player.color)
-        screen.blit(player_text, (SCREEN_WIDTH * 0.04, SCREEN_HEIGHT * 0.14))
+        screen.blit(player_text, layout.current_player_rect.topleft)
     
-    # Панель категорий
-    category_width = (SCREEN_WIDTH - SCREEN_WIDTH * 0.08) // 4 - 10
-    for i, category in enumerate(game.categories):
-        x = SCREEN_WIDTH * 0.04 + i * (category_width + 10)
-        y = SCREEN_HEIGHT * 0.19
-        height = SCREEN_HEIGHT * 0.75
+    # Задания (кружочки): одним вызовом blits из атласа, пока его нет - по одному
+    if task_atlas is None or task_atlas.key != atlas_key(board):
+        adopt_task_atlas()
+    if task_atlas is not None and task_atlas.key == atlas_key(board):
+        screen.blits(task_atlas.board_blits(game.tasks, board), doreturn=False)
+    else:
+        draw_task_circles(game, board)
+    
+    if can_search(game):
+        search_btn.draw(screen)
+
+def draw_task_circles(game, board):
+    for i in range(len(game.tasks)):
+        completed = game.tasks.completed[i]
+        for j in range(min(board.tasks_per_category, game.tasks.size(i))):
+            task_x, task_y = board.task_center(i, j)
+            
+            color = COMPLETED_TASK_COLOR if completed >> j & 1 else CATEGORY_COLORS[i]
+            pygame.draw.circle(screen, color, (task_x, task_y), board.radius)
+            pygame.draw.circle(screen, TEXT_COLOR, (task_x, task_y), board.radius, 2)
+            
+            # Сложность задания - столько очков оно приносит
+            num_text = small_font.render(str(game.tasks.difficulty[i][j]), True, TEXT_COLOR)
+            screen.blit(num_text, (task_x - num_text.get_width() // 2, task_y - num_text.get_height() // 2))
+
+def wrap_text(font, text, max_width):
+    """Разбивает текст на строки не шире max_width.
+
+    Ширина каждого слова измеряется один раз, строки собираются жадно за
+    один проход, поэтому длинные описания разбиваются за линейное время.
+    """
+    space_width = font.size(" ")[0]
+    lines = []
+    current_words = []
+    current_width = 0
+    
+    for word in text.split():
+        word_width = font.size(word)[0]
+        if current_words and current_width + space_width + word_width >= max_width:
+            lines.append(" ".join(current_words))
+            current_words = []
+            current_width = 0
+        if current_words:
+            current_width += space_width
+        current_words.append(word)
+        current_width += word_width
+    lines.append(" ".join(current_words))
+    return lines
+
+class TaskModal:
+    """Окно задания, собранное заранее.
+
+    Рамка, заголовок и разбитое на строки описание рисуются в отдельную
+    поверхность один раз при открытии задания. Пересборка нужна только
+    когда показывается ответ или меняется размер экрана; в остальных
+    кадрах остаются два блита и кнопки.
+    """
+    def __init__(self):
+        self.key = None
+        self.surface = None
+        self.overlay = None
+        self.lines_count = 0
+
+    def get_overlay(self):
+        # Прозрачность всей поверхности смешивается быстрее попиксельной
+        if self.overlay is None or self.overlay.get_size() != screen.get_size():
+            self.overlay = pygame.Surface(screen.get_size()).convert()
+            self.overlay.fill((0, 0, 0))
+            self.overlay.set_alpha(150)
+        return self.overlay
+
+    def compose(self, game):
+        window = layout.task_window
+        surface = pygame.Surface(window.size, pygame.SRCALPHA)
         
-        pygame.draw.rect(screen, CATEGORY_COLORS[i], (x, y, category_width, height), border_radius=15)
-        pygame.draw.rect(screen, TEXT_COLOR, (x, y, category_width, height), 2, border_radius=15)
+        def local(pos):
+            return (pos[0] - window.x, pos[1] - window.y)
         
-        # Название категории
-        cat_text = header_font.render(category, True, TEXT_COLOR)
-        screen.blit(cat_text, (x + category_width // 2 - cat_text.get_width() // 2, y + SCREEN_HEIGHT * 0.02))
+        # Окно задания
+        frame = pygame.Rect((0, 0), window.size)
+        pygame.draw.rect(surface, PANEL_COLOR, frame, border_radius=20)
+        pygame.draw.rect(surface, TEXT_COLOR, frame, 3, border_radius=20)
         
-        # Задания (кружочки)
-        tasks_per_row = 5
-        task_size = SCREEN_WIDTH * 0.025 if IS_MOBILE else 30
-        spacing = SCREEN_WIDTH * 0.01
-        start_y = y + SCREEN_HEIGHT * 0.10
+        # Заголовок
+        cat_idx = game.selected_category
+        difficulty = game.tasks.difficulty[cat_idx][game.selected_difficulty]
+        description, answer = game.task_text(cat_idx, game.selected_difficulty)
+        title = header_font.render(f"Задание: Уровень {difficulty}", True, TEXT_COLOR)
+        surface.blit(title, (frame.centerx - title.get_width() // 2, layout.task_title_y - window.y))
         
-        # Рассчитаем общую ширину всех кружков в ряду
-        total_width = tasks_per_row * task_size + (tasks_per_row - 1) * spacing
-        start_x = x + (category_width - total_width) // 2
+        # Категория
+        cat_text = normal_font.render(f"Категория: {game.categories[cat_idx]}", True, CATEGORY_COLORS[cat_idx])
+        surface.blit(cat_text, local(layout.task_category_pos))
         
-        # Определяем количество строк
-        rows = min(10, (game.tasks_per_category + tasks_per_row - 1) // tasks_per_row)
+        # Описание задания
+        desc_text = normal_font.render("Задание:", True, TEXT_COLOR)
+        surface.blit(desc_text, local(layout.task_label_pos))
         
-        for j in range(min(game.tasks_per_category, 50)):
-            row = j // tasks_per_row
-            col = j % tasks_per_row
-            
-            # Пропускаем если больше 10 строк (для мобильных)
-            if row >= rows:
-                continue
-                
-            task_x = start_x + col * (task_size + spacing)
-            task_y = start_y + row * (task_size + spacing)
-            
-            task = game.tasks[i][j]
-            color = (100, 200, 100) if task["completed"] else CATEGORY_COLORS[i]
-            pygame.draw.circle(screen, color, (task_x, task_y), task_size // 2)
-            pygame.draw.circle(screen, TEXT_COLOR, (task_x, task_y), task_size // 2, 2)
-            
-            # Номер задания
-            num_text = small_font.render(str(j+1), True, TEXT_COLOR)
-            screen.blit(num_text, (task_x - num_text.get_width() // 2, task_y - num_text.get_height() // 2))
+        lines = wrap_text(normal_font, description, layout.task_text_width)
+        
+        # Ограничение количества строк для мобильных
+        max_lines = layout.task_max_lines
+        if len(lines) > max_lines:
+            lines = lines[:max_lines]
+            lines[-1] = lines[-1][:min(len(lines[-1]), 30)] + "..."  # Обрезаем последнюю строку
+        
+        lines_x, lines_y = local(layout.task_lines_pos)
+        for i, line in enumerate(lines):
+            line_surf = normal_font.render(line, True, TEXT_COLOR)
+            surface.blit(line_surf, (lines_x, lines_y + i * layout.task_line_step))
+        self.lines_count = len(lines)
+        
+        # Показываем ответ только если нажали кнопку "Показать ответ"
+        if cat_idx == 0 and show_answer:
+            answer_y = layout.task_buttons(self.lines_count, True)[0] - window.y
+            ans_text = normal_font.render(f"Правильный ответ: {answer}", True, (0, 100, 0))
+            surface.blit(ans_text, (lines_x, answer_y))
+        
+        self.surface = surface.convert_alpha()
+
+    def draw(self, surface, game):
+        key = (id(game), game.selected_category, game.selected_difficulty, show_answer, layout)
+        if key != self.key:
+            self.compose(game)
+            self.key = key
+        
+        surface.blit(self.get_overlay(), (0, 0))
+        surface.blit(self.surface, layout.task_window)
+        
+        answer_shown = game.selected_category == 0 and show_answer
+        _, show_answer_rect, accept_rect, reject_rect = layout.task_buttons(self.lines_count, answer_shown)
+        if game.selected_category == 0 and not show_answer:  # Загадки
+            # Кнопка "Показать ответ"
+            show_answer_btn.rect = show_answer_rect
+            show_answer_btn.draw(surface)
+        else:
+            # Кнопки принятия/отклонения
+            accept_btn.rect = accept_rect
+            accept_btn.draw(surface)
+            reject_btn.rect = reject_rect
+            reject_btn.draw(surface)
+
+task_modal = TaskModal()
 
 def draw_task_window(game):
-    if not game.task_window_open:
+    if not game.task_in_progress:
         return
+    task_modal.draw(screen, game)
+
+# Поиск задания для замены на поле: индекс колоды (search.TaskIndex) и
+# колода, под которую он собирается в фоне; открыто ли окно поиска, запрос,
+# по которому найдены задания, найденные задания и выбранное из них
+# (категория, номер в колоде), которое ждет места на поле
+search_index = None
+search_requested = None
+search_open = False
+search_query = None
+search_results = []
+search_choice = None
+
+def can_search(game):
+    """Задания на поле меняются между ходами; на сервере - только с общего экрана стола"""
+    if isinstance(game, client.RemoteGame) and not game.table:
+        return False
+    return game.state == "PLAYING" and not game.task_in_progress
+
+def search_deck(game):
+    """Колода, из которой на поле партии ставятся задания"""
+    if game.task_data is not None:
+        return game.task_data
+    # Поле партии на сервере собрано из тех же data/*.txt
+    return loader.result("deck") if loader.ready("deck") else None
+
+def search_ready(game):
+    return search_index is not None and search_index.deck is search_deck(game)
+
+def request_search_index(game):
+    """Заказывает фоновую сборку индекса под колоду партии.
+
+    Категории, исходные файлы которых не менялись, берутся из прежнего
+    индекса, поэтому после правки одного файла разбирается только он.
+    """
+    global search_requested
+    deck = search_deck(game)
+    if deck is None or deck is search_requested or search_index is not None and search_index.deck is deck:
+        return
+    search_requested = deck
+    loader.submit("search", search.TaskIndex.build, deck, search_index)
+
+def adopt_search_index():
+    """Берет собранный индекс (по событию, чтобы запись воспроизводилась точно)"""
+    global search_index, search_query
+    built = loader.result("search")
+    # Если индекс не собрался, он не заказывается заново до следующей версии колоды
+    if built is not None and built.deck is search_requested:
+        search_index = built
+        search_query = None
+
+def open_search():
+    global search_open, search_query
+    search_open = True
+    search_query = None
+    search_input.active = True
+    search_input.text = ""
+
+def update_search(game):
+    """Ищет задания, когда меняется запрос или готов новый индекс"""
+    global search_open, search_choice, search_query, search_results
+    if not can_search(game):
+        search_open = False
+        search_choice = None
+        return
+    request_search_index(game)
+    if not search_open or not search_ready(game) or search_input.text == search_query:
+        return
+    search_query = search_input.text
+    # Задания, которые уже стоят на поле, не предлагаются
+    board = game.tasks.indices
+    search_results = [(category, task) for category, task in search_index.search(search_query)
+                      if task not in board[category]]
+    search_list.scroll(-search_list.offset)
+
+def handle_search_event(event, pos):
+    """Ввод запроса и выбор найденного задания; Esc, F6 или "Закрыть" закрывают окно"""
+    global search_open, search_choice
+    if close_search_btn.is_clicked(pos, event) or event.type == KEYDOWN and event.key in (K_ESCAPE, K_F6):
+        search_open = False
+        return
+    search_input.handle_event(event)
+    search_list.handle_event(event, pos)
+    if event.type == MOUSEBUTTONDOWN and event.button == 1 and search_list.rect.collidepoint(pos):
+        row = (pos[1] - search_list.rect.y + search_list.offset) // search_list.step
+        if row < len(search_results):
+            search_choice = search_results[row]
+            search_open = False
+
+def place_search_choice(game, hit):
+    """Ставит выбранное задание на место hit (категория, строка, столбец) поля.
+
+    Щелчок мимо заданий (hit None) отменяет замену.
+    """
+    global search_choice
+    if hit is None:
+        search_choice = None
+        return
+    category, row, col = hit
+    if category == search_choice[0] and game.replace_task(category, row * BoardLayout.TASKS_PER_ROW + col,
+                                                          search_choice[1]):
+        search_choice = None
+
+def draw_search_window(game):
+    window = layout.task_window
+    screen.blit(task_modal.get_overlay(), (0, 0))
+    pygame.draw.rect(screen, PANEL_COLOR, window, border_radius=20)
+    pygame.draw.rect(screen, TEXT_COLOR, window, 3, border_radius=20)
+    title = header_font.render("Поиск задания", True, TEXT_COLOR)
+    screen.blit(title, (window.centerx - title.get_width() // 2, layout.search_title_y))
+    search_input.draw(screen)
     
-    # Затемнение фона
-    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 150))
-    screen.blit(s, (0, 0))
-    
-    # Окно задания
-    window_width = SCREEN_WIDTH * 0.8 if IS_MOBILE else 800
-    window_height = SCREEN_HEIGHT * 0.6 if IS_MOBILE else 500
-    window_x = (SCREEN_WIDTH - window_width) // 2
-    window_y = (SCREEN_HEIGHT - window_height) // 2
-    
-    pygame.draw.rect(screen, PANEL_COLOR, (window_x, window_y, window_width, window_height), border_radius=20)
-    pygame.draw.rect(screen, TEXT_COLOR, (window_x, window_y, window_width, window_height), 3, border_radius=20)
-    
-    # Заголовок
-    cat_idx = game.selected_category
-    task = game.tasks[cat_idx][game.selected_difficulty]
-    title = header_font.render(f"Задание: Уровень {task['difficulty']}", True, TEXT_COLOR)
-    screen.blit(title, (window_x + window_width // 2 - title.get_width() // 2, window_y + SCREEN_HEIGHT * 0.03))
-    
-    # Категория
-    cat_text = normal_font.render(f"Категория: {game.categories[cat_idx]}", True, CATEGORY_COLORS[cat_idx])
-    screen.blit(cat_text, (window_x + SCREEN_WIDTH * 0.04, window_y + SCREEN_HEIGHT * 0.08))
-    
-    # Описание задания
-    desc_text = normal_font.render("Задание:", True, TEXT_COLOR)
-    screen.blit(desc_text, (window_x + SCREEN_WIDTH * 0.04, window_y + SCREEN_HEIGHT * 0.13))
-    
-    # Разбиение описания на строки
-    description = task["description"]
-    words = description.split()
-    lines = []
-    current_line = ""
-    max_width = window_width - SCREEN_WIDTH * 0.08
-    
-    for word in words:
-        test_line = current_line + word + " "
-        if normal_font.size(test_line)[0] < max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word + " "
-    lines.append(current_line)
-    
-    # Ограничение количества строк для мобильных
-    max_lines = 5 if IS_MOBILE else 10
-    if len(lines) > max_lines:
-        lines = lines[:max_lines]
-        lines[-1] = lines[-1][:min(len(lines[-1]), 30)] + "..."  # Обрезаем последнюю строку
-    
-    for i, line in enumerate(lines):
-        line_surf = normal_font.render(line, True, TEXT_COLOR)
-        screen.blit(line_surf, (window_x + SCREEN_WIDTH * 0.06, window_y + SCREEN_HEIGHT * 0.16 + i * SCREEN_HEIGHT * 0.05))
-    
-    # Показываем ответ только если нажали кнопку "Показать ответ"
-    y_pos = window_y + SCREEN_HEIGHT * 0.16 + len(lines) * SCREEN_HEIGHT * 0.05
-    button_width = SCREEN_WIDTH * 0.15 if IS_MOBILE else 180
-    button_height = SCREEN_HEIGHT * 0.06 if IS_MOBILE else 50
-    button_spacing = SCREEN_WIDTH * 0.02
-    
-    if cat_idx == 0:  # Загадки
-        if game.show_answer:
-            # Показываем ответ
-            ans_text = normal_font.render(f"Правильный ответ: {task['answer']}", True, (0, 100, 0))
-            screen.blit(ans_text, (window_x + SCREEN_WIDTH * 0.06, y_pos))
-            y_pos += SCREEN_HEIGHT * 0.07
-            
-            # Кнопки принятия/отклонения
-            accept_btn.rect = pygame.Rect(
-                window_x + window_width // 2 - button_width - button_spacing // 2,
-                y_pos,
-                button_width,
-                button_height
-            )
-            accept_btn.draw(screen)
-            
-            reject_btn.rect = pygame.Rect(
-                window_x + window_width // 2 + button_spacing // 2,
-                y_pos,
-                button_width,
-                button_height
-            )
-            reject_btn.draw(screen)
-        else:
-            # Кнопка "Показать ответ"
-            show_answer_btn.rect = pygame.Rect(
-                window_x + window_width // 2 - button_width // 2,
-                y_pos,
-                button_width,
-                button_height
-            )
-            show_answer_btn.draw(screen)
+    rect = search_list.rect
+    if not search_ready(game):
+        message = "Загрузка заданий..."
+    elif not search.query_terms(search_query or ""):
+        message = "Введите слово из задания, например «песня»"
+    elif not search_results:
+        message = "Ничего не найдено"
+    else:
+        message = None
+    if message:
+        text = normal_font.render(message, True, TEXT_COLOR)
+        screen.blit(text, (rect.x + 10, rect.y))
     else:
-        # Для остальных категорий сразу показываем кнопки "Принять" и "Отклонить"
-        accept_btn.rect = pygame.Rect(
-            window_x + window_width // 2 - button_width - button_spacing // 2,
-            y_pos,
-            button_width,
-            button_height
-        )
-        accept_btn.draw(screen)
-        
-        reject_btn.rect = pygame.Rect(
-            window_x + window_width // 2 + button_spacing // 2,
-            y_pos,
-            button_width,
-            button_height
-        )
-        reject_btn.draw(screen)
+        # Найденные задания: кружок цвета категории и текст, обрезанный по ширине списка
+        deck = search_index.deck
+        radius = search_list.step // 4
+        clip = clip_to(screen, (rect.x, rect.y, rect.width - 12, rect.height))
+        for i, top in search_list.rows(len(search_results)):
+            category, task = search_results[i]
+            center_y = top + search_list.step // 2
+            pygame.draw.circle(screen, CATEGORY_COLORS[category], (rect.x + 10 + radius, center_y), radius)
+            text = normal_font.render(deck.task(category, task)[0], True, TEXT_COLOR)
+            screen.blit(text, (rect.x + 20 + 2 * radius, center_y - text.get_height() // 2))
+        screen.set_clip(clip)
+        search_list.draw_scrollbar(screen)
+    close_search_btn.draw(screen)
 
-def draw_intermediate_results(game):
-    screen.fill(BACKGROUND_COLOR)
+def build_intermediate_layer(surface, round_counter, completed_tasks, total_tasks):
+    surface.fill(BACKGROUND_COLOR)
     
     # Заголовок
-    title = title_font.render(f"Промежуточные результаты: Раунд {game.round_counter}", True, (220, 20, 60))
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, SCREEN_HEIGHT * 0.06))
+    title = title_font.render(f"Промежуточные результаты: Раунд {round_counter}", True, (220, 20, 60))
+    surface.blit(title, (layout.width // 2 - title.get_width() // 2, layout.results_title_y))
     
     # Информация о прогрессе
-    progress = game.completed_tasks / game.total_tasks if game.total_tasks > 0 else 0
-    progress_text = header_font.render(f"Выполнено заданий: {game.completed_tasks}/{game.total_tasks} ({int(progress*100)}%)", True, TEXT_COLOR)
-    screen.blit(progress_text, (SCREEN_WIDTH // 2 - progress_text.get_width() // 2, SCREEN_HEIGHT * 0.15))
+    progress = completed_tasks / total_tasks if total_tasks > 0 else 0
+    progress_text = header_font.render(f"Выполнено заданий: {completed_tasks}/{total_tasks} ({int(progress*100)}%)", True, TEXT_COLOR)
+    surface.blit(progress_text, (layout.width // 2 - progress_text.get_width() // 2, layout.results_progress_y))
     
     # Таблица результатов
-    pygame.draw.rect(screen, PANEL_COLOR, (SCREEN_WIDTH * 0.08, SCREEN_HEIGHT * 0.22, SCREEN_WIDTH * 0.84, SCREEN_HEIGHT * 0.65), border_radius=20)
-    pygame.draw.rect(screen, TEXT_COLOR, (SCREEN_WIDTH * 0.08, SCREEN_HEIGHT * 0.22, SCREEN_WIDTH * 0.84, SCREEN_HEIGHT * 0.65), 2, border_radius=20)
+    pygame.draw.rect(surface, PANEL_COLOR, layout.results_panel, border_radius=20)
+    pygame.draw.rect(surface, TEXT_COLOR, layout.results_panel, 2, border_radius=20)
     
     # Заголовок таблицы
     results_title = header_font.render("Результаты игроков", True, TEXT_COLOR)
-    screen.blit(results_title, (SCREEN_WIDTH // 2 - results_title.get_width() // 2, SCREEN_HEIGHT * 0.25))
+    surface.blit(results_title, (layout.width // 2 - results_title.get_width() // 2, layout.results_header_y))
+
+def draw_intermediate_results(game):
+    key = ("INTERMEDIATE_RESULTS", game.round_counter, game.completed_tasks, game.total_tasks)
+    screen.blit(get_static_layer(key, build_intermediate_layer, *key[1:]), (0, 0))
     
-    # Список всех игроков
-    sorted_players = sorted(game.players, key=lambda p: p.score, reverse=True)
-    avatar_size = int(SCREEN_WIDTH * 0.07) if IS_MOBILE else 80
+    # Таблица игроков: только видимые строки
+    leaderboard = game.leaderboard
+    avatar_size = layout.avatar_size
+    half = results_list.step // 2
     
-    for i, player in enumerate(sorted_players):
-        y_pos = SCREEN_HEIGHT * 0.32 + i * SCREEN_HEIGHT * 0.10
+    clip = clip_to(screen, results_list.rect)
+    for i, row_y in results_list.rows(len(leaderboard)):
+        player = leaderboard[i]
+        y_pos = row_y + half
         
         # Аватар
-        scaled_avatar = pygame.transform.scale(player.avatar, (avatar_size, avatar_size))
-        screen.blit(scaled_avatar, (SCREEN_WIDTH * 0.12, y_pos - avatar_size//2))
+        screen.blit(get_avatar(player, avatar_size), (layout.results_avatar_x, y_pos - avatar_size//2))
         
         # Имя и очки
         name_text = normal_font.render(f"{i+1}. {player.name}", True, player.color)
-        screen.blit(name_text, (SCREEN_WIDTH * 0.21, y_pos - name_text.get_height()//2))
+        screen.blit(name_text, (layout.results_name_x, y_pos - name_text.get_height()//2))
         
         score_text = header_font.render(f"{player.score} очков", True, TEXT_COLOR)
-        screen.blit(score_text, (SCREEN_WIDTH * 0.75 - score_text.get_width()//2, y_pos - score_text.get_height()//2))
+        screen.blit(score_text, (layout.results_score_x - score_text.get_width()//2, y_pos - score_text.get_height()//2))
+    screen.set_clip(clip)
+    results_list.draw_scrollbar(screen)
     
     # Кнопка продолжения
-    continue_btn.rect = pygame.Rect(
-        SCREEN_WIDTH // 2 - SCREEN_WIDTH * 0.15,
-        SCREEN_HEIGHT * 0.85,
-        SCREEN_WIDTH * 0.30,
-        SCREEN_HEIGHT * 0.07
-    )
     continue_btn.draw(screen)
 
-def draw_game_over_screen(game):
-    screen.fill(BACKGROUND_COLOR)
+def build_game_over_layer(surface, round_counter):
+    surface.fill(BACKGROUND_COLOR)
     
     # Заголовок
     title = title_font.render("Игра завершена! Финальные результаты", True, (220, 20, 60))
-    screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, SCREEN_HEIGHT * 0.06))
+    surface.blit(title, (layout.width // 2 - title.get_width() // 2, layout.over_title_y))
     
     # Информация о количестве раундов
-    rounds_text = header_font.render(f"Всего раундов: {game.round_counter}", True, TEXT_COLOR)
-    screen.blit(rounds_text, (SCREEN_WIDTH // 2 - rounds_text.get_width() // 2, SCREEN_HEIGHT * 0.15))
-    
-    # Пьедестал для топ-3
-    podium_height = SCREEN_HEIGHT * 0.25
-    podium_width = SCREEN_WIDTH * 0.84
-    podium_x = SCREEN_WIDTH * 0.08
-    podium_y = SCREEN_HEIGHT * 0.25
+    rounds_text = header_font.render(f"Всего раундов: {round_counter}", True, TEXT_COLOR)
+    surface.blit(rounds_text, (layout.width // 2 - rounds_text.get_width() // 2, layout.over_rounds_y))
     
     # Основание пьедестала
-    pygame.draw.rect(screen, (180, 180, 180), (podium_x, podium_y + podium_height - SCREEN_HEIGHT * 0.025, podium_width, SCREEN_HEIGHT * 0.025))
-    
-    # Ступени пьедестала
-    step_width = podium_width // 3
-    step_height = podium_height // 3
+    pygame.draw.rect(surface, (180, 180, 180), layout.podium_base)
     
-    # Цвета для пьедестала
-    podium_color_1 = (255, 215, 0)  # Золотой
-    podium_color_2 = (192, 192, 192)  # Серебряный
-    podium_color_3 = (205, 127, 50)   # Бронзовый
-    
-    # 1 место (золото)
-    pygame.draw.rect(screen, podium_color_1, 
-                    (podium_x + step_width, podium_y, 
-                     step_width, podium_height - step_height))
-    
-    # 2 место (серебро)
-    pygame.draw.rect(screen, podium_color_2, 
-                    (podium_x, podium_y + step_height, 
-                     step_width, podium_height - step_height))
-    
-    # 3 место (бронза)
-    pygame.draw.rect(screen, podium_color_3, 
-                    (podium_x + 2 * step_width, podium_y + step_height, 
-                     step_width, podium_height - step_height))
+    # Ступени пьедестала: 1 место (золото), 2 место (серебро), 3 место (бронза)
+    for color, step in zip(PODIUM_COLORS, layout.podium_steps):
+        pygame.draw.rect(surface, color, step)
+
+def draw_game_over_screen(game):
+    screen.blit(get_static_layer(("GAME_OVER", game.round_counter), build_game_over_layer, game.round_counter), (0, 0))
     
-    # Список всех игроков
-    sorted_players = sorted(game.players, key=lambda p: p.score, reverse=True)
-    avatar_size = int(SCREEN_WIDTH * 0.10) if IS_MOBILE else 120
+    leaderboard = game.leaderboard
+    avatar_size = layout.podium_avatar_size
     
     # Отображение топ-3 на пьедестале
-    for i, player in enumerate(sorted_players[:3]):
-        if i == 0:  # 1 место
-            x_pos = podium_x + step_width + step_width // 2
-            y_pos = podium_y + podium_height * 0.15
-            place_color = podium_color_1
-        elif i == 1:  # 2 место
-            x_pos = podium_x + step_width // 2
-            y_pos = podium_y + podium_height * 0.35
-            place_color = podium_color_2
-        else:  # 3 место
-            x_pos = podium_x + 2 * step_width + step_width // 2
-            y_pos = podium_y + podium_height * 0.35
-            place_color = podium_color_3
-        
-        # Увеличиваем аватар для топ-3
-        scaled_avatar = pygame.transform.scale(player.avatar, (avatar_size, avatar_size))
-        avatar_rect = scaled_avatar.get_rect(center=(x_pos, y_pos - SCREEN_HEIGHT * 0.05))
-        screen.blit(scaled_avatar, avatar_rect)
+    for i in range(min(3, len(leaderboard))):
+        player = leaderboard[i]
+        x_pos, y_pos = layout.podium_places[i]
+        place_color = PODIUM_COLORS[i]
+        
+        # Увеличенный аватар для топ-3
+        avatar = get_avatar(player, avatar_size)
+        screen.blit(avatar, avatar.get_rect(center=(x_pos, y_pos + layout.podium_avatar_dy)))
         
         # Место
         place_text = header_font.render(f"{i+1} МЕСТО", True, place_color)
-        screen.blit(place_text, (x_pos - place_text.get_width() // 2, y_pos + SCREEN_HEIGHT * 0.03))
+        screen.blit(place_text, (x_pos - place_text.get_width() // 2, y_pos + layout.podium_place_dy))
         
         # Имя
         name_text = normal_font.render(player.name, True, player.color)
-        screen.blit(name_text, (x_pos - name_text.get_width() // 2, y_pos + SCREEN_HEIGHT * 0.06))
+        screen.blit(name_text, (x_pos - name_text.get_width() // 2, y_pos + layout.podium_name_dy))
         
         # Очки
         score_text = normal_font.render(f"{player.score} очков", True, TEXT_COLOR)
-        screen.blit(score_text, (x_pos - score_text.get_width() // 2, y_pos + SCREEN_HEIGHT * 0.09))
+        screen.blit(score_text, (x_pos - score_text.get_width() // 2, y_pos + layout.podium_score_dy))
     
     # Таблица для остальных игроков
-    if len(sorted_players) > 3:
-        other_rect = pygame.Rect(
-            SCREEN_WIDTH * 0.08,
-            podium_y + podium_height + SCREEN_HEIGHT * 0.05,
-            SCREEN_WIDTH * 0.84,
-            SCREEN_HEIGHT * 0.25
-        )
+    if len(leaderboard) > 3:
+        other_rect = layout.others_panel
         pygame.draw.rect(screen, PANEL_COLOR, other_rect, border_radius=20)
         pygame.draw.rect(screen, TEXT_COLOR, other_rect, 2, border_radius=20)
         
         other_title = header_font.render("Остальные участники", True, TEXT_COLOR)
-        screen.blit(other_title, (SCREEN_WIDTH // 2 - other_title.get_width() // 2, other_rect.y + SCREEN_HEIGHT * 0.02))
+        screen.blit(other_title, (layout.width // 2 - other_title.get_width() // 2, layout.others_title_y))
         
-        # Отображение остальных игроков
-        small_avatar_size = int(SCREEN_WIDTH * 0.05) if IS_MOBILE else 40
+        # Отображение остальных игроков (видимая часть)
+        small_avatar_size = layout.compact_avatar_size
+        half = others_list.step // 2
         
-        for i, player in enumerate(sorted_players[3:]):
-            idx = i + 4
-            y_pos = other_rect.y + SCREEN_HEIGHT * 0.08 + i * SCREEN_HEIGHT * 0.05
+        clip = clip_to(screen, others_list.rect)
+        for i, row_y in others_list.rows(len(leaderboard) - 3):
+            player = leaderboard[i + 3]
+            y_pos = row_y + half
             
             # Аватар
-            scaled_avatar = pygame.transform.scale(player.avatar, (small_avatar_size, small_avatar_size))
-            screen.blit(scaled_avatar, (SCREEN_WIDTH * 0.12, y_pos - small_avatar_size//2))
+            screen.blit(get_avatar(player, small_avatar_size), (layout.others_avatar_x, y_pos - small_avatar_size//2))
             
             # Имя и очки
-            player_text = normal_font.render(f"{idx}. {player.name}: {player.score} очков", True, player.color)
-            screen.blit(player_text, (SCREEN_WIDTH * 0.17, y_pos - player_text.get_height()//2))
+            player_text = normal_font.render(f"{i + 4}. {player.name}: {player.score} очков", True, player.color)
+            screen.blit(player_text, (layout.others_text_x, y_pos - player_text.get_height()//2))
+        screen.set_clip(clip)
+        others_list.draw_scrollbar(screen)
+    
+    # Сводка по всем сыгранным партиям, когда база ее вернет
+    if stats_game is game and stats_ready:
+        draw_stats_summary(game)
     
     # Кнопка новой игры
-    new_game_btn.rect = pygame.Rect(
-        SCREEN_WIDTH // 2 - SCREEN_WIDTH * 0.15,
-        SCREEN_HEIGHT * 0.85,
-        SCREEN_WIDTH * 0.30,
-        SCREEN_HEIGHT * 0.07
-    )
     new_game_btn.draw(screen)
 
-# Создание объектов игры и UI
-game = Game()
+def draw_stats_summary(game):
+    if stats_summary.exception() is not None:
+        return
+    categories, hardest = stats_summary.result()
+    lines = []
+    if categories:
+        lines.append("Очков за ход: " + ", ".join(f"{game.categories[category]} {points:.1f}"
+                                                   for category, _, points, _, _ in categories))
+    if hardest:
+        category, task, plays, rate = hardest
+        if len(task) > 60:
+            task = task[:59] + "…"
+        lines.append(f"Труднее всего: «{task}» - приняли {round(rate * plays)} из {plays}")
+    for i, line in enumerate(lines):
+        text = small_font.render(line, True, TEXT_COLOR)
+        screen.blit(text, (layout.width // 2 - text.get_width() // 2,
+                           layout.stats_rect.y + i * small_font.get_linesize()))
+
+def draw_frame(game):
+    if game.state == "SETUP":
+        with profiler.span("draw_setup_screen"):
+            draw_setup_screen(game)
+    elif game.state == "PLAYING":
+        with profiler.span("draw_game_screen"):
+            draw_game_screen(game)
+        with profiler.span("draw_task_window"):
+            draw_task_window(game)
+        if search_open:
+            with profiler.span("draw_search_window"):
+                draw_search_window(game)
+    elif game.state == "INTERMEDIATE_RESULTS":
+        with profiler.span("draw_intermediate_results"):
+            draw_intermediate_results(game)
+    elif game.state == "GAME_OVER":
+        with profiler.span("draw_game_over_screen"):
+            draw_game_over_screen(game)
+    if particles.active:
+        with profiler.span("draw_particles"):
+            particles.draw(screen, particle_size())
+
+# Конфетти и искры поверх экрана
+particles = ParticleSystem(CATEGORY_COLORS + PODIUM_COLORS)
+# Последнее увиденное состояние: (партия, экран, сумма очков)
+celebrated = None
+particles_time = time.perf_counter()
+# Были ли частицы на экране в прошлом кадре (режим "dirty")
+particles_drawn = False
+
+def particle_size():
+    return max(4, min(layout.width, layout.height) // 90)
+
+def celebrate(game):
+    """Искры после выполненного задания и конфетти в конце игры"""
+    global celebrated
+    current = (id(game), game.state, sum(player.score for player in game.players))
+    previous, celebrated = celebrated, current
+    # Новая или восстановленная партия - праздновать нечего
+    if previous is None or previous[0] != current[0]:
+        return
+    width, height = screen.get_size()
+    if current[1] == "GAME_OVER" and previous[1] != "GAME_OVER":
+        particles.confetti(width, power=height * 0.5)
+    elif current[2] > previous[2]:
+        particles.burst(width // 2, height // 2, power=min(width, height) * 0.8)
+
+# Статистика партий (stats.Stats), партия, итоги которой уже записаны,
+# сводка для экрана конца игры (Future) и готова ли она к этому кадру
+session_stats = None
+stats_game = None
+stats_summary = None
+stats_ready = False
+
+def collect_stats(game):
+    """В конце партии записывает итоги и заказывает сводку для экрана"""
+    global stats_game, stats_summary, stats_ready
+    if session_stats is None or game.state != "GAME_OVER":
+        return
+    if stats_game is game:
+        # Готовность фиксируется раз в кадр, чтобы кадр не зависел от потока базы
+        stats_ready = stats_summary.done()
+        return
+    stats_game = game
+    stats_ready = False
+    session_stats.finish(game)
+    stats_summary = session_stats.query(stats.game_over_summary)
+    # Готовая сводка будит главный цикл
+    stats_summary.add_done_callback(lambda _: loader.notify("stats"))
+
+def animate_particles():
+    """Шаг частиц; пока они есть, цикл идет с полной частотой кадров"""
+    global particles_time
+    now = time.perf_counter()
+    if particles.active:
+        particles.update(now - particles_time)
+        scheduler.request_frames(1)
+    particles_time = now
+
+def track_changes(game):
+    """Сравнивает состояние игры с прошлым кадром и отмечает изменившиеся области"""
+    # Смена экрана, окна задания или списка игроков - полная перерисовка
+    dirty.watch("screen", (id(game), game.state, game.task_in_progress, show_answer,
+                           game.selected_category, game.selected_difficulty,
+                           len(game.players), screen.get_size(), search_open, search_choice))
+    
+    if game.state == "GAME_OVER":
+        dirty.watch("stats", stats_game is game and stats_ready, layout.stats_rect)
+    
+    if game.state == "PLAYING":
+        dirty.watch("round", game.round_counter, layout.round_rect)
+        dirty.watch("progress", (game.completed_tasks, game.total_tasks), layout.progress_rect)
+        dirty.watch("player", game.current_player_idx, layout.current_player_rect)
+        dirty.watch("search", (search_query, search_ready(game)), layout.task_window)
+        board = get_board_layout(game)
+        for i in range(len(game.tasks)):
+            # Замена задания на поле может поменять надпись кружка
+            dirty.watch(("tasks", i), (game.tasks.completed[i], game.tasks.difficulty[i].tobytes()),
+                        board.panel_rect(i))
+    
+    # Частицы разлетаются по большей части экрана, а контуры кнопок и кружков
+    # на краю области обрезки рисуются чуть иначе, поэтому кадры с частицами
+    # и кадр, стирающий последние из них, перерисовываются целиком
+    global particles_drawn
+    if particles.active or particles_drawn:
+        dirty.invalidate()
+    particles_drawn = particles.active
+
+class FrameScheduler:
+    """Планировщик кадров с режимом простоя.
+
+    Пока что-то анимируется, цикл идет с частотой busy_fps. В простое
+    цикл спит в pygame.event.wait и просыпается от событий или не чаще
+    idle_fps раз в секунду (0 - только от событий).
+    """
+    def __init__(self, busy_fps=60, idle_fps=2):
+        self.busy_fps = busy_fps
+        self.idle_fps = idle_fps
+        self.clock = pygame.time.Clock()
+        self.busy_frames = 0
+        self.wakeups = 0
+        self.wakeups_per_second = 0.0
+        self.window_start = pygame.time.get_ticks()
 
+    def request_frames(self, count=1):
+        """Просит еще count кадров на полной частоте (для анимаций)"""
+        self.busy_frames = max(self.busy_frames, count)
+
+    @property
+    def is_busy(self):
+        return self.busy_frames > 0
+
+    def get_events(self):
+        """Ждет следующего кадра и возвращает накопившиеся события"""
+        if self.busy_frames > 0:
+            self.busy_frames -= 1
+            self.clock.tick(self.busy_fps)
+            events = pygame.event.get()
+        else:
+            timeout = 1000 // self.idle_fps if self.idle_fps > 0 else 0
+            event = pygame.event.wait(timeout)
+            events = pygame.event.get()
+            if event.type != NOEVENT:
+                events.insert(0, event)
+            # Поток событий (например, движение мыши) не должен
+            # разгонять цикл выше полной частоты
+            self.clock.tick(self.busy_fps)
+        
+        self.wakeups += 1
+        now = pygame.time.get_ticks()
+        if now - self.window_start >= 1000:
+            self.wakeups_per_second = self.wakeups * 1000 / (now - self.window_start)
+            self.wakeups = 0
+            self.window_start = now
+        return events
+
+scheduler = FrameScheduler(BUSY_FPS, IDLE_FPS)
+show_debug = False
+profiler = Profiler(enabled=PROFILE)
+show_hud = PROFILE
+
+def debug_text():
+    cache = text_cache.stats()
+    mode = "анимация" if scheduler.is_busy else "простой"
+    return (f"пробуждений/с: {scheduler.wakeups_per_second:.1f}  режим: {mode}  "
+            f"лимит: {scheduler.busy_fps}/{scheduler.idle_fps} FPS  кэш текста: {cache['hit_rate']:.0%}  "
+            f"первый кадр: {startup_times.get('first_frame', 0):.0f} мс")
+
+def draw_debug_overlay():
+    rect = layout.debug_rect
+    pygame.draw.rect(screen, (0, 0, 0), rect)
+    text = small_font.render(debug_text(), True, (255, 255, 255))
+    screen.blit(text, (rect.x + 4, rect.y + 4))
+
+def draw_hud():
+    """Сводка профайлера: частота кадров, время кадра и самые дорогие этапы"""
+    rect = layout.hud_rect
+    pygame.draw.rect(screen, (0, 0, 0), rect)
+    for i, line in enumerate(profiler.hud_lines()):
+        text = small_font.render(line, True, (255, 255, 255))
+        screen.blit(text, (rect.x + 4, rect.y + 4 + i * small_font.get_linesize()))
+
+def draw_overlays():
+    if show_debug:
+        draw_debug_overlay()
+    if show_hud:
+        draw_hud()
+
+def toggle_profiler():
+    """F4: включает замеры вместе со сводкой на экране или выключает их"""
+    global show_hud
+    show_hud = not show_hud
+    profiler.set_enabled(show_hud)
+
+def save_trace():
+    if profiler.events:
+        count = profiler.export(TRACE_PATH)
+        print(f"Трасса сохранена в {TRACE_PATH} ({count} событий)")
+
+def present_frame(game):
+    """Рисует кадр и выводит его на экран в выбранном режиме"""
+    if not dirty.enabled:
+        draw_frame(game)
+        draw_overlays()
+        with profiler.span("present"):
+            pygame.display.flip()
+        return
+    
+    track_changes(game)
+    dirty.watch("debug", debug_text() if show_debug else None, layout.debug_rect)
+    dirty.watch("hud", tuple(profiler.hud_lines()) if show_hud else None, layout.hud_rect)
+    rects = dirty.take()
+    if rects is None:
+        draw_frame(game)
+        draw_overlays()
+        with profiler.span("present"):
+            pygame.display.flip()
+    elif rects:
+        # Кадр рисуется один раз с отсечением по общей рамке изменившихся
+        # областей: вне них картинка не менялась, и на экран выводятся только они
+        screen.set_clip(rects[0].unionall(rects[1:]))
+        draw_frame(game)
+        draw_overlays()
+        screen.set_clip(None)
+        with profiler.span("present"):
+            pygame.display.update(rects)
+
+# Создание объектов игры и UI (колода загружается только к началу партии).
+# Генератор партии пересоздается с seed в main()
+rng = random.Random()
+game = Game(rng=rng)
+# Показан ли ответ на открытую загадку
+show_answer = False
+
+# Кнопки и поля ввода расставляются по раскладке в place_widgets()
 # Кнопки для экрана настройки
-start_btn = Button(
-    SCREEN_WIDTH // 2 - SCREEN_WIDTH * 0.10,
-    SCREEN_HEIGHT * 0.75,
-    SCREEN_WIDTH * 0.20,
-    SCREEN_HEIGHT * 0.07,
-    "Начать игру"
-)
-
-add_player_btn = Button(
-    SCREEN_WIDTH // 2 - SCREEN_WIDTH * 0.10,
-    SCREEN_HEIGHT * 0.65,
-    SCREEN_WIDTH * 0.20,
-    SCREEN_HEIGHT * 0.07,
-    "Добавить игрока"
-)
+start_btn = Button(0, 0, 0, 0, "Начать игру")
+add_player_btn = Button(0, 0, 0, 0, "Добавить игрока")
 
 # Поля ввода
-tasks_input = InputBox(
-    SCREEN_WIDTH * 0.50,
-    SCREEN_HEIGHT * 0.31,
-    SCREEN_WIDTH * 0.17,
-    SCREEN_HEIGHT * 0.05
-)
-
-player_input = InputBox(
-    SCREEN_WIDTH * 0.50,
-    SCREEN_HEIGHT * 0.40,
-    SCREEN_WIDTH * 0.17,
-    SCREEN_HEIGHT * 0.05
-)
-
-# Кнопки для окна задания
+tasks_input = InputBox(0, 0, 0, 0)
+player_input = InputBox(0, 0, 0, 0)
+
+# Кнопки для окна задания (расставляются при отрисовке окна)
 show_answer_btn = Button(0, 0, 0, 0, "Показать ответ")
 accept_btn = Button(0, 0, 0, 0, "Принять", (144, 238, 144))
 reject_btn = Button(0, 0, 0, 0, "Отклонить", (255, 99, 71))
@@ -739,128 +1584,444 @@ reject_btn = Button(0, 0, 0, 0, "Отклонить", (255, 99, 71))
 continue_btn = Button(0, 0, 0, 0, "Продолжить игру")
 new_game_btn = Button(0, 0, 0, 0, "Новая игра")
 
-# Главный цикл игры
-clock = pygame.time.Clock()
-running = True
-
-while running:
-    mouse_pos = pygame.mouse.get_pos()
-    
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            running = False
-        
-        # Обработка касаний на мобильных
-        if IS_MOBILE and event.type == FINGERDOWN:
-            # Преобразование координат касания
-            touch_x = event.x * SCREEN_WIDTH
-            touch_y = event.y * SCREEN_HEIGHT
-            mouse_pos = (touch_x, touch_y)
-            # Эмулируем событие клика мыши
-            mouse_event = pygame.event.Event(MOUSEBUTTONDOWN, {
-                'pos': mouse_pos,
-                'button': 1
-            })
-            pygame.event.post(mouse_event)
-        
-        if game.state == "SETUP":
-            # Обработка ввода
-            tasks_input.handle_event(event)
-            player_input.handle_event(event)
-            
-            # Обработка кнопок
-            if add_player_btn.is_clicked(mouse_pos, event):
-                if game.add_player(player_input.text):
-                    player_input.text = ""
-            
-            if start_btn.is_clicked(mouse_pos, event):
-                game.tasks_count_input = tasks_input.text
-                if game.start_game():
-                    pass
-        
-        elif game.state == "PLAYING":
-            if not game.task_window_open:
-                # Обработка выбора задания
-                if event.type == MOUSEBUTTONDOWN and event.button == 1:
-                    # Проверяем, было ли нажатие на задание
-                    category_width = (SCREEN_WIDTH - SCREEN_WIDTH * 0.08) // 4 - 10
-                    tasks_per_row = 5
+# Поиск задания для замены на поле
+search_btn = Button(0, 0, 0, 0, "Поиск")
+close_search_btn = Button(0, 0, 0, 0, "Закрыть")
+search_input = InputBox(0, 0, 0, 0)
+
+# Прокручиваемые списки игроков и найденных заданий
+setup_list = ScrollList()
+results_list = ScrollList()
+others_list = ScrollList()
+search_list = ScrollList()
+
+def place_widgets():
+    """Расставляет кнопки и поля ввода по текущей раскладке"""
+    start_btn.rect = layout.start_btn
+    add_player_btn.rect = layout.add_player_btn
+    tasks_input.rect = layout.tasks_input
+    player_input.rect = layout.player_input
+    continue_btn.rect = layout.bottom_btn
+    new_game_btn.rect = layout.bottom_btn
+    setup_list.place(layout.players_list_rect, layout.players_list_step)
+    results_list.place(layout.results_list_rect, layout.results_row_step)
+    others_list.place(layout.others_list_rect, layout.others_row_step)
+    search_btn.rect = layout.search_btn
+    close_search_btn.rect = layout.search_close_btn
+    search_input.rect = layout.search_input
+    search_list.place(layout.search_list_rect, layout.search_list_step)
+
+def resize_screen():
+    """Подстраивается под новый размер окна или поворот телефона"""
+    global screen
+    size = pygame.display.get_window_size()
+    screen = pygame.display.get_surface()
+    if screen.get_size() != size:
+        screen = pygame.display.set_mode(size, pygame.FULLSCREEN if IS_MOBILE else pygame.RESIZABLE)
+    # Пока идет заставка, раскладки еще нет
+    if layout is not None and size != (SCREEN_WIDTH, SCREEN_HEIGHT):
+        set_resolution(*size)
+        place_widgets()
+        dirty.invalidate()
+
+def init_display():
+    """Инициализирует только нужные модули pygame и открывает окно"""
+    global SCREEN_WIDTH, SCREEN_HEIGHT, IS_MOBILE, RENDER_MODE, screen
+    # Звук и джойстики игре не нужны, поэтому pygame.init() не вызываем
+    pygame.display.init()
+    pygame.font.init()
+    
+    if pygame.display.get_driver() == 'android':
+        # Режим для телефона
+        info = pygame.display.Info()
+        SCREEN_WIDTH = info.current_w
+        SCREEN_HEIGHT = info.current_h
+        IS_MOBILE = True
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+    else:
+        # Режим для компьютера
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Подарочек")
+    
+    RENDER_MODE = RENDER_MODE or ("dirty" if IS_MOBILE else "full")
+    dirty.enabled = RENDER_MODE == "dirty"
+
+def init_layout():
+    """Раскладка и виджеты под текущий размер окна (нужны шрифты)"""
+    set_resolution(*screen.get_size())
+    place_widgets()
+    dirty.invalidate()
+
+# Событие от фонового загрузчика: очередной ресурс готов
+ASSET_READY = USEREVENT + 1
+
+class AssetLoader:
+    """Готовит ресурсы в фоновых потоках, пока главный поток рисует заставку.
+
+    В потоках только чтение файлов, сборка колоды и рисование атласа
+    кружков в обычную поверхность; шрифты экрана создаются и текст рисуется
+    только в главном потоке (надписи атласа тоже), а атлас переводится там
+    в формат экрана.
+    О готовности каждого ресурса главный цикл узнает по событию ASSET_READY.
+    """
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.pool = None
+        self.jobs = {}
+
+    def submit(self, name, func, *args):
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="assets")
+        job = self.pool.submit(func, *args)
+        job.add_done_callback(lambda _: self.notify(name))
+        self.jobs[name] = job
+
+    def notify(self, name):
+        try:
+            pygame.event.post(pygame.event.Event(ASSET_READY, name=name))
+        except pygame.error:
+            # Окно уже закрыто
+            pass
+
+    def ready(self, name):
+        job = self.jobs.get(name)
+        return job is not None and job.done()
+
+    def result(self, name, default=None):
+        """Результат загрузки; при ошибке - default"""
+        try:
+            return self.jobs[name].result()
+        except Exception as e:
+            print(f"Ошибка загрузки ({name}): {e}")
+            return default
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+loader = AssetLoader()
+
+def draw_splash():
+    """Заставка: четыре пульсирующих кружка цветов категорий"""
+    screen.fill(BACKGROUND_COLOR)
+    width, height = screen.get_size()
+    phase = pygame.time.get_ticks() / 300
+    base = min(width, height) // 20
+    for i, color in enumerate(CATEGORY_COLORS):
+        radius = int(base * (1 + 0.3 * math.sin(phase - i * 0.8)))
+        x = width // 2 + (i - 1.5) * base * 3
+        pygame.draw.circle(screen, color, (int(x), height // 2), radius)
+
+def show_splash(names):
+    """Показывает заставку, пока не загрузится все из names.
+
+    Окно при этом отвечает на закрытие и изменение размера.
+    Возвращает False, если окно закрыли.
+    """
+    clock = pygame.time.Clock()
+    while not all(loader.ready(name) for name in names):
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                return False
+            if event.type in (VIDEORESIZE, WINDOWSIZECHANGED):
+                resize_screen()
+        draw_splash()
+        pygame.display.flip()
+        startup_times.setdefault("splash", (time.perf_counter() - STARTUP_TIME) * 1000)
+        clock.tick(BUSY_FPS)
+    return True
+
+# Событие от потока сети: пришли изменения с сервера
+REMOTE_UPDATE = USEREVENT + 2
+
+def notify_remote():
+    try:
+        pygame.event.post(pygame.event.Event(REMOTE_UPDATE))
+    except pygame.error:
+        pass
+
+def connect_server():
+    """Партия комнаты на сервере; None, если сервер недоступен"""
+    try:
+        remote = client.connect(SERVER_ADDRESS, SERVER_ROOM, PLAYER_NAME or None, notify_remote)
+    except (OSError, ValueError) as e:
+        print(f"Сервер {SERVER_ADDRESS} недоступен ({e}), игра на этом устройстве")
+        return None
+    print(f"Подключено к {SERVER_ADDRESS}, комната {SERVER_ROOM}")
+    return remote
+
+def restore_session():
+    """Партия из журнала прошлого запуска или новая, если восстанавливать нечего"""
+    snapshot, entries = loader.result("session", (None, []))
+    if snapshot is None and not entries:
+        return Game(rng=rng)
+    # Начатой партии нужна колода
+    if journal.needs_deck(snapshot, entries) and not show_splash(["deck"]):
+        return None
+    try:
+        restored = journal.restore(snapshot, entries, rng=rng)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        print(f"Партия не восстановлена: {e}")
+        return Game(rng=rng)
+    print(f"Партия восстановлена: игроков {len(restored.players)}, раунд {restored.round_counter + 1}")
+    return restored
+
+# Время запуска: до открытия окна, заставки и экрана настройки (мс)
+startup_times = {}
+
+def main(replay=None):
+    """Главный цикл игры.
+
+    replay - запись ввода (recording.Replay): кадры берутся из нее без
+    ограничения частоты, а по окончании возвращается итоговая партия.
+    """
+    global game, show_answer, show_debug, rng, screen, IS_MOBILE, session_stats
+    running = True
+    
+    startup_times["import"] = (time.perf_counter() - STARTUP_TIME) * 1000
+    init_display()
+    if replay is not None:
+        # Экран того же размера, что при записи
+        IS_MOBILE = replay.header["mobile"]
+        screen = pygame.display.set_mode(replay.header["size"])
+    startup_times["window"] = (time.perf_counter() - STARTUP_TIME) * 1000
+    
+    if replay is not None:
+        seed = replay.header["seed"]
+    else:
+        seed = int(SEED) if SEED else random.randrange(2**32)
+    rng = random.Random(seed)
+    # Разброс конфетти тоже из seed партии, чтобы запись воспроизводилась и на экране
+    particles.reseed(rng.getrandbits(64))
+    game = Game(rng=rng)
+    
+    # Шрифты, колода и журнал читаются в фоне; экран настройки ждет шрифты и журнал
+    loader.submit("fonts", read_font_files)
+    loader.submit("deck", decks.get)
+    session = None
+    if JOURNAL_PATH:
+        loader.submit("session", journal.load, JOURNAL_PATH)
+    if not show_splash(["fonts", "session"] if JOURNAL_PATH else ["fonts"]):
+        loader.shutdown()
+        pygame.quit()
+        sys.exit()
+    font_data.update(loader.result("fonts", {}))
+    remote = connect_server() if SERVER_ADDRESS else None
+    if replay is not None:
+        # Колода нужна сразу: ее готовность приходит из записи событием
+        if not show_splash(["deck"]):
+            return game
+        if replay.header["snapshot"]:
+            game = Game.from_snapshot(replay.header["snapshot"], rng=rng)
+    elif remote is not None:
+        # Партию хранит сервер, локальный журнал не нужен
+        game = remote
+    elif JOURNAL_PATH:
+        game = restore_session()
+        if game is None:
+            loader.shutdown()
+            pygame.quit()
+            sys.exit()
+        session = journal.Journal(JOURNAL_PATH)
+        session.attach(game)
+    # Статистика - только партий, сыгранных на этом устройстве
+    if STATS_PATH and remote is None and replay is None:
+        session_stats = stats.Stats(STATS_PATH)
+        session_stats.attach(game)
+    init_layout()
+    
+    # Первый кадр экрана настройки рисуем сразу, не дожидаясь событий
+    present_frame(game)
+    startup_times["first_frame"] = (time.perf_counter() - STARTUP_TIME) * 1000
+    print(f"Первый кадр через {startup_times['first_frame']:.0f} мс "
+          f"(импорт {startup_times['import']:.0f} мс, окно {startup_times['window']:.0f} мс, "
+          f"заставка {startup_times.get('splash', 0):.0f} мс)")
+    
+    # Правки файлов заданий подхватываются без перезапуска, к следующей партии
+    decks.start_watching()
+    # Число заданий, если "Начать игру" нажали раньше, чем загрузилась колода
+    pending_start = None
+    deck_ready = replay.header["deck_ready"] if replay is not None else loader.ready("deck")
+    
+    # Запись ввода возможна только для партии на этом устройстве
+    recorder = None
+    if RECORD_PATH and remote is None and replay is None:
+        recorder = recording.Recorder(RECORD_PATH, seed, screen.get_size(), IS_MOBILE,
+                                      game.snapshot(), deck_ready, [ASSET_READY])
+        print(f"Запись ввода в {RECORD_PATH} (seed {seed})")
+    frames = replay if replay is not None else scheduler
+    
+    while running:
+        events = frames.get_events()
+        # Ожидание событий в простое в замер кадра не входит
+        profiler.begin_frame()
+        mouse_pos = pygame.mouse.get_pos() if replay is None else replay.mouse_pos
+        if recorder is not None:
+            recorder.frame(mouse_pos, events)
+        
+        # Изменения с сервера; событие REMOTE_UPDATE только будит цикл
+        if remote is not None:
+            remote.poll()
+        
+        with profiler.span("events"):
+            for event in events:
+                if event.type == QUIT:
+                    running = False
+                
+                # Готовность колоды - тоже событие, чтобы запись воспроизводилась точно
+                if event.type == ASSET_READY and event.name == "deck":
+                    deck_ready = True
+                if event.type == ASSET_READY and event.name == "search":
+                    adopt_search_index()
+                
+                # Изменение размера окна или поворот экрана
+                if event.type in (VIDEORESIZE, WINDOWSIZECHANGED):
+                    resize_screen()
+                
+                # F3 - отладочная строка с частотой кадров и пробуждениями
+                if event.type == KEYDOWN and event.key == K_F3:
+                    show_debug = not show_debug
+                
+                # F4 - замеры этапов кадра со сводкой на экране, F5 - сохранить трассу
+                if event.type == KEYDOWN and event.key == K_F4:
+                    toggle_profiler()
+                if event.type == KEYDOWN and event.key == K_F5:
+                    save_trace()
+                
+                # Обработка касаний на мобильных
+                if IS_MOBILE and event.type == FINGERDOWN:
+                    # Преобразование координат касания
+                    touch_x = event.x * SCREEN_WIDTH
+                    touch_y = event.y * SCREEN_HEIGHT
+                    mouse_pos = (touch_x, touch_y)
+                    # Эмулируем событие клика мыши
+                    mouse_event = pygame.event.Event(MOUSEBUTTONDOWN, {
+                        'pos': mouse_pos,
+                        'button': 1
+                    })
+                    pygame.event.post(mouse_event)
+                
+                if game.state == "SETUP":
+                    # Обработка ввода
+                    tasks_input.handle_event(event)
+                    player_input.handle_event(event)
+                    setup_list.handle_event(event, mouse_pos)
                     
-                    for i in range(4):
-                        cat_x = SCREEN_WIDTH * 0.04 + i * (category_width + 10)
+                    # Обработка кнопок
+                    if add_player_btn.is_clicked(mouse_pos, event):
+                        if game.add_player(player_input.text):
+                            player_input.text = ""
+                            setup_list.scroll_to(len(game.players) - 1)
+                    
+                    if start_btn.is_clicked(mouse_pos, event):
+                        if tasks_input.text.isdigit():
+                            pending_start = int(tasks_input.text)
+                
+                elif game.state == "PLAYING":
+                    if search_open:
+                        handle_search_event(event, mouse_pos)
+                    
+                    elif not game.task_in_progress:
+                        # Поиск задания для замены: кнопка "Поиск" или F6
+                        if can_search(game) and (search_btn.is_clicked(mouse_pos, event)
+                                                 or event.type == KEYDOWN and event.key == K_F6):
+                            open_search()
                         
-                        # Рассчитаем общую ширину всех кружков в ряду
-                        task_size = SCREEN_WIDTH * 0.025 if IS_MOBILE else 30
-                        spacing = SCREEN_WIDTH * 0.01
-                        total_width = tasks_per_row * task_size + (tasks_per_row - 1) * spacing
-                        start_x = cat_x + (category_width - total_width) // 2
+                        # Обработка выбора задания
+                        elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+                            # Проверяем, было ли нажатие на задание
+                            hit = get_board_layout(game).hit_test(mouse_pos)
+                            if search_choice is not None:
+                                place_search_choice(game, hit)
+                            elif hit is not None:
+                                category, row, col = hit
+                                if game.select_task(category, row * BoardLayout.TASKS_PER_ROW + col):
+                                    show_answer = False
                         
-                        # Определяем количество строк
-                        rows = min(10, (game.tasks_per_category + tasks_per_row - 1) // tasks_per_row)
+                        elif event.type == KEYDOWN and event.key == K_ESCAPE and search_choice is not None:
+                            place_search_choice(game, None)
+                    
+                    else:  # Если открыто окно задания
+                        # Обработка кнопок
+                        if show_answer_btn.is_clicked(mouse_pos, event):
+                            show_answer = True
                         
-                        for j in range(min(game.tasks_per_category, 50)):
-                            row = j // tasks_per_row
-                            col = j % tasks_per_row
-                            
-                            # Пропускаем если больше 10 строк (для мобильных)
-                            if row >= rows:
-                                continue
-                                
-                            task_x = start_x + col * (task_size + spacing)
-                            task_y = SCREEN_HEIGHT * 0.19 + SCREEN_HEIGHT * 0.10 + row * (task_size + spacing)
-                            
-                            # Проверка расстояния до центра кружка
-                            dx = mouse_pos[0] - task_x
-                            dy = mouse_pos[1] - task_y
-                            distance = math.sqrt(dx*dx + dy*dy)
-                            
-                            if distance <= task_size // 2:
-                                game.select_task(i, j)
-                                break
-            
-            else:  # Если открыто окно задания
-                # Обработка кнопок
-                if show_answer_btn.is_clicked(mouse_pos, event):
-                    game.show_answer = True
+                        if accept_btn.is_clicked(mouse_pos, event):
+                            game.complete_task(True)
+                        
+                        if reject_btn.is_clicked(mouse_pos, event):
+                            game.complete_task(False)
                 
-                if accept_btn.is_clicked(mouse_pos, event):
-                    game.complete_task(True)
+                elif game.state == "INTERMEDIATE_RESULTS":
+                    results_list.handle_event(event, mouse_pos)
+                    if continue_btn.is_clicked(mouse_pos, event):
+                        game.continue_game()
                 
-                if reject_btn.is_clicked(mouse_pos, event):
-                    game.complete_task(False)
-        
-        elif game.state == "INTERMEDIATE_RESULTS":
-            if continue_btn.is_clicked(mouse_pos, event):
-                game.state = "PLAYING"
-        
-        elif game.state == "GAME_OVER":
-            if new_game_btn.is_clicked(mouse_pos, event):
-                # Перезапуск игры
-                game = Game()
-                tasks_input.text = str(game.tasks_per_category)
-    
-    # Обновление состояния кнопок
-    start_btn.check_hover(mouse_pos)
-    add_player_btn.check_hover(mouse_pos)
-    show_answer_btn.check_hover(mouse_pos)
-    accept_btn.check_hover(mouse_pos)
-    reject_btn.check_hover(mouse_pos)
-    continue_btn.check_hover(mouse_pos)
-    new_game_btn.check_hover(mouse_pos)
-    
-    # Отрисовка
-    if game.state == "SETUP":
-        draw_setup_screen(game)
-    elif game.state == "PLAYING":
-        draw_game_screen(game)
-        draw_task_window(game)
-    elif game.state == "INTERMEDIATE_RESULTS":
-        draw_intermediate_results(game)
-    elif game.state == "GAME_OVER":
-        draw_game_over_screen(game)
+                elif game.state == "GAME_OVER":
+                    others_list.handle_event(event, mouse_pos)
+                    if new_game_btn.is_clicked(mouse_pos, event):
+                        # Перезапуск игры (на сервере - с теми же игроками)
+                        if remote is not None:
+                            remote.new_game()
+                        else:
+                            game = Game(rng=rng)
+                            if session is not None:
+                                session.attach(game)
+                            if session_stats is not None:
+                                session_stats.attach(game)
+                        tasks_input.text = str(game.tasks_per_category)
+            
+        # Партия начинается, когда колода загружена; до этого кнопка показывает загрузку
+        if pending_start is not None:
+            if deck_ready:
+                game.start_game(pending_start)
+                pending_start = None
+            label = "Начать игру" if pending_start is None else "Загрузка заданий..."
+            if start_btn.text != label:
+                start_btn.text = label
+                dirty.add(start_btn.rect)
+                scheduler.request_frames(HOVER_FRAMES)
+        
+        # Ход обработан целиком - журнал можно сжать
+        if session is not None:
+            session.checkpoint()
+        
+        with profiler.span("particles"):
+            celebrate(game)
+            animate_particles()
+        collect_stats(game)
+        update_search(game)
+        
+        # Обновление состояния кнопок
+        with profiler.span("hover"):
+            start_btn.check_hover(mouse_pos)
+            add_player_btn.check_hover(mouse_pos)
+            show_answer_btn.check_hover(mouse_pos)
+            accept_btn.check_hover(mouse_pos)
+            reject_btn.check_hover(mouse_pos)
+            continue_btn.check_hover(mouse_pos)
+            new_game_btn.check_hover(mouse_pos)
+            search_btn.check_hover(mouse_pos)
+            close_search_btn.check_hover(mouse_pos)
+        
+        # Отрисовка
+        present_frame(game)
+        profiler.end_frame()
     
-    pygame.display.flip()
-    clock.tick(60)
+    save_trace()
+    if recorder is not None:
+        recorder.close(game.snapshot())
+    if session is not None:
+        session.close()
+    if session_stats is not None:
+        session_stats.close()
+    if remote is not None:
+        remote.close()
+    loader.shutdown()
+    pygame.quit()
+    if replay is not None:
+        return game
+    sys.exit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
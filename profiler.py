@@ -0,0 +1,110 @@
+"""Замеры времени этапов кадра.
+
+Этапы главного цикла оборачиваются в profiler.span("имя"). Пока профайлер
+выключен, span() возвращает общий пустой контекст, поэтому замеры можно
+оставлять в рабочей сборке. Включенный профайлер копит длительности этапов
+для экранной сводки и события для Chrome trace / Perfetto
+(chrome://tracing, ui.perfetto.dev).
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Длительности этапов кадра и события для трассировки"""
+    def __init__(self, enabled=False, max_events=200000, window=0.5):
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)
+        self.frames = deque(maxlen=240)
+        self.window = window
+        self.pid = os.getpid()
+        self.frame_start = None
+        # Суммы по этапам за текущее окно усреднения
+        self.stage_totals = {}
+        self.window_frames = 0
+        self.window_start = time.perf_counter()
+        self.summary = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_start = None
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name, start, end):
+        self.stage_totals[name] = self.stage_totals.get(name, 0) + (end - start)
+        self.events.append((name, start, end, threading.get_ident()))
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        self.record("frame", self.frame_start, end)
+        self.frames.append((self.frame_start, end))
+        self.window_frames += 1
+        now = time.perf_counter()
+        if now - self.window_start >= self.window:
+            self.update_summary(now)
+
+    def update_summary(self, now):
+        """Средние за окно: частота кадров, время кадра и этапов"""
+        durations = [end - start for start, end in self.frames]
+        stages = {name: total / self.window_frames / 1e6
+                  for name, total in self.stage_totals.items() if name != "frame"}
+        self.summary = {
+            "fps": self.window_frames / (now - self.window_start),
+            "frame_ms": sum(durations) / len(durations) / 1e6,
+            "max_ms": max(durations) / 1e6,
+            "stages": sorted(stages.items(), key=lambda item: -item[1]),
+        }
+        self.stage_totals = {}
+        self.window_frames = 0
+        self.window_start = now
+
+    def hud_lines(self, stages=4):
+        """Строки экранной сводки"""
+        if self.summary is None:
+            return ["сбор данных..."]
+        s = self.summary
+        lines = [f"{s['fps']:.1f} FPS  кадр {s['frame_ms']:.2f} мс  макс {s['max_ms']:.2f} мс"]
+        for name, ms in s["stages"][:stages]:
+            lines.append(f"{name}: {ms:.2f} мс")
+        return lines
+
+    def export(self, path):
+        """Записывает накопленные события в формате Chrome trace"""
+        events = [{"name": name, "ph": "X", "ts": start / 1000, "dur": (end - start) / 1000,
+                   "pid": self.pid, "tid": tid}
+                  for name, start, end, tid in list(self.events)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
@@ -0,0 +1,173 @@
+"""Запись ввода и воспроизведение партии без окна.
+
+С PODAROCHEK_RECORD=файл игра записывает поток ввода: для каждого кадра,
+в котором что-то произошло, - время, положение мыши и события (клики,
+клавиши, касания, изменение размера окна, готовность колоды). В заголовке
+записи - seed генератора партии, размер экрана и исходное состояние,
+в конце - итоговое состояние партии.
+
+Воспроизведение прогоняет записанные кадры через тот же главный цикл
+main.py с драйвером SDL dummy и без ограничения частоты кадров, после чего
+сравнивает итог с записанным:
+
+    python recording.py session.rec                 # одна запись
+    python recording.py records/*.rec --workers 8   # проверка многих записей
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pygame
+from pygame.locals import (QUIT, KEYDOWN, MOUSEBUTTONDOWN, MOUSEWHEEL, FINGERDOWN, FINGERMOTION,
+                           VIDEORESIZE, WINDOWSIZECHANGED)
+
+VERSION = 1
+# События, от которых зависит ход партии и прокрутка списков (движение
+# мыши записывается положением курсора в кадре)
+RECORDED_EVENTS = {QUIT, KEYDOWN, MOUSEBUTTONDOWN, MOUSEWHEEL, FINGERDOWN, FINGERMOTION,
+                   VIDEORESIZE, WINDOWSIZECHANGED}
+
+
+def encode_event(event):
+    attrs = {key: value for key, value in event.dict.items()
+             if isinstance(value, (int, float, str, tuple, list))}
+    return [event.type, attrs]
+
+
+def decode_event(item):
+    event_type, attrs = item
+    # JSON не различает кортежи и списки, а pygame ждет кортежи (pos, rel, size)
+    return pygame.event.Event(event_type, {key: tuple(value) if isinstance(value, list) else value
+                                           for key, value in attrs.items()})
+
+
+class Recorder:
+    """Пишет поток ввода в файл (без fsync: это отладочная запись)"""
+    def __init__(self, path, seed, size, mobile, snapshot, deck_ready, extra_events=()):
+        self.path = path
+        self.f = open(path, "w", encoding="utf-8")
+        self.started = time.perf_counter()
+        self.mouse = None
+        self.frames = 0
+        self.events = RECORDED_EVENTS | set(extra_events)
+        self.write({"version": VERSION, "seed": seed, "size": list(size), "mobile": mobile,
+                    "snapshot": snapshot, "deck_ready": deck_ready})
+
+    def write(self, item):
+        self.f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def frame(self, mouse_pos, events):
+        """Кадр попадает в запись, если были события или сдвинулась мышь"""
+        recorded = [encode_event(event) for event in events if event.type in self.events]
+        mouse_pos = tuple(mouse_pos)
+        if not recorded and mouse_pos == self.mouse:
+            return
+        self.mouse = mouse_pos
+        self.frames += 1
+        self.write([round((time.perf_counter() - self.started) * 1000, 1), list(mouse_pos), recorded])
+
+    def close(self, snapshot):
+        self.write({"final": snapshot, "frames": self.frames})
+        self.f.close()
+
+
+class Replay:
+    """Записанные кадры вместо планировщика кадров главного цикла"""
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        self.header = lines[0]
+        if self.header.get("version") != VERSION:
+            raise ValueError(f"неизвестная версия записи: {self.header.get('version')}")
+        self.frames = [line for line in lines[1:] if isinstance(line, list)]
+        footer = lines[-1] if len(lines) > 1 and isinstance(lines[-1], dict) else {}
+        # Записи, прерванной падением, не с чем сравнивать
+        self.final = footer.get("final")
+        self.position = 0
+        self.mouse_pos = (0, 0)
+
+    @property
+    def duration(self):
+        """Длительность записанной партии, с"""
+        return self.frames[-1][0] / 1000 if self.frames else 0
+
+    def get_events(self):
+        # Настоящие события окна dummy (и отложенные главным циклом) не нужны
+        pygame.event.clear()
+        if self.position >= len(self.frames):
+            return [pygame.event.Event(QUIT)]
+        _, mouse_pos, items = self.frames[self.position]
+        self.position += 1
+        self.mouse_pos = tuple(mouse_pos)
+        events = [decode_event(item) for item in items]
+        for event in events:
+            # Без настоящего окна размер меняет сама запись
+            if event.type == VIDEORESIZE:
+                pygame.display.set_mode(event.size)
+            elif event.type == WINDOWSIZECHANGED:
+                pygame.display.set_mode((event.x, event.y))
+        return events
+
+
+# Поля снимка, которые не зависят от ввода: ключ партии в статистике новый в каждом запуске
+UNREPLAYED = {"session"}
+
+
+def differences(expected, actual):
+    return [key for key in expected if key not in UNREPLAYED and expected[key] != actual.get(key)]
+
+
+def run(path):
+    """Воспроизводит запись в этом процессе; возвращает строку отчета и успех"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ["PODAROCHEK_JOURNAL"] = ""
+    os.environ["PODAROCHEK_STATS"] = ""
+    os.environ.pop("PODAROCHEK_SERVER", None)
+    os.environ.pop("PODAROCHEK_RECORD", None)
+    import main
+
+    replay = Replay(path)
+    started = time.perf_counter()
+    try:
+        game = main.main(replay)
+    except ValueError as e:
+        # Например, партия записана на другой версии колоды
+        return f"{path}: не воспроизведена: {e}", False
+    elapsed = time.perf_counter() - started
+    speedup = replay.duration / elapsed if elapsed else 0
+    summary = (f"{path}: кадров {len(replay.frames)}, {replay.duration:.1f} с записи за {elapsed:.2f} с "
+               f"(x{speedup:.0f}), {game.state}, очки {[player.score for player in game.players]}")
+    if replay.final is None:
+        return summary + ", итог не записан", True
+    changed = differences(replay.final, game.snapshot())
+    if changed:
+        return summary + f", РАСХОЖДЕНИЕ: {', '.join(changed)}", False
+    return summary + ", совпадает", True
+
+
+def main_replay():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных партий без окна")
+    parser.add_argument("paths", nargs="+", help="файлы записей")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if len(args.paths) == 1:
+        results = [run(args.paths[0])]
+    else:
+        # Каждая запись - в новом процессе: у main.py состояние на уровне модуля
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.workers, max_tasks_per_child=1) as pool:
+            results = list(pool.map(run, args.paths))
+    for summary, _ in results:
+        print(summary)
+    failed = sum(1 for _, ok in results if not ok)
+    if failed:
+        print(f"Не совпало записей: {failed} из {len(results)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_replay()
@@ -0,0 +1,217 @@
+"""Поиск заданий колоды по словам (инвертированный индекс).
+
+Текст задания приводится к нижнему регистру, ё заменяется на е, а от
+каждого слова отрезается окончание (простой стемминг по списку окончаний
+русских существительных, прилагательных и глаголов): "песня", "песню" и
+"песни" ищутся одинаково. Для каждой категории хранятся основы слов по
+алфавиту и номера заданий, в которых они встречаются, поэтому любое слово
+запроса ищется как начало основы двоичным поиском.
+
+Шаблон генератора (см. generators.py) попадает в индекс одной записью со
+всеми вариантами своих слов, а конкретное задание из него выбирается
+только для найденного результата - так индекс не растет с числом заданий,
+которые дают шаблоны.
+
+Индекс категории привязан к mtime и размеру ее исходного файла: после
+правки data/*.txt заново разбираются только изменившиеся категории.
+
+    python search.py песня                       # поиск в колоде data/
+    python search.py планка --synthetic 100000   # время на большой колоде
+"""
+import argparse
+import bisect
+import random
+import re
+import sys
+import time
+from array import array
+
+# Окончания по длине, от длинных к коротким; отрезается самое длинное из
+# подходящих, если от слова остается не меньше MIN_STEM букв
+ENDINGS = {
+    4: {"ться", "ются"},
+    3: {"ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "ешь", "ете", "ите", "ает", "яет",
+        "тся", "ать", "ять", "ить", "еть", "уть", "ова", "ево", "ией", "иях", "иям"},
+    2: {"ах", "ях", "ам", "ям", "ом", "ем", "ов", "ев", "ей", "ой", "ий", "ый", "ая", "яя", "ое", "ее",
+        "ые", "ие", "ую", "юю", "ия", "ья", "ию", "ью", "ть", "ет", "ут", "ют", "ат", "ят", "те"},
+    1: {"а", "я", "о", "е", "у", "ю", "ы", "и", "ь", "й"},
+}
+MIN_STEM = 3
+# Найденных заданий в ответе по умолчанию
+LIMIT = 50
+
+WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    return text.lower().replace("ё", "е")
+
+
+def stem(word):
+    """Основа слова в нижнем регистре: слово без окончания"""
+    for length in (4, 3, 2, 1):
+        if len(word) - length >= MIN_STEM and word[-length:] in ENDINGS[length]:
+            return word[:-length]
+    return word
+
+
+def query_terms(query):
+    """Основы слов запроса; каждая ищется как начало основы в тексте задания"""
+    return [stem(word) for word in WORD.findall(normalize(query))]
+
+
+class CategoryIndex:
+    """Индекс одной категории: основы по алфавиту и номера записей с каждой.
+
+    Записи - тексты обычных заданий, за ними по записи на шаблон из
+    templates (пары номер первого задания шаблона, generators.Template).
+    """
+    def __init__(self, texts, stamp=None, templates=(), count=None):
+        # mtime, размер исходного файла и число заданий, по которым индекс собран
+        self.stamp = stamp
+        self.templates = list(templates)
+        self.static = len(texts) - len(self.templates)
+        self.count = len(texts) if count is None else count
+        postings = {}
+        stems = {}
+        for index, text in enumerate(texts):
+            terms = set()
+            for word in WORD.findall(normalize(text)):
+                term = stems.get(word)
+                if term is None:
+                    term = stems[word] = stem(word)
+                terms.add(term)
+            for term in terms:
+                postings.setdefault(term, []).append(index)
+        self.terms = sorted(postings)
+        self.postings = [array("I", postings[term]) for term in self.terms]
+
+    def lookup(self, prefix):
+        """Номера записей, в которых есть основа, начинающаяся с prefix"""
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\uffff", start)
+        if end - start == 1:
+            return set(self.postings[start])
+        found = set()
+        for postings in self.postings[start:end]:
+            found.update(postings)
+        return found
+
+    def search(self, prefixes):
+        """Номера записей, в которых нашлись все prefixes, по возрастанию"""
+        found = None
+        # Длинные начала обычно встречаются реже: пересечение сразу становится маленьким
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            matches = self.lookup(prefix)
+            found = matches if found is None else found & matches
+            if not found:
+                return []
+        return sorted(found)
+
+    def task(self, record, prefixes):
+        """Номер задания для найденной записи.
+
+        У шаблона берется задание, в котором выбраны варианты со словами
+        запроса, остальные параметры - первые по порядку.
+        """
+        if record < self.static:
+            return record
+        start, template = self.templates[record - self.static]
+        prefer = lambda option: any(stem(word).startswith(prefix) or word.startswith(prefix)
+                                    for word in WORD.findall(normalize(option)) for prefix in prefixes)
+        return start + template.example(prefer)
+
+
+class TaskIndex:
+    """Индекс всех категорий колоды deck.
+
+    Индекс не меняется после сборки: новая версия колоды получает новый
+    TaskIndex (см. build), поэтому его можно собирать в фоновом потоке,
+    пока старый отвечает на запросы.
+    """
+    def __init__(self, categories, deck=None):
+        self.categories = categories
+        self.deck = deck
+
+    @classmethod
+    def build(cls, deck, previous=None):
+        """Индекс колоды deck; категории, не изменившиеся с previous, берутся из него"""
+        categories = []
+        for category in range(deck.categories_count):
+            stamp = (*deck.sources[category], deck.count(category))
+            old = previous.categories[category] if previous is not None and category < len(previous.categories) else None
+            # У колоды, собранной не из файлов, нет отметок - ее категории сравнить не с чем
+            if old is not None and old.stamp == stamp and stamp[:2] != (0, 0):
+                categories.append(old)
+            else:
+                static = deck.ranges[category][1]
+                templates = list(zip(deck.starts[category], deck.templates[category]))
+                texts = [deck.task(category, index)[0] for index in range(static)]
+                texts.extend(template.search_text() for _, template in templates)
+                categories.append(CategoryIndex(texts, stamp, templates, deck.count(category)))
+        return cls(categories, deck)
+
+    @classmethod
+    def from_texts(cls, decks):
+        """Индекс по спискам текстов заданий (без пакета колоды)"""
+        return cls([CategoryIndex(texts) for texts in decks])
+
+    def search(self, query, limit=LIMIT, category=None):
+        """Задания, в которых каждое слово запроса начинает какое-то слово текста.
+
+        Возвращает до limit пар (категория, номер задания) по порядку
+        категорий и номеров; category - искать только в одной категории.
+        """
+        prefixes = query_terms(query)
+        if not prefixes:
+            return []
+        results = []
+        for index, category_index in enumerate(self.categories):
+            if category is not None and index != category:
+                continue
+            for record in category_index.search(prefixes)[:limit - len(results)]:
+                results.append((index, category_index.task(record, prefixes)))
+            if len(results) >= limit:
+                break
+        return results
+
+
+def main():
+    import deck
+    import dedup
+
+    parser = argparse.ArgumentParser(description="Поиск заданий по словам")
+    parser.add_argument("query", help="слова запроса")
+    parser.add_argument("data_dir", nargs="?", default=deck.DATA_DIR)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--synthetic", type=int, help="поиск в случайной колоде из N заданий")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.synthetic:
+        texts = dedup.synthetic(args.synthetic, random.Random(1))
+        index = TaskIndex.from_texts([texts])
+        text = lambda category, task: texts[task]
+    else:
+        tasks = deck.open_deck(args.data_dir)
+        index = TaskIndex.build(tasks)
+        text = lambda category, task: tasks.task(category, task)[0]
+    built = time.perf_counter() - started
+
+    # Время ответа - лучшее из нескольких повторов
+    elapsed = float("inf")
+    for _ in range(20):
+        started = time.perf_counter()
+        results = index.search(args.query, args.limit)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    for category, task in results:
+        print(f"  {category}/{task}: {text(category, task)}")
+    terms = sum(len(category.terms) for category in index.categories)
+    records = sum(category.static + len(category.templates) for category in index.categories)
+    tasks_count = sum(category.count for category in index.categories)
+    print(f"Заданий {tasks_count}, записей {records}, основ {terms}, индекс за {built:.2f} с, "
+          f"запрос за {elapsed * 1000:.2f} мс, найдено {len(results)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""Сервер столов: много независимых партий, игроки со своих устройств.
+
+Каждая комната - отдельная партия Game. Клиенты подключаются по TCP
+и обмениваются JSON-строками (одно сообщение - одна строка):
+
+    клиент -> сервер   {"op": "join", "room": "стол 1", "name": "Аня"}
+                       {"op": "add_player", "name": ...}
+                       {"op": "start", "tasks": 20}
+                       {"op": "select", "category": 0, "index": 3}
+                       {"op": "complete", "success": true}
+                       {"op": "replace", "category": 1, "index": 4, "task": 17}
+                       {"op": "continue"}, {"op": "new_game"}
+    сервер -> клиент   {"type": "state", "version": 1, "view": {...}}    после входа
+                       {"type": "delta", "version": 2, "changes": {...}} после хода
+                       {"type": "ack", "id": ..., "ok": true}            ответ на запрос с id
+
+Состояние комнаты (view) - снимок партии Game.snapshot() (со сложностями
+поля) и текст открытого задания. После хода рассылаются только изменившиеся
+поля снимка: поле заданий целиком уходит один раз, при начале партии.
+
+Клиент, вошедший с именем, - игрок: он выбирает и сдает задания в свой ход.
+Клиент без имени (общий экран стола) управляет партией целиком. Новое имя
+после начала партии дает только зрителя: он видит партию, но не ходит.
+Опустевшая комната хранится ROOM_GRACE секунд: клиенты, вернувшиеся после
+обрыва связи, продолжают ту же партию на своих местах.
+
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+from game import Game, decks
+
+DEFAULT_PORT = 8765
+# Клиент, который не успевает читать, отключается, а не копит память сервера
+MAX_CLIENT_BUFFER = 1 << 20
+# Имя игрока - непустая строка не длиннее MAX_NAME символов
+MAX_NAME = 40
+# Сколько секунд живет комната без клиентов: обрыв связи на устройстве
+# стола не должен терять партию
+ROOM_GRACE = 600
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def view(game):
+    """Состояние партии, которое видят клиенты"""
+    # Тексты всего поля клиентам не нужны: открытое задание приходит в "task"
+    state = game.snapshot(texts=False)
+    state["task"] = list(game.task_text(game.selected_category, game.selected_difficulty)) if game.task_in_progress else None
+    return state
+
+
+def valid_name(name):
+    return isinstance(name, str) and 0 < len(name.strip()) <= MAX_NAME
+
+
+def diff(old, new):
+    """Поля состояния, изменившиеся с прошлой рассылки"""
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+class Client:
+    __slots__ = ("writer", "room", "player", "table")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.room = None
+        # Номер игрока в партии; None - общий экран стола или зритель
+        self.player = None
+        # Общий экран стола: управляет партией целиком
+        self.table = False
+
+    def send(self, data):
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            transport.abort()
+            return
+        self.writer.write(data)
+
+
+class RoomStats:
+    """Ходы комнаты: число, время обработки и объем рассылки"""
+    def __init__(self, window=1000):
+        self.actions = 0
+        self.rejected = 0
+        self.bytes_sent = 0
+        self.latency = deque(maxlen=window)
+        self.started = time.perf_counter()
+
+    def summary(self):
+        ordered = sorted(self.latency)
+        point = lambda p: ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 if ordered else 0
+        elapsed = time.perf_counter() - self.started
+        return {
+            "actions": self.actions,
+            "rejected": self.rejected,
+            "actions_per_s": self.actions / elapsed if elapsed else 0,
+            "p50_ms": point(50),
+            "p99_ms": point(99),
+            "kb_sent": self.bytes_sent / 1024,
+        }
+
+
+class Room:
+    """Одна партия и подключенные к ней клиенты"""
+    def __init__(self, name):
+        self.name = name
+        self.game = Game()
+        self.clients = set()
+        self.version = 1
+        self.state = view(self.game)
+        self.stats = RoomStats()
+        # Отложенное закрытие опустевшей комнаты (asyncio.TimerHandle)
+        self.expiry = None
+
+    def join(self, client, name=None):
+        if self.expiry is not None:
+            self.expiry.cancel()
+            self.expiry = None
+        client.room = self
+        client.player = None
+        client.table = not name
+        if name:
+            # Повторный вход игрока (например, после обрыва связи) - на его же место
+            names = [player.name for player in self.game.players]
+            if name in names:
+                client.player = names.index(name)
+            elif self.game.state == "SETUP" and self.game.add_player(name):
+                client.player = len(self.game.players) - 1
+                self.publish()
+            # Иначе (партия уже идет или мест нет) - зритель
+        # Новый клиент получает полное состояние, остальные - изменения
+        self.clients.add(client)
+        client.send(encode({"type": "state", "version": self.version, "view": self.state,
+                            "player": client.player, "table": client.table}))
+
+    def leave(self, client):
+        self.clients.discard(client)
+
+    def may_play(self, client):
+        """Ход делает общий экран стола или игрок, чья сейчас очередь"""
+        return client.table or client.player is not None and client.player == self.game.current_player_idx
+
+    def may_manage(self, client):
+        """Игроков, начало партии и раунды меняют участники, но не зрители"""
+        return client.table or client.player is not None
+
+    def apply(self, client, message):
+        """Выполняет действие клиента; False, если оно не по правилам"""
+        game = self.game
+        op = message.get("op")
+        if op == "add_player":
+            name = message.get("name")
+            return (self.may_manage(client) and valid_name(name) and game.state == "SETUP"
+                    and game.add_player(name))
+        if op == "start":
+            return self.may_manage(client) and game.state == "SETUP" and game.start_game(message.get("tasks"))
+        if op == "select":
+            return self.may_play(client) and game.select_task(message["category"], message["index"])
+        if op == "complete":
+            return self.may_play(client) and game.complete_task(bool(message.get("success")))
+        if op == "replace":
+            # Задания на поле меняет только общий экран стола
+            return client.table and game.replace_task(message["category"], message["index"], message["task"])
+        if op == "continue":
+            if not self.may_manage(client):
+                return False
+            ok = game.state == "INTERMEDIATE_RESULTS"
+            game.continue_game()
+            return ok
+        if op == "new_game":
+            if game.state != "GAME_OVER" or not client.table:
+                return False
+            # Новая партия с теми же игроками, чтобы телефонам не входить заново
+            players = game.players
+            self.game = Game()
+            for player in players:
+                self.game.add_player(player.name, player.color)
+            return True
+        raise ValueError(f"неизвестное действие: {op}")
+
+    def handle(self, client, message):
+        started = time.perf_counter()
+        try:
+            ok = bool(self.apply(client, message))
+        except (KeyError, TypeError, IndexError, ValueError) as e:
+            print(f"Комната {self.name}: ошибка в запросе {message}: {e}")
+            ok = False
+        if ok:
+            self.publish()
+            self.stats.actions += 1
+        else:
+            self.stats.rejected += 1
+        if "id" in message:
+            client.send(encode({"type": "ack", "id": message["id"], "ok": ok}))
+        self.stats.latency.append(time.perf_counter() - started)
+
+    def publish(self):
+        """Рассылает всем клиентам изменения с прошлой рассылки"""
+        state = view(self.game)
+        changes = diff(self.state, state)
+        if not changes:
+            return
+        self.state = state
+        self.version += 1
+        data = encode({"type": "delta", "version": self.version, "changes": changes})
+        for client in self.clients:
+            client.send(data)
+        self.stats.bytes_sent += len(data) * len(self.clients)
+
+
+class Server:
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, grace=ROOM_GRACE):
+        self.host = host
+        self.port = port
+        self.grace = grace
+        self.rooms = {}
+        self.server = None
+
+    async def start(self):
+        # Колода читается до первого клиента и не в цикле событий; правки файлов
+        # собирает фоновый наблюдатель, поэтому "start" в комнате берет готовую колоду
+        await asyncio.get_running_loop().run_in_executor(None, decks.get)
+        decks.start_watching()
+        self.server = await asyncio.start_server(self.serve_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def room(self, name):
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(name)
+        return room
+
+    async def serve_client(self, reader, writer):
+        client = Client(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    break
+                if not isinstance(message, dict):
+                    # Сообщение - только JSON-объект
+                    break
+                if message.get("op") == "join":
+                    name = message.get("name")
+                    if name is not None and not valid_name(name):
+                        # Неправильное имя - вход отклоняется, клиент остается где был
+                        if "id" in message:
+                            client.send(encode({"type": "ack", "id": message["id"], "ok": False}))
+                    else:
+                        if client.room is not None:
+                            client.room.leave(client)
+                        self.room(str(message.get("room", ""))).join(client, name)
+                elif client.room is not None:
+                    client.room.handle(client, message)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # ValueError - слишком длинная строка от клиента
+            pass
+        finally:
+            room = client.room
+            if room is not None:
+                room.leave(client)
+                # Пустая комната ждет переподключения grace секунд, потом закрывается
+                if not room.clients and self.rooms.get(room.name) is room and room.expiry is None:
+                    room.expiry = asyncio.get_running_loop().call_later(self.grace, self.expire, room)
+            writer.close()
+
+    def expire(self, room):
+        room.expiry = None
+        if not room.clients and self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+
+    def stats(self):
+        return {name: dict(room.stats.summary(), clients=len(room.clients), state=room.game.state)
+                for name, room in self.rooms.items()}
+
+
+async def report_loop(server, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for name, s in sorted(server.stats().items()):
+            print(f"{name}: клиентов {s['clients']}, {s['state']}, ходов {s['actions']} "
+                  f"({s['actions_per_s']:.1f}/с), p50 {s['p50_ms']:.2f} мс, p99 {s['p99_ms']:.2f} мс, "
+                  f"отправлено {s['kb_sent']:.1f} КБ")
+
+
+async def serve(host, port, report_interval, grace):
+    server = await Server(host, port, grace).start()
+    print(f"Сервер слушает {host}:{server.port}")
+    if report_interval:
+        asyncio.create_task(report_loop(server, report_interval))
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер столов для игры с телефонов")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--report", type=float, default=10, help="интервал сводки по комнатам, с (0 - без сводки)")
+    parser.add_argument("--grace", type=float, default=ROOM_GRACE, help="сколько секунд хранить комнату без клиентов")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.report, args.grace))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Симуляция партий без окна для настройки баланса очков.
+
+Синтетические игроки выбирают задания и справляются с ними с заданной
+вероятностью; партии идут по правилам из game.py в пуле процессов.
+
+    python simulate.py --games 1000000 --players 4 --rates 0.8,0.6,0.5,0.3
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import deck
+from game import Game
+
+STRATEGIES = ("random", "easiest", "hardest")
+
+
+def task_order(tasks, strategy, rng):
+    """Порядок, в котором синтетические игроки берут задания с поля"""
+    if strategy == "random":
+        # Случайная перестановка - то же, что каждый раз брать любое свободное задание
+        slots = [(c, i) for c in range(len(tasks)) for i in range(tasks.size(c))]
+        rng.shuffle(slots)
+        yield from slots
+        return
+    # Места на поле от легких заданий к трудным (или наоборот) - по сложности, а не по месту
+    ranked = [sorted(range(tasks.size(c)), key=tasks.difficulty[c].__getitem__, reverse=strategy == "hardest")
+              for c in range(len(tasks))]
+    while True:
+        category = rng.choice([c for c in range(len(tasks)) if tasks.remaining(c)])
+        yield category, next(i for i in ranked[category] if not tasks.is_completed(category, i))
+
+
+def play(game, rates, tasks_per_category, strategy):
+    """Проигрывает одну партию до GAME_OVER"""
+    game.start_game(tasks_per_category)
+    order = task_order(game.tasks, strategy, game.rng)
+    while game.state != "GAME_OVER":
+        game.continue_game()
+        game.select_task(*next(order))
+        game.complete_task(game.rng.random() < rates[game.current_player_idx])
+
+
+class Stats:
+    """Сводка по партиям; сводки из разных процессов складываются"""
+    def __init__(self, players):
+        self.games = 0
+        self.rounds = Counter()
+        self.spread = Counter()
+        self.unplayed = Counter()
+        self.wins = [0] * players
+        self.score_sum = [0] * players
+
+    def add(self, game):
+        scores = [p.score for p in game.players]
+        best = max(scores)
+        self.games += 1
+        self.rounds[game.round_counter] += 1
+        self.spread[best - min(scores)] += 1
+        self.unplayed[game.tasks_remaining] += 1
+        for i, score in enumerate(scores):
+            self.score_sum[i] += score
+        # Ничья делит победу поровну
+        winners = [i for i, score in enumerate(scores) if score == best]
+        for i in winners:
+            self.wins[i] += 1 / len(winners)
+
+    def merge(self, other):
+        self.games += other.games
+        self.rounds.update(other.rounds)
+        self.spread.update(other.spread)
+        self.unplayed.update(other.unplayed)
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.score_sum = [a + b for a, b in zip(self.score_sum, other.score_sum)]
+
+
+def percentile(counter, fraction):
+    """Процентиль по гистограмме значение -> число партий"""
+    target = fraction * sum(counter.values())
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        if seen >= target:
+            return value
+    return 0
+
+
+def mean(counter):
+    total = sum(counter.values())
+    return sum(value * count for value, count in counter.items()) / total if total else 0
+
+
+def simulate_chunk(games, rates, tasks_per_category, strategy, seed, pack_path):
+    """Проигрывает games партий в одном процессе"""
+    rng = random.Random(seed)
+    # Колода открывается один раз на процесс, а не на каждую партию; пакет уже
+    # собран родительским процессом, здесь он только отображается в память
+    task_deck = deck.Deck.open(pack_path)
+    stats = Stats(len(rates))
+    for _ in range(games):
+        game = Game(task_deck, rng)
+        for i in range(len(rates)):
+            game.add_player(f"Игрок {i + 1}")
+        play(game, rates, tasks_per_category, strategy)
+        stats.add(game)
+    return stats
+
+
+def simulate(games, rates, tasks_per_category=20, strategy="random", workers=None, chunk=5000, seed=None):
+    """Раскидывает партии по процессам и складывает сводки"""
+    seed = random.randrange(2**32) if seed is None else seed
+    chunks = [min(chunk, games - start) for start in range(0, games, chunk)]
+    stats = Stats(len(rates))
+    # Устаревший пакет пересобирается один раз, до запуска процессов
+    deck.open_deck().close()
+    pack_path = os.path.join(deck.DATA_DIR, deck.PACK_NAME)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate_chunk, count, rates, tasks_per_category, strategy, seed + i, pack_path)
+                   for i, count in enumerate(chunks)]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def report(stats, rates):
+    unfinished = stats.games - stats.unplayed[0]
+    print(f"Партий: {stats.games}")
+    print(f"Раунды: среднее {mean(stats.rounds):.2f}, медиана {percentile(stats.rounds, 0.5)}, "
+          f"от {min(stats.rounds)} до {max(stats.rounds)}")
+    print(f"Разрыв между первым и последним: среднее {mean(stats.spread):.2f}, "
+          f"p50 {percentile(stats.spread, 0.5)}, p90 {percentile(stats.spread, 0.9)}, "
+          f"p99 {percentile(stats.spread, 0.99)}")
+    print(f"Партии с несыгранными заданиями: {unfinished / stats.games:.1%}, "
+          f"в среднем {mean(stats.unplayed):.2f} заданий остаются на поле")
+    print("Игрок  успех  средний счет  победы")
+    for i, rate in enumerate(rates):
+        print(f"{i + 1:>5}  {rate:>5.0%}  {stats.score_sum[i] / stats.games:>12.2f}  {stats.wins[i] / stats.games:>6.1%}")
+
+
+def parse_rates(text, players):
+    """Вероятности успеха через запятую; последняя повторяется для остальных игроков"""
+    rates = [float(rate) for rate in text.split(",")]
+    if any(not 0 <= rate <= 1 for rate in rates):
+        raise argparse.ArgumentTypeError("вероятность успеха должна быть от 0 до 1")
+    return (rates + rates[-1:] * players)[:players]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Симуляция партий для настройки баланса")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--rates", default="0.6", help="вероятности успеха игроков через запятую")
+    parser.add_argument("--tasks", type=int, default=20, help="заданий в категории")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="random", help="как игроки выбирают задания")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk", type=int, default=5000, help="партий на одну задачу пула")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if not 2 <= args.players <= Game.MAX_PLAYERS:
+        parser.error(f"игроков должно быть от 2 до {Game.MAX_PLAYERS}")
+    if not Game.MIN_TASKS <= args.tasks <= Game.MAX_TASKS:
+        parser.error(f"заданий в категории должно быть от {Game.MIN_TASKS} до {Game.MAX_TASKS}")
+    try:
+        rates = parse_rates(args.rates, args.players)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    stats = simulate(args.games, rates, args.tasks, args.strategy, args.workers, args.chunk, args.seed)
+    report(stats, rates)
+    print(f"Время: {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
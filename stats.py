@@ -0,0 +1,236 @@
+"""Статистика сыгранных партий в локальной базе SQLite.
+
+Для каждой партии сохраняются игроки с итоговыми очками и местами, а для
+каждого хода - кто играл, категория и текст задания, сложность, принято
+ли задание и сколько секунд было открыто окно задания.
+
+Главный цикл только кладет строки в очередь; фоновый поток пишет их
+пачками, одной транзакцией не чаще раза в flush_interval секунд. Запросы
+(самые трудные задания, очки по категориям, история игрока) выполняет
+тот же поток после записи накопленного и возвращает Future:
+
+    python stats.py                      # сводка по всем партиям
+    python stats.py --player "Аня"       # история игрока
+"""
+import argparse
+import concurrent.futures
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from game import Game
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    players INTEGER NOT NULL,
+    tasks_per_category INTEGER NOT NULL,
+    rounds INTEGER
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session TEXT NOT NULL,
+    player TEXT NOT NULL,
+    category INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    success INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    played REAL NOT NULL
+);
+-- Покрывающий индекс для сводок по заданиям и категориям
+CREATE INDEX IF NOT EXISTS turns_task ON turns (category, task, success, difficulty);
+CREATE INDEX IF NOT EXISTS turns_player ON turns (player);
+CREATE TABLE IF NOT EXISTS results (
+    session TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    place INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_player ON results (player, session);
+"""
+
+INSERT_SESSION = "INSERT OR IGNORE INTO sessions (id, started, players, tasks_per_category) VALUES (?, ?, ?, ?)"
+INSERT_TURN = "INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_RESULT = "INSERT INTO results VALUES (?, ?, ?, ?)"
+FINISH_SESSION = "UPDATE sessions SET finished = ?, rounds = ? WHERE id = ?"
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class Stats:
+    """Статистика партий с записью в фоновом потоке"""
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.game = None
+        # Текущая партия: ее ключ в базе и время открытия окна задания
+        self.session = None
+        self.selected_at = None
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name="stats", daemon=True)
+        self.writer.start()
+
+    def attach(self, game):
+        """Начинает записывать партию game (уже начатую - с текущего хода).
+
+        Восстановленная из журнала партия продолжает свою прежнюю запись.
+        """
+        if self.game is not None:
+            self.game.stats = None
+        self.game = game
+        game.stats = self
+        self.session = None
+        self.selected_at = time.monotonic() if game.task_in_progress else None
+        if game.state in ("PLAYING", "INTERMEDIATE_RESULTS"):
+            self.begin(game)
+
+    def begin(self, game):
+        self.session = game.session_id or uuid.uuid4().hex
+        self.queue.put((INSERT_SESSION, (self.session, time.time(), len(game.players), game.tasks_per_category)))
+
+    def record(self, game, entry):
+        """Запись журнала партии (см. Game.log); вызывается до смены игрока"""
+        kind = entry[0]
+        if kind == "start":
+            self.begin(game)
+        elif kind == "select":
+            self.selected_at = time.monotonic()
+        elif kind == "complete" and self.session is not None:
+            category, index = game.selected_category, game.selected_difficulty
+            seconds = time.monotonic() - self.selected_at if self.selected_at is not None else 0
+            self.selected_at = None
+            question, _ = game.tasks.text(category, index)
+            self.queue.put((INSERT_TURN, (self.session, game.players[game.current_player_idx].name, category,
+                                          question, game.tasks.difficulty[category][index], int(entry[1]),
+                                          round(seconds, 2), time.time())))
+
+    def finish(self, game):
+        """Итоги законченной партии: очки и места игроков"""
+        if game is not self.game or self.session is None:
+            return
+        for place, player in enumerate(game.leaderboard, 1):
+            self.queue.put((INSERT_RESULT, (self.session, player.name, player.score, place)))
+        self.queue.put((FINISH_SESSION, (time.time(), game.round_counter, self.session)))
+        self.session = None
+
+    def query(self, func, *args):
+        """Выполняет func(db, *args) в потоке записи; возвращает Future"""
+        future = concurrent.futures.Future()
+        self.queue.put((func, args, future))
+        return future
+
+    def close(self):
+        """Дописывает очередь в базу и останавливает поток"""
+        self.queue.put(None)
+        self.writer.join()
+
+    def write_loop(self):
+        try:
+            db = connect(self.path)
+        except sqlite3.Error as e:
+            print(f"Статистика партий не записывается: {e}")
+            db = None
+        pending = []
+        deadline = None
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if pending else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item and len(item) == 2:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                continue
+            # Пора записать: истек интервал, пришел запрос или выход
+            if pending and db is not None:
+                try:
+                    with db:
+                        for sql, params in pending:
+                            db.execute(sql, params)
+                except sqlite3.Error as e:
+                    print(f"Статистика партий не записана: {e}")
+            pending = []
+            deadline = None
+            if item is None:
+                break
+            if item:
+                func, args, future = item
+                if db is None:
+                    future.set_exception(RuntimeError("база статистики недоступна"))
+                    continue
+                try:
+                    future.set_result(func(db, *args))
+                except Exception as e:
+                    future.set_exception(e)
+        if db is not None:
+            db.close()
+
+
+def hardest_tasks(db, limit=10, min_plays=3):
+    """Задания с наименьшей долей принятых: (категория, текст, ходов, доля)"""
+    return db.execute("""
+        SELECT category, task, COUNT(*) AS plays, AVG(success) AS rate
+        FROM turns GROUP BY category, task HAVING plays >= ?
+        ORDER BY rate, plays DESC LIMIT ?""", (min_plays, limit)).fetchall()
+
+
+def category_points(db):
+    """По категориям: (категория, ходов, очков за ход, доля принятых, секунд на задание)"""
+    return db.execute("""
+        SELECT category, COUNT(*), AVG(success * difficulty), AVG(success), AVG(seconds)
+        FROM turns GROUP BY category ORDER BY category""").fetchall()
+
+
+def player_history(db, name, limit=10):
+    """Последние партии игрока: (начало, игроков, очки, место)"""
+    return db.execute("""
+        SELECT s.started, s.players, r.score, r.place
+        FROM results r JOIN sessions s ON s.id = r.session
+        WHERE r.player = ? ORDER BY s.started DESC LIMIT ?""", (name, limit)).fetchall()
+
+
+def game_over_summary(db):
+    """Очки за ход по категориям и самое трудное задание (для экрана конца игры)"""
+    hardest = hardest_tasks(db, 1)
+    return category_points(db), hardest[0] if hardest else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сводка по сыгранным партиям")
+    parser.add_argument("path", nargs="?", default="podarochek-stats.sqlite3", help="файл базы статистики")
+    parser.add_argument("--player", help="история игрока")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    db = connect(args.path)
+    categories = Game().categories
+    if args.player:
+        print(f"Партии игрока {args.player}:")
+        for started, players, score, place in player_history(db, args.player, args.limit):
+            print(f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}: "
+                  f"{place} место из {players}, {score} очков")
+        return
+    sessions, finished = db.execute("SELECT COUNT(*), COUNT(finished) FROM sessions").fetchone()
+    print(f"Партий: {sessions}, доиграно: {finished}")
+    print(f"{'категория':<15} {'ходов':>6} {'очков/ход':>10} {'принято':>8} {'секунд':>7}")
+    for category, plays, points, rate, seconds in category_points(db):
+        print(f"{categories[category]:<15} {plays:>6} {points:>10.2f} {rate:>8.0%} {seconds:>7.1f}")
+    print("Самые трудные задания:")
+    for category, task, plays, rate in hardest_tasks(db, args.limit):
+        print(f"  {rate:>4.0%} из {plays:>3} - {categories[category]}: {task}")
+
+
+if __name__ == "__main__":
+    main()
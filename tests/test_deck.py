@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+import deck
+from game import Game
+
+
+def test_parse_line_difficulty():
+    assert deck.parse_line("Загадка|Ответ\n") == ("Загадка", "Ответ", 0)
+    assert deck.parse_line("Загадка | Ответ | 7\n") == ("Загадка", "Ответ", 7)
+    assert deck.parse_line("Задание||3\n") == ("Задание", "", 3)
+    # Третье поле не число - это часть ответа, как раньше
+    assert deck.parse_line("Загадка|Ответ|еще ответ\n") == ("Загадка", "Ответ|еще ответ", 0)
+    with pytest.raises(ValueError):
+        deck.parse_line("Задание||11\n")
+
+
+def test_declared_difficulty_on_board():
+    tasks = deck.Deck(deck.compile_pack([
+        [(f"Загадка {i}", "Ответ", 9) for i in range(10)],
+        [(f"Творческое задание {i}", "") for i in range(10)],
+        [(f"Словесное задание {i}", "", 0) for i in range(10)],
+        [(f"Физическое задание {i}", "") for i in range(10)],
+    ]))
+    assert tasks.difficulty(0, 3) == 9
+    game = Game(tasks, random.Random(1))
+    game.add_player("Аня")
+    game.add_player("Борис")
+    game.start_game(5)
+    assert list(game.tasks.difficulty[0]) == [9] * game.tasks.size(0)
+    # Задания без своей сложности по-прежнему занимают всю шкалу
+    assert game.tasks.difficulty[1][0] == 1 and game.tasks.difficulty[1][-1] == 10
+
+
+def test_template_difficulty_is_rejected():
+    with pytest.raises(ValueError):
+        deck.compile_pack([[("Сделайте {3-10} приседаний", "", 5)]])
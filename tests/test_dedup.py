@@ -0,0 +1,49 @@
+import random
+
+import dedup
+
+
+def variants_deck(seed):
+    """Колода из групп вариантов одной фразы с одним-двумя замененными словами"""
+    rng = random.Random(seed)
+    syllables = ["ко", "ма", "ре", "ти", "на", "лу", "пе", "за", "ви", "до", "су", "ры"]
+    words = ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(400)]
+    texts = []
+    for _ in range(60):
+        base = [rng.choice(words) for _ in range(12)]
+        for _ in range(5):
+            variant = list(base)
+            for _ in range(rng.randint(0, 2)):
+                variant[rng.randrange(len(variant))] = rng.choice(words)
+            texts.append(" ".join(variant))
+    return texts
+
+
+def similar_pairs(texts):
+    sets = [dedup.shingles(text) for text in texts]
+    return [(i, j) for i in range(len(texts)) for j in range(i + 1, len(texts))
+            if dedup.jaccard(sets[i], sets[j]) >= dedup.THRESHOLD]
+
+
+def test_recall_against_brute_force():
+    texts = variants_deck(1)
+    groups = dedup.near_duplicate_groups(texts)
+    pairs = similar_pairs(texts)
+    found = sum(groups[i] == groups[j] for i, j in pairs)
+    assert pairs
+    # LSH может пропустить пару без общей полосы подписи, но не больше пары процентов
+    assert found >= 0.98 * len(pairs)
+
+
+def test_pairs_sharing_a_band_are_grouped():
+    texts = variants_deck(2)
+    groups = dedup.near_duplicate_groups(texts)
+    bands = dedup.signatures([dedup.shingles(text) for text in texts])
+    for i, j in similar_pairs(texts):
+        if any(first == second for first, second in zip(bands[i], bands[j])):
+            assert groups[i] == groups[j], (texts[i], texts[j])
+
+
+def test_numbers_only_differences_are_one_group():
+    groups = dedup.near_duplicate_groups(["Сделайте 10 приседаний", "Сделайте 25 приседаний", "Спойте песню"])
+    assert groups == [0, 0, 2]
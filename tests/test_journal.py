@@ -0,0 +1,86 @@
+import random
+
+import deck
+import journal
+from game import Game
+
+
+def small_deck():
+    return deck.Deck(deck.compile_pack([
+        [(f"Загадка {i}", f"Ответ {i}") for i in range(10)],
+        [(f"Творческое задание {i}", "") for i in range(10)],
+        [(f"Словесное задание {i}", "") for i in range(10)],
+        [(f"Физическое задание {i}", "") for i in range(10)],
+    ]))
+
+
+def test_compaction_after_complete_resumes(tmp_path):
+    path = str(tmp_path / "game.journal")
+    tasks = small_deck()
+    game = Game(tasks, random.Random(1))
+    session = journal.Journal(path, compact_every=5)
+    session.attach(game)
+    game.add_player("Аня")
+    game.add_player("Борис")
+    game.start_game(5)
+    assert game.select_task(0, 0)
+    # Пятая запись - "complete": журнал сжимается на ней
+    assert game.complete_task(True)
+    session.checkpoint()
+    assert session.entries == 0
+    session.close()
+
+    restored = journal.recover(path, deck=tasks)
+    assert restored.snapshot() == game.snapshot()
+    assert not restored.task_in_progress
+    assert restored.current_player_idx == 1
+    assert restored.players[0].score == game.tasks.difficulty[0][0]
+    # Партия продолжается с хода второго игрока
+    assert restored.select_task(1, 0)
+    assert restored.complete_task(True)
+    assert restored.current_player_idx == 0
+
+
+def test_restore_after_deck_edit_keeps_board(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i, name in enumerate(deck.CATEGORY_FILES):
+        (data_dir / name).write_text("".join(f"Задание {i}-{j}|Ответ {j}\n" for j in range(10)), encoding="utf-8")
+    registry = deck.DeckRegistry(str(data_dir))
+    game = Game(registry.get(), random.Random(2))
+    game.add_player("Аня")
+    game.add_player("Борис")
+    game.start_game(5)
+    game.select_task(0, 0)
+    game.complete_task(True)
+    snapshot = game.snapshot()
+
+    # Правка файла между падением и перезапуском: задания сдвигаются
+    riddles = data_dir / deck.CATEGORY_FILES[0]
+    riddles.write_text("Новая загадка|Новый ответ\n" + riddles.read_text(encoding="utf-8"), encoding="utf-8")
+    registry.refresh()
+    restored = Game.from_snapshot(snapshot, registry.get())
+
+    assert restored.tasks.pinned
+    assert [p.score for p in restored.players] == [p.score for p in game.players]
+    assert restored.round_counter == game.round_counter
+    assert restored.current_player_idx == game.current_player_idx
+    for category in range(4):
+        for index in range(game.tasks.size(category)):
+            assert restored.tasks.text(category, index) == game.tasks.text(category, index)
+    assert list(restored.tasks.completed) == list(game.tasks.completed)
+
+
+def test_restore_without_texts_deals_new_board(tmp_path):
+    game = Game(small_deck(), random.Random(3))
+    game.add_player("Аня")
+    game.add_player("Борис")
+    game.start_game(5)
+    game.select_task(0, 0)
+    game.complete_task(True)
+    # Снимок прошлой версии: без текстов поля и с другой версией колоды
+    snapshot = dict(game.snapshot(), texts=None, deck=[[1, 1]] * 4)
+    restored = Game.from_snapshot(snapshot, small_deck())
+    assert [p.score for p in restored.players] == [p.score for p in game.players]
+    assert restored.state == "PLAYING"
+    assert restored.completed_tasks == 1
@@ -0,0 +1,26 @@
+import deck
+import search
+
+
+def template_deck():
+    return deck.Deck(deck.compile_pack([
+        [("Спойте песню", ""), ("Сделайте {3-15} {=отжимание,отжимания,отжиманий} {от стены, от пола!, с хлопком!}", "")],
+    ]))
+
+
+def test_template_is_one_record():
+    tasks = template_deck()
+    index = search.TaskIndex.build(tasks)
+    category = index.categories[0]
+    assert category.count == tasks.count(0) == 1 + 13 * 3
+    assert category.static + len(category.templates) == 2
+
+
+def test_template_result_matches_query():
+    tasks = template_deck()
+    index = search.TaskIndex.build(tasks)
+    [(category, task)] = index.search("отжим 10 хлоп")
+    assert tasks.task(category, task)[0] == "Сделайте 10 отжиманий с хлопком"
+    [(category, task)] = index.search("отжиманий")
+    assert tasks.task(category, task)[0] == "Сделайте 3 отжимания от стены"
+    assert index.search("песн") == [(0, 0)]